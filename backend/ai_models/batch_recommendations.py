@@ -0,0 +1,376 @@
+"""Nightly batch precompute of lesson recommendations into `ai_recommendations`"""
+import logging
+from datetime import datetime, timedelta
+from typing import Optional, List, Dict, Iterable
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import func, and_, insert
+
+from models import db, User, Lesson, Topic, Quiz, QuizResult, LessonProgress, AIRecommendation
+from ai_models.collaborative_filtering import cf_model
+
+logger = logging.getLogger(__name__)
+
+WEAK_SCORE_THRESHOLD = 70
+RECENT_DAYS = 7
+RECENT_LIMIT = 3
+
+WEAK_AREA, NOT_STARTED, IN_PROGRESS, COLLABORATIVE = 0, 1, 2, 3
+KIND_TYPES = {
+    WEAK_AREA: 'weak_area_review',
+    NOT_STARTED: 'incomplete_lesson',
+    IN_PROGRESS: 'in_progress',
+    COLLABORATIVE: 'collaborative'
+}
+
+
+def _rank_within_rows(rows, *keys) -> np.ndarray:
+    """Position of each element among the elements of the same row, ordered by keys (first key most significant)"""
+    order = np.lexsort(tuple(reversed(keys)) + (rows,))
+    sorted_rows = rows[order]
+    starts = np.searchsorted(sorted_rows, sorted_rows, side='left')
+    rank = np.empty(rows.size, dtype=np.int64)
+    rank[order] = np.arange(rows.size) - starts
+    return rank
+
+
+def _ranges(counts) -> np.ndarray:
+    """Concatenation of arange(c) for each c in counts"""
+    return np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+
+def _lookup(matrix, rows, cols) -> np.ndarray:
+    """matrix[rows[i], cols[i]] for every i (0 where nothing is stored)"""
+    if rows.size == 0:
+        return np.zeros(0, dtype=matrix.dtype)
+    return np.asarray(matrix[rows, cols]).ravel()
+
+
+def score_recommendations(n_users, lesson_course, lesson_rank, progress, topic_scores, top_k,
+                          cf_scores=None, cf_slots=0):
+    """Rank lessons for a block of users in one vectorized pass.
+
+    Columns are lessons in lesson_id order. `lesson_course` is the course index
+    of each column and `lesson_rank` its position in (lesson_order, lesson_id)
+    order. `progress` = (user_idx, lesson_col, is_completed, recent_idx) with
+    recent_idx = seconds since last access for unfinished lessons opened in
+    the last RECENT_DAYS days, NaN otherwise. `topic_scores` = (user_idx,
+    course_idx, topic_idx, avg_score) for every topic the user was quizzed on.
+    `cf_scores` is a CSR [n_users, n_lessons] collaborative model score, with
+    entries only where the model has an opinion.
+
+    Same ordering as LessonRecommendationEngine.generate_recommendations:
+    1. unfinished lessons of courses with a weak topic (avg < 70), weakest first
+    2. the cf_slots best-scored remaining unfinished lessons
+    3. lessons never started, by (lesson_order, lesson_id)
+    4. the RECENT_LIMIT most recently opened unfinished lessons
+
+    Only candidate (user, lesson) pairs are materialized: the progress and
+    score matrices are CSR and never-started lessons are enumerated just far
+    enough to fill top_k, so a block costs O(nnz + n_users * top_k).
+
+    Returns (cols, kinds, topics, scores), each [n_users, top_k]; cols is -1
+    past the end of a user's list, topics/scores only apply to WEAK_AREA.
+    """
+    n_lessons = lesson_course.size
+    n_courses = int(lesson_course.max()) + 1 if n_lessons else 0
+    p_user, p_col, p_done, p_recent = (np.asarray(a) for a in progress)
+    t_user, t_course, t_topic, t_avg = (np.asarray(a) for a in topic_scores)
+
+    k = min(top_k, n_lessons)
+    if k == 0:
+        empty = np.full((n_users, 0), -1, dtype=np.int64)
+        return empty, empty, empty, np.zeros((n_users, 0))
+
+    # User x lesson state (CSR): 1 = started, 2 = completed, nothing stored = not started
+    state = sparse.csr_matrix(
+        (np.where(p_done, 2, 1).astype(np.int8), (p_user, p_col)), shape=(n_users, n_lessons)
+    )
+
+    # Weakest topic of each (user, weak course); courses ranked per user, weakest first
+    weak = t_avg < WEAK_SCORE_THRESHOLD
+    w_user, w_course, w_topic, w_avg = t_user[weak], t_course[weak], t_topic[weak], t_avg[weak]
+    first = _rank_within_rows(w_user * n_courses + w_course, w_avg, w_topic) == 0
+    w_user, w_course, w_topic, w_avg = w_user[first], w_course[first], w_topic[first], w_avg[first]
+    w_rank = _rank_within_rows(w_user, w_avg, w_course)
+
+    # Tier 1: unfinished lessons of the weak courses (sort keys: each tier sits above the previous one)
+    by_course = np.argsort(lesson_course, kind='stable')
+    course_size = np.bincount(lesson_course, minlength=n_courses)
+    course_start = np.cumsum(course_size) - course_size
+    per_weak = course_size[w_course]
+    weak_of = np.repeat(np.arange(w_user.size), per_weak)
+    c_user = w_user[weak_of]
+    c_col = by_course[course_start[w_course][weak_of] + _ranges(per_weak)]
+    unfinished = _lookup(state, c_user, c_col) != 2
+    c_user, c_col, weak_of = c_user[unfinished], c_col[unfinished], weak_of[unfinished]
+    cand = [(c_user, c_col, w_rank[weak_of] * n_lessons + c_col, w_topic[weak_of], w_avg[weak_of])]
+
+    # Tier 2: best collaborative scores among the other unfinished lessons
+    tier2 = n_courses * n_lessons
+    picked_user, picked_col = [c_user], [c_col]
+    slots = min(cf_slots, n_lessons) if cf_scores is not None else 0
+    if slots:
+        weak_lessons = sparse.csr_matrix(
+            (np.ones(c_user.size, dtype=bool), (c_user, c_col)), shape=(n_users, n_lessons)
+        )
+        f_user = np.repeat(np.arange(n_users), np.diff(cf_scores.indptr))
+        f_col, f_score = cf_scores.indices, cf_scores.data
+        eligible = (np.isfinite(f_score) & (_lookup(state, f_user, f_col) != 2)
+                    & ~_lookup(weak_lessons, f_user, f_col))
+        f_user, f_col, f_score = f_user[eligible], f_col[eligible], f_score[eligible]
+        f_rank = _rank_within_rows(f_user, -f_score, f_col)
+        best = f_rank < slots
+        f_user, f_col, f_rank = f_user[best], f_col[best], f_rank[best]
+        cand.append((f_user, f_col, tier2 + f_rank, None, None))
+        picked_user.append(f_user)
+        picked_col.append(f_col)
+    picked_user, picked_col = np.concatenate(picked_user), np.concatenate(picked_col)
+    picked = sparse.csr_matrix(
+        (np.ones(picked_user.size, dtype=bool), (picked_user, picked_col)), shape=(n_users, n_lessons)
+    )
+
+    # Tier 3: never-started lessons in lesson_rank order; a user's first
+    # k + started + picked ranks always hold k of them (or all there are)
+    tier3 = tier2 + n_lessons
+    by_rank = np.argsort(lesson_rank)
+    depth = np.minimum(n_lessons, k + np.diff(state.indptr) + np.diff(picked.indptr))
+    n_user = np.repeat(np.arange(n_users), depth)
+    n_rank = _ranges(depth)
+    n_col = by_rank[n_rank]
+    fresh = (_lookup(state, n_user, n_col) == 0) & ~_lookup(picked, n_user, n_col)
+    cand.append((n_user[fresh], n_col[fresh], tier3 + n_rank[fresh], None, None))
+
+    # Tier 4: most recently opened unfinished lessons
+    recent = ~np.isnan(p_recent)
+    r_user, r_col = p_user[recent], p_col[recent]
+    r_rank = _rank_within_rows(r_user, p_recent[recent], r_col)
+    keep = (r_rank < RECENT_LIMIT) & ~_lookup(picked, r_user, r_col)
+    cand.append((r_user[keep], r_col[keep], tier3 + n_lessons + r_rank[keep], None, None))
+
+    # The tiers are disjoint: keep each user's k lowest keys
+    a_user = np.concatenate([c[0] for c in cand])
+    a_col = np.concatenate([c[1] for c in cand])
+    a_key = np.concatenate([c[2] for c in cand])
+    a_topic = np.concatenate([c[3] if c[3] is not None else np.full(c[0].size, -1, dtype=np.int64) for c in cand])
+    a_score = np.concatenate([c[4] if c[4] is not None else np.zeros(c[0].size) for c in cand])
+    a_rank = _rank_within_rows(a_user, a_key)
+    top = a_rank < k
+    a_user, a_rank, a_key = a_user[top], a_rank[top], a_key[top]
+
+    cols = np.full((n_users, k), -1, dtype=np.int64)
+    kinds = np.full((n_users, k), IN_PROGRESS, dtype=np.int64)
+    topics = np.full((n_users, k), -1, dtype=np.int64)
+    scores = np.zeros((n_users, k), dtype=np.float64)
+    cols[a_user, a_rank] = a_col[top]
+    kinds[a_user, a_rank] = np.select(
+        [a_key < tier2, a_key < tier3, a_key < tier3 + n_lessons],
+        [WEAK_AREA, COLLABORATIVE, NOT_STARTED],
+        IN_PROGRESS
+    )
+    topics[a_user, a_rank] = a_topic[top]
+    scores[a_user, a_rank] = a_score[top]
+    return cols, kinds, topics, scores
+
+
+class BatchRecommendationEngine:
+    """Top-k lesson recommendations for every active user, stored in `ai_recommendations`.
+
+    `precompute()` (scripts/precompute_recommendations.py, nightly) replaces the
+    stored rows block by block; `get_precomputed()` serves them, and the route
+    falls back to the live engine when it returns None.
+    """
+
+    CHUNK_SIZE = 200  # users per score matrix / write transaction
+    TOP_K = 30  # stored per user, so course-filtered requests still have rows
+    SERVE_LIMIT = 10
+
+    @staticmethod
+    def precompute(user_ids: Optional[Iterable[int]] = None) -> Dict:
+        """Recompute and store recommendations for the given users (default: all active users)"""
+        if user_ids is None:
+            user_ids = [row[0] for row in db.session.query(User.user_id).filter(
+                User.is_active == True
+            ).order_by(User.user_id).all()]
+        else:
+            user_ids = sorted(set(user_ids))
+
+        lessons = db.session.query(
+            Lesson.lesson_id, Lesson.course_id, Lesson.lesson_title, Lesson.lesson_order
+        ).order_by(Lesson.lesson_id).all()
+        course_ids = sorted({lesson.course_id for lesson in lessons})
+        course_index = {course_id: i for i, course_id in enumerate(course_ids)}
+        lesson_index = {lesson.lesson_id: i for i, lesson in enumerate(lessons)}
+        lesson_course = np.array([course_index[lesson.course_id] for lesson in lessons], dtype=np.int64)
+        lesson_rank = np.empty(len(lessons), dtype=np.int64)
+        lesson_rank[np.lexsort((
+            np.array([lesson.lesson_id for lesson in lessons], dtype=np.int64),
+            np.array([lesson.lesson_order or 0 for lesson in lessons], dtype=np.int64)
+        ))] = np.arange(len(lessons))
+
+        topics = [topic for topic in db.session.query(
+            Topic.topic_id, Topic.topic_name, Topic.course_id
+        ).all() if topic.course_id in course_index]
+        topic_index = {topic.topic_id: i for i, topic in enumerate(topics)}
+
+        stored = 0
+        try:
+            for start in range(0, len(user_ids), BatchRecommendationEngine.CHUNK_SIZE):
+                chunk = user_ids[start:start + BatchRecommendationEngine.CHUNK_SIZE]
+                rows = BatchRecommendationEngine._score_chunk(
+                    chunk, lessons, lesson_index, lesson_course, lesson_rank,
+                    topics, topic_index, course_index
+                )
+                db.session.query(AIRecommendation).filter(
+                    AIRecommendation.user_id.in_(chunk)
+                ).delete(synchronize_session=False)
+                if rows:
+                    db.session.execute(insert(AIRecommendation), rows)
+                db.session.commit()
+                stored += len(rows)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"[Recommendation] Precompute failed: {e}")
+            raise
+
+        logger.info(f"[Recommendation] Precomputed {stored} recommendations for {len(user_ids)} users")
+        return {'users': len(user_ids), 'recommendations': stored}
+
+    @staticmethod
+    def _score_chunk(chunk, lessons, lesson_index, lesson_course, lesson_rank,
+                     topics, topic_index, course_index) -> List[Dict]:
+        user_index = {user_id: i for i, user_id in enumerate(chunk)}
+        now = datetime.utcnow()
+        recent_since = now - timedelta(days=RECENT_DAYS)
+
+        progress_rows = [row for row in db.session.query(
+            LessonProgress.user_id, LessonProgress.lesson_id,
+            LessonProgress.is_completed, LessonProgress.last_accessed
+        ).filter(LessonProgress.user_id.in_(chunk)).all() if row.lesson_id in lesson_index]
+        progress = (
+            np.array([user_index[row.user_id] for row in progress_rows], dtype=np.int64),
+            np.array([lesson_index[row.lesson_id] for row in progress_rows], dtype=np.int64),
+            np.array([bool(row.is_completed) for row in progress_rows], dtype=bool),
+            np.array([
+                (now - row.last_accessed).total_seconds()
+                if not row.is_completed and row.last_accessed and row.last_accessed >= recent_since else np.nan
+                for row in progress_rows
+            ], dtype=np.float64)
+        )
+
+        score_rows = [row for row in db.session.query(
+            QuizResult.user_id, Quiz.topic_id, func.avg(QuizResult.score).label('avg_score')
+        ).join(
+            Quiz, Quiz.quiz_id == QuizResult.quiz_id
+        ).filter(
+            QuizResult.user_id.in_(chunk)
+        ).group_by(QuizResult.user_id, Quiz.topic_id).all()
+            if row.topic_id in topic_index and row.avg_score is not None]
+        topic_scores = (
+            np.array([user_index[row.user_id] for row in score_rows], dtype=np.int64),
+            np.array([course_index[topics[topic_index[row.topic_id]].course_id] for row in score_rows], dtype=np.int64),
+            np.array([topic_index[row.topic_id] for row in score_rows], dtype=np.int64),
+            np.array([float(row.avg_score) for row in score_rows], dtype=np.float64)
+        )
+
+        cf_scores = None
+        if cf_model.loaded:
+            model_lessons, model_scores = cf_model.scores(chunk)
+            model_cols = np.array([lesson_index.get(lesson_id, -1) for lesson_id in model_lessons.tolist()], dtype=np.int64)
+            f_user, f_lesson = np.nonzero(~np.isnan(model_scores) & (model_cols >= 0))
+            cf_scores = sparse.csr_matrix(
+                (model_scores[f_user, f_lesson].astype(np.float64), (f_user, model_cols[f_lesson])),
+                shape=(len(chunk), len(lessons))
+            )
+
+        cols, kinds, topic_cols, scores = score_recommendations(
+            len(chunk), lesson_course, lesson_rank, progress, topic_scores, BatchRecommendationEngine.TOP_K,
+            cf_scores=cf_scores, cf_slots=cf_model.slots
+        )
+
+        rows = []
+        for u, user_id in enumerate(chunk):
+            for col, kind, t, score in zip(cols[u].tolist(), kinds[u].tolist(), topic_cols[u].tolist(), scores[u].tolist()):
+                if col < 0:
+                    break
+                row = {
+                    'user_id': user_id,
+                    'recommendation_type': KIND_TYPES[kind],
+                    'content_type': 'lesson',
+                    'content_id': lessons[col].lesson_id,
+                    'priority': 1 if kind == WEAK_AREA else 2,
+                    'topic_id': None,
+                    'score': None,
+                    'created_at': now,
+                    'is_viewed': False
+                }
+                if kind == WEAK_AREA:
+                    topic = topics[t]
+                    row['topic_id'] = topic.topic_id
+                    row['score'] = round(score, 2)
+                    row['reason'] = f"Bạn có điểm trung bình {score:.1f}% cho chủ đề '{topic.topic_name}'. Hãy ôn lại bài học này."
+                elif kind == COLLABORATIVE:
+                    row['reason'] = "Những học viên có quá trình học giống bạn thường học bài này tiếp theo."
+                elif kind == NOT_STARTED:
+                    row['reason'] = "Bạn chưa bắt đầu bài học này. Hãy hoàn thành để tiến bộ."
+                else:
+                    row['reason'] = "Bạn vừa mới truy cập bài học này. Tiếp tục hoàn thành nó."
+                rows.append(row)
+        return rows
+
+    @staticmethod
+    def get_precomputed(user_id: int, course_id: Optional[int] = None) -> Optional[List[Dict]]:
+        """Stored recommendations in the live engine's format (one query).
+
+        Lessons deleted or completed since the last run are skipped. Returns None
+        when nothing usable is stored for this request, so the caller can fall
+        back to LessonRecommendationEngine.generate_recommendations.
+        """
+        query = db.session.query(
+            AIRecommendation.recommendation_type,
+            AIRecommendation.priority,
+            AIRecommendation.content_id,
+            AIRecommendation.reason,
+            AIRecommendation.score,
+            Lesson.lesson_title,
+            Lesson.course_id,
+            Topic.topic_name,
+            LessonProgress.time_spent_minutes
+        ).join(
+            Lesson, Lesson.lesson_id == AIRecommendation.content_id
+        ).outerjoin(
+            Topic, Topic.topic_id == AIRecommendation.topic_id
+        ).outerjoin(
+            LessonProgress, and_(
+                LessonProgress.user_id == AIRecommendation.user_id,
+                LessonProgress.lesson_id == AIRecommendation.content_id
+            )
+        ).filter(
+            AIRecommendation.user_id == user_id,
+            AIRecommendation.content_type == 'lesson',
+            (LessonProgress.is_completed == None) | (LessonProgress.is_completed == False)
+        )
+        if course_id:
+            query = query.filter(Lesson.course_id == course_id)
+        rows = query.order_by(AIRecommendation.recommendation_id).limit(BatchRecommendationEngine.SERVE_LIMIT).all()
+        if not rows:
+            return None
+
+        recommendations = []
+        for row in rows:
+            rec = {
+                'type': row.recommendation_type,
+                'priority': row.priority,
+                'lesson_id': row.content_id,
+                'lesson_title': row.lesson_title,
+                'course_id': row.course_id,
+                'reason': row.reason
+            }
+            if row.recommendation_type == 'weak_area_review':
+                rec['topic_name'] = row.topic_name
+                rec['avg_score'] = float(row.score) if row.score is not None else 0
+            elif row.recommendation_type == 'in_progress':
+                rec['time_spent'] = row.time_spent_minutes
+            recommendations.append(rec)
+        return recommendations
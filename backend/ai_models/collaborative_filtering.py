@@ -0,0 +1,233 @@
+"""Implicit-feedback collaborative filtering (ALS) over lesson interactions.
+
+Trained offline by scripts/train_recommender.py. The artifact is two files
+next to Config.AI_MODEL_PATH (any suffix is ignored):
+- <path>.npy:  float32 factors, user rows followed by lesson rows
+- <path>.json: user_ids / lesson_ids for those rows and training parameters
+The .npy is memory-mapped at startup, so every worker shares the page cache
+and scoring a user is a single (n_lessons x factors) @ (factors,) product.
+"""
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, List, Dict, Iterable, Tuple
+
+import numpy as np
+from sqlalchemy import func
+
+from models import db, Lesson, Enrollment, LessonProgress, Quiz, QuizResult
+
+logger = logging.getLogger(__name__)
+
+# Interaction strengths (confidence = 1 + ALPHA * strength)
+ENROLLED = 0.5
+STARTED = 1.0
+COMPLETED = 2.0
+QUIZ_WEIGHT = 2.0  # times score / 100
+ALPHA = 10.0
+
+
+def _csr(rows, cols, values, n_rows):
+    order = np.lexsort((cols, rows))
+    indptr = np.searchsorted(rows[order], np.arange(n_rows + 1))
+    return indptr, cols[order], values[order]
+
+
+def _least_squares(fixed, indptr, indices, confidence, reg):
+    """One ALS half-step: solve every row of the other side against `fixed`"""
+    n_factors = fixed.shape[1]
+    gram = fixed.T @ fixed + reg * np.eye(n_factors)
+    solved = np.zeros((indptr.size - 1, n_factors))
+    for row in range(indptr.size - 1):
+        start, end = indptr[row], indptr[row + 1]
+        if start == end:
+            continue
+        factors = fixed[indices[start:end]]
+        c = confidence[start:end]
+        a = gram + (factors.T * c) @ factors
+        solved[row] = np.linalg.solve(a, factors.T @ (1.0 + c))
+    return solved
+
+
+def train_als(users, items, strengths, n_users: int, n_items: int, factors: int = 32,
+              reg: float = 0.1, iterations: int = 10, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """Implicit ALS (Hu, Koren & Volinsky 2008) on (user, item, strength) triples.
+
+    Every observed pair has preference 1 and confidence 1 + ALPHA * strength;
+    unobserved pairs have preference 0 and confidence 1.
+    Returns (user_factors, item_factors) as float32.
+    """
+    users = np.asarray(users, dtype=np.int64)
+    items = np.asarray(items, dtype=np.int64)
+    confidence = ALPHA * np.asarray(strengths, dtype=np.float64)
+
+    by_user = _csr(users, items, confidence, n_users)
+    by_item = _csr(items, users, confidence, n_items)
+
+    rng = np.random.default_rng(seed)
+    user_factors = rng.normal(scale=0.01, size=(n_users, factors))
+    item_factors = rng.normal(scale=0.01, size=(n_items, factors))
+    for _ in range(iterations):
+        user_factors = _least_squares(item_factors, *by_user, reg)
+        item_factors = _least_squares(user_factors, *by_item, reg)
+    return user_factors.astype(np.float32), item_factors.astype(np.float32)
+
+
+def load_interactions() -> Tuple[List[int], List[int], np.ndarray, np.ndarray, np.ndarray]:
+    """(user_ids, lesson_ids, user_idx, lesson_idx, strength) summed over all signals"""
+    lessons = db.session.query(Lesson.lesson_id, Lesson.course_id).order_by(Lesson.lesson_id).all()
+    course_lessons: Dict[int, List[int]] = {}
+    for lesson in lessons:
+        course_lessons.setdefault(lesson.course_id, []).append(lesson.lesson_id)
+
+    strength: Dict[Tuple[int, int], float] = {}
+
+    def add(user_id, lesson_id, value):
+        strength[(user_id, lesson_id)] = strength.get((user_id, lesson_id), 0.0) + value
+
+    for user_id, course_id in db.session.query(Enrollment.user_id, Enrollment.course_id).all():
+        for lesson_id in course_lessons.get(course_id, []):
+            add(user_id, lesson_id, ENROLLED)
+    for user_id, lesson_id, is_completed in db.session.query(
+        LessonProgress.user_id, LessonProgress.lesson_id, LessonProgress.is_completed
+    ).all():
+        add(user_id, lesson_id, COMPLETED if is_completed else STARTED)
+    for user_id, lesson_id, avg_score in db.session.query(
+        QuizResult.user_id, Quiz.lesson_id, func.avg(QuizResult.score)
+    ).join(
+        Quiz, Quiz.quiz_id == QuizResult.quiz_id
+    ).filter(Quiz.lesson_id != None).group_by(QuizResult.user_id, Quiz.lesson_id).all():
+        add(user_id, lesson_id, QUIZ_WEIGHT * float(avg_score or 0) / 100)
+
+    known = {lesson.lesson_id for lesson in lessons}
+    pairs = [(pair, value) for pair, value in strength.items() if pair[1] in known]
+    user_ids = sorted({user_id for (user_id, _), _ in pairs})
+    lesson_ids = sorted({lesson_id for (_, lesson_id), _ in pairs})
+    user_index = {user_id: i for i, user_id in enumerate(user_ids)}
+    lesson_index = {lesson_id: i for i, lesson_id in enumerate(lesson_ids)}
+    return (
+        user_ids, lesson_ids,
+        np.array([user_index[u] for (u, _), _ in pairs], dtype=np.int64),
+        np.array([lesson_index[l] for (_, l), _ in pairs], dtype=np.int64),
+        np.array([value for _, value in pairs], dtype=np.float64)
+    )
+
+
+def _artifact_paths(path) -> Tuple[Path, Path]:
+    base = Path(path).with_suffix('')
+    return base.with_suffix('.npy'), base.with_suffix('.json')
+
+
+def train(path, factors: int = 32, reg: float = 0.1, iterations: int = 10) -> Dict:
+    """Train on the current database and write the artifact (replacing any previous one)"""
+    start = time.perf_counter()
+    user_ids, lesson_ids, users, items, strengths = load_interactions()
+    user_factors, item_factors = train_als(users, items, strengths, len(user_ids), len(lesson_ids),
+                                           factors=factors, reg=reg, iterations=iterations)
+
+    npy_path, json_path = _artifact_paths(path)
+    npy_path.parent.mkdir(parents=True, exist_ok=True)
+    meta = {
+        'user_ids': user_ids,
+        'lesson_ids': lesson_ids,
+        'factors': factors,
+        'reg': reg,
+        'iterations': iterations,
+        'interactions': int(strengths.size),
+        'trained_at': datetime.utcnow().isoformat()
+    }
+    # Write both files under temporary names, then swap them in
+    tmp_npy, tmp_json = npy_path.with_name(npy_path.name + '.tmp'), json_path.with_name(json_path.name + '.tmp')
+    with open(tmp_npy, 'wb') as f:
+        np.save(f, np.vstack([user_factors, item_factors]))
+    tmp_json.write_text(json.dumps(meta), encoding='utf-8')
+    os.replace(tmp_npy, npy_path)
+    os.replace(tmp_json, json_path)
+
+    summary = {
+        'users': len(user_ids),
+        'lessons': len(lesson_ids),
+        'interactions': meta['interactions'],
+        'bytes': npy_path.stat().st_size,
+        'seconds': round(time.perf_counter() - start, 2)
+    }
+    logger.info(f"[Recommendation] Trained ALS model: {summary}")
+    return summary
+
+
+class CollaborativeModel:
+    """Memory-mapped ALS factors with per-user top-k scoring"""
+
+    def __init__(self):
+        self.user_factors: Optional[np.ndarray] = None
+        self.lesson_factors: Optional[np.ndarray] = None
+        self.user_index: Dict[int, int] = {}
+        self.lesson_ids = np.zeros(0, dtype=np.int64)
+        self.slots = 3
+
+    def init_app(self, app) -> None:
+        self.slots = app.config.get('RECOMMENDATION_CF_SLOTS', self.slots)
+        path = app.config.get('AI_MODEL_PATH')
+        if path and not Path(path).is_absolute():
+            path = Path(app.root_path) / path
+        if path:
+            self.load(path)
+
+    @property
+    def loaded(self) -> bool:
+        return self.user_factors is not None
+
+    def load(self, path) -> bool:
+        npy_path, json_path = _artifact_paths(path)
+        if not npy_path.exists() or not json_path.exists():
+            logger.info(f"[Recommendation] No collaborative model at {npy_path}; using rule-based recommendations only")
+            return False
+        try:
+            meta = json.loads(json_path.read_text(encoding='utf-8'))
+            matrix = np.load(npy_path, mmap_mode='r')
+            n_users = len(meta['user_ids'])
+            if matrix.shape[0] != n_users + len(meta['lesson_ids']):
+                raise ValueError(f"factor rows {matrix.shape[0]} do not match the index")
+        except Exception as e:
+            logger.error(f"[Recommendation] Could not load collaborative model {npy_path}: {e}")
+            return False
+
+        self.user_factors = matrix[:n_users]
+        self.lesson_factors = matrix[n_users:]
+        self.user_index = {user_id: i for i, user_id in enumerate(meta['user_ids'])}
+        self.lesson_ids = np.asarray(meta['lesson_ids'], dtype=np.int64)
+        logger.info(f"[Recommendation] Loaded collaborative model ({n_users} users, {len(self.lesson_ids)} lessons, "
+                    f"trained {meta.get('trained_at')})")
+        return True
+
+    def scores(self, user_ids: Iterable[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """(lesson_ids, [len(user_ids), n_lessons] scores); rows of unknown users are NaN"""
+        user_ids = list(user_ids)
+        result = np.full((len(user_ids), self.lesson_ids.size), np.nan, dtype=np.float32)
+        if not self.loaded:
+            return self.lesson_ids, result
+        rows = [(i, self.user_index[user_id]) for i, user_id in enumerate(user_ids) if user_id in self.user_index]
+        if rows:
+            positions, factor_rows = zip(*rows)
+            result[list(positions)] = np.asarray(self.user_factors[list(factor_rows)]) @ self.lesson_factors.T
+        return self.lesson_ids, result
+
+    def top_k(self, user_id: int, k: int, allowed: Optional[Iterable[int]] = None) -> List[Tuple[int, float]]:
+        """Best k (lesson_id, score) for the user, optionally restricted to `allowed` lesson ids"""
+        row = self.user_index.get(user_id) if self.loaded else None
+        if row is None or k <= 0:
+            return []
+        scores = self.lesson_factors @ self.user_factors[row]
+        if allowed is not None:
+            mask = np.isin(self.lesson_ids, np.fromiter(allowed, dtype=np.int64))
+            scores = np.where(mask, scores, -np.inf)
+        k = min(k, scores.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(int(self.lesson_ids[i]), float(scores[i])) for i in top if np.isfinite(scores[i])]
+
+
+cf_model = CollaborativeModel()
@@ -0,0 +1,215 @@
+"""Batch item analysis (difficulty, discrimination, distractors, timing) for quiz questions"""
+import logging
+from typing import Optional, Dict, Iterable
+import json
+
+import numpy as np
+from sqlalchemy import func
+
+from models import db, QuizAnswer, QuizResult, QuizQuestion, QuestionStatistic, BatchJobState
+
+logger = logging.getLogger(__name__)
+
+MAX_TRACKED_ANSWER = 255  # bounds the distractor matrix width
+
+
+def compute_item_statistics(question_ids, selected_answers, is_correct, time_spent, total_scores) -> Dict[int, Dict]:
+    """Compute per-question statistics over flat answer arrays in one vectorized pass.
+
+    All arguments are equal-length sequences, one element per QuizAnswer row.
+    `selected_answers` / `time_spent` may contain None; `total_scores` is the
+    score of the QuizResult the answer belongs to (criterion for point-biserial).
+    """
+    qids = np.asarray(question_ids, dtype=np.int64)
+    if qids.size == 0:
+        return {}
+
+    uniq, group = np.unique(qids, return_inverse=True)
+    k = uniq.size
+
+    correct = np.array([1.0 if c else 0.0 for c in is_correct], dtype=np.float64)
+    scores = np.array([float(s) if s is not None else 0.0 for s in total_scores], dtype=np.float64)
+
+    n = np.bincount(group, minlength=k).astype(np.float64)
+    n_correct = np.bincount(group, weights=correct, minlength=k)
+    score_sum = np.bincount(group, weights=scores, minlength=k)
+    score_sq_sum = np.bincount(group, weights=scores * scores, minlength=k)
+    correct_score_sum = np.bincount(group, weights=scores * correct, minlength=k)
+
+    # Difficulty (p-value) and point-biserial discrimination:
+    # r_pb = (M1 - M0) / s * sqrt(p * q)
+    p_value = n_correct / n
+    mean = score_sum / n
+    std = np.sqrt(np.maximum(score_sq_sum / n - mean * mean, 0.0))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_correct = correct_score_sum / n_correct
+        mean_incorrect = (score_sum - correct_score_sum) / (n - n_correct)
+        point_biserial = (mean_correct - mean_incorrect) / std * np.sqrt(p_value * (1.0 - p_value))
+    point_biserial[~np.isfinite(point_biserial)] = np.nan
+
+    # Distractor frequencies: column 0 = no answer, column i + 1 = option i
+    # (multiple_select bitmasks above MAX_TRACKED_ANSWER are not tracked as distractors)
+    selected = np.array([s if s is not None and 0 <= s <= MAX_TRACKED_ANSWER else -1 for s in selected_answers], dtype=np.int64)
+    width = int(selected.max()) + 2
+    option_counts = np.bincount(group * width + selected + 1, minlength=k * width).reshape(k, width)
+
+    # Median time: sort by (question, time) once, then pick the middle element(s) per group
+    times = np.array([t if t is not None else np.nan for t in time_spent], dtype=np.float64)
+    valid = ~np.isnan(times)
+    median_time = np.full(k, np.nan)
+    if valid.any():
+        t_group = group[valid]
+        t_values = times[valid]
+        order = np.lexsort((t_values, t_group))
+        t_sorted = t_values[order]
+        t_count = np.bincount(t_group, minlength=k)
+        starts = np.concatenate(([0], np.cumsum(t_count)[:-1]))
+        has_times = t_count > 0
+        lo = starts[has_times] + (t_count[has_times] - 1) // 2
+        hi = starts[has_times] + t_count[has_times] // 2
+        median_time[has_times] = (t_sorted[lo] + t_sorted[hi]) / 2.0
+
+    result = {}
+    for i, qid in enumerate(uniq.tolist()):
+        counts = {'none': int(option_counts[i, 0])} if option_counts[i, 0] else {}
+        for opt in np.nonzero(option_counts[i, 1:])[0].tolist():
+            counts[str(opt)] = int(option_counts[i, opt + 1])
+        result[qid] = {
+            'response_count': int(n[i]),
+            'correct_count': int(n_correct[i]),
+            'p_value': float(p_value[i]),
+            'point_biserial': None if np.isnan(point_biserial[i]) else float(point_biserial[i]),
+            'distractor_counts': counts,
+            'median_time_seconds': None if np.isnan(median_time[i]) else float(median_time[i])
+        }
+    return result
+
+
+class ItemAnalysisEngine:
+    """Incrementally maintained item statistics stored in `question_statistics`.
+
+    A refresh only recomputes questions that received answers after the stored
+    high-water mark on `quiz_answers.answer_id`, so routes can read the table
+    directly instead of aggregating answers per request.
+    """
+
+    JOB_NAME = 'item_analysis'
+    CHUNK_SIZE = 500  # question ids per IN (...) query
+
+    @staticmethod
+    def refresh(full: bool = False) -> Dict:
+        """Refresh statistics for questions answered since the last run (or all with full=True)"""
+        try:
+            state = BatchJobState.query.get(ItemAnalysisEngine.JOB_NAME)
+            if not state:
+                state = BatchJobState(job_name=ItemAnalysisEngine.JOB_NAME, high_water_mark=0)
+                db.session.add(state)
+            since = 0 if full else (state.high_water_mark or 0)
+
+            touched = db.session.query(
+                QuizAnswer.question_id,
+                func.max(QuizAnswer.answer_id)
+            ).filter(
+                QuizAnswer.answer_id > since
+            ).group_by(QuizAnswer.question_id).all()
+
+            if not touched:
+                db.session.commit()
+                return {'updated_questions': 0, 'high_water_mark': since}
+
+            high_water_mark = max(row[1] for row in touched)
+            question_ids = [row[0] for row in touched]
+
+            updated = 0
+            for start in range(0, len(question_ids), ItemAnalysisEngine.CHUNK_SIZE):
+                chunk = question_ids[start:start + ItemAnalysisEngine.CHUNK_SIZE]
+                rows = db.session.query(
+                    QuizAnswer.question_id,
+                    QuizAnswer.selected_answer,
+                    QuizAnswer.is_correct,
+                    QuizAnswer.time_spent_seconds,
+                    QuizResult.score
+                ).join(
+                    QuizResult, QuizResult.result_id == QuizAnswer.result_id
+                ).filter(
+                    QuizAnswer.question_id.in_(chunk),
+                    QuizAnswer.answer_id <= high_water_mark
+                ).all()
+
+                if not rows:
+                    continue
+
+                columns = list(zip(*rows))
+                stats = compute_item_statistics(*columns)
+                ItemAnalysisEngine._store(stats)
+                updated += len(stats)
+
+            state.high_water_mark = high_water_mark
+            db.session.commit()
+
+            logger.info(f"[ItemAnalysis] Refreshed {updated} questions up to answer_id {high_water_mark}")
+            return {'updated_questions': updated, 'high_water_mark': high_water_mark}
+
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"[ItemAnalysis] Refresh failed: {e}")
+            raise
+
+    @staticmethod
+    def _store(stats: Dict[int, Dict]) -> None:
+        existing = {
+            s.question_id: s for s in QuestionStatistic.query.filter(
+                QuestionStatistic.question_id.in_(list(stats.keys()))
+            ).all()
+        }
+        for qid, values in stats.items():
+            row = existing.get(qid)
+            if not row:
+                row = QuestionStatistic(question_id=qid)
+                db.session.add(row)
+            row.response_count = values['response_count']
+            row.correct_count = values['correct_count']
+            row.p_value = values['p_value']
+            row.point_biserial = values['point_biserial']
+            row.distractor_counts = json.dumps(values['distractor_counts'])
+            row.median_time_seconds = values['median_time_seconds']
+
+    @staticmethod
+    def get_statistics(question_ids: Iterable[int]) -> Dict[int, Dict]:
+        """Read stored statistics for the given questions (one query)"""
+        ids = list(question_ids)
+        if not ids:
+            return {}
+        rows = QuestionStatistic.query.filter(QuestionStatistic.question_id.in_(ids)).all()
+        return {row.question_id: row.to_dict() for row in rows}
+
+    @staticmethod
+    def get_topic_summary(topic_id: Optional[int], difficulty_level: Optional[int] = None) -> Optional[Dict]:
+        """Response-weighted p-value / discrimination of existing questions in a topic.
+
+        Used as a calibration reference when reviewing AI-generated questions.
+        """
+        if not topic_id:
+            return None
+        query = db.session.query(
+            func.count(QuestionStatistic.question_id),
+            func.sum(QuestionStatistic.response_count),
+            func.sum(QuestionStatistic.correct_count),
+            func.avg(QuestionStatistic.point_biserial)
+        ).join(
+            QuizQuestion, QuizQuestion.question_id == QuestionStatistic.question_id
+        ).filter(QuizQuestion.topic_id == topic_id)
+        if difficulty_level:
+            query = query.filter(QuizQuestion.difficulty_level == difficulty_level)
+
+        question_count, responses, correct, avg_discrimination = query.one()
+        if not question_count or not responses:
+            return None
+        return {
+            'topic_id': topic_id,
+            'difficulty_level': difficulty_level,
+            'question_count': int(question_count),
+            'response_count': int(responses),
+            'p_value': float(correct or 0) / float(responses),
+            'avg_point_biserial': float(avg_discrimination) if avg_discrimination is not None else None
+        }
@@ -0,0 +1,275 @@
+"""TF-IDF index from quiz question text to the lesson passages that teach it.
+
+Each lesson is split into passages of about CHUNK_WORDS words (the lesson
+title is repeated in every passage) and indexed per course as an inverted
+index: term -> (passage rows, tf-idf weights), held as NumPy CSR arrays. A question is scored against every
+passage of its course by summing over the terms it contains, and a lesson
+scores as its best passage, so lookups never touch the database.
+
+Tokenized passages are cached per lesson as term-id arrays. When a lesson
+changes only that lesson is re-tokenized; the course postings (which depend
+on every lesson through IDF) are rebuilt from the cached arrays, vectorized,
+on the next lookup. Admin lesson edits update the index of the
+process that made them; other workers pick the change up when their entry
+for the course expires (LESSON_INDEX_TTL_SECONDS) and they re-read only the
+lessons whose updated_at moved.
+"""
+import logging
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from models import db, Lesson
+from services.singleflight import flights
+
+logger = logging.getLogger(__name__)
+
+CHUNK_WORDS = 120
+MIN_SCORE = 0.05
+DEFAULT_TTL_SECONDS = 600
+
+_TAG_RE = re.compile(r'<[^>]+>')
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+_PARAGRAPH_RE = re.compile(r'\n\s*\n|(?=^#)', re.MULTILINE)
+
+
+def _words(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    text = unicodedata.normalize('NFC', _TAG_RE.sub(' ', text)).lower()
+    return [w for w in _WORD_RE.findall(text) if len(w) > 1 or w.isdigit()]
+
+
+def _terms(words: List[str]) -> Counter:
+    """Unigrams plus adjacent bigrams (Vietnamese words are mostly two syllables)"""
+    terms = Counter(words)
+    terms.update(f'{a} {b}' for a, b in zip(words, words[1:]))
+    return terms
+
+
+def tokenize(text: Optional[str]) -> Counter:
+    return _terms(_words(text))
+
+
+def chunk_lesson(title: Optional[str], content: Optional[str]) -> List[Counter]:
+    """Term counts of each passage of a lesson"""
+    title_words = _words(title)
+    chunks, current = [], []
+    for paragraph in _PARAGRAPH_RE.split(content or ''):
+        words = _words(paragraph)
+        if current and len(current) + len(words) > CHUNK_WORDS:
+            chunks.append(current)
+            current = []
+        current.extend(words)
+        while len(current) > CHUNK_WORDS * 2:
+            chunks.append(current[:CHUNK_WORDS])
+            current = current[CHUNK_WORDS:]
+    if current or not chunks:
+        chunks.append(current)
+    return [_terms(title_words + chunk) for chunk in chunks]
+
+
+class _CourseIndex:
+    """Cached passages of one course and the postings built from them"""
+
+    def __init__(self):
+        self.vocabulary: Dict[str, int] = {}  # only grows until the course is reloaded
+        self.lessons: Dict[int, Tuple[object, List[Tuple[np.ndarray, np.ndarray]]]] = {}  # lesson_id -> (updated_at, passages)
+        self.checked_at = time.monotonic()
+        self.version = 0
+        self.built_version = -1
+        self.built = None
+
+    @property
+    def dirty(self) -> bool:
+        return self.built_version != self.version
+
+    def _encode(self, counts: Counter) -> Tuple[np.ndarray, np.ndarray]:
+        """(term ids, sublinear tf) of one passage"""
+        ids = [self.vocabulary.setdefault(term, len(self.vocabulary)) for term in counts]
+        return (np.asarray(ids, dtype=np.int64),
+                1 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts))))
+
+    def set_lesson(self, lesson_id: int, updated_at, title, content) -> None:
+        self.lessons[lesson_id] = (updated_at, [self._encode(counts) for counts in chunk_lesson(title, content)])
+        self.version += 1
+
+    def remove_lesson(self, lesson_id: int) -> None:
+        if self.lessons.pop(lesson_id, None) is not None:
+            self.version += 1
+
+    def build(self) -> None:
+        """Postings (term-major CSR of L2-normalized tf-idf weights) from the cached passages"""
+        version, lessons, n_terms = self.version, dict(self.lessons), len(self.vocabulary)
+        lesson_ids = sorted(lessons)
+        passages = [passage for lesson_id in lesson_ids for passage in lessons[lesson_id][1]]
+        chunk_lesson = np.repeat(np.arange(len(lesson_ids)), [len(lessons[lesson_id][1]) for lesson_id in lesson_ids])
+        ids = np.concatenate([p[0] for p in passages]) if passages else np.zeros(0, dtype=np.int64)
+        tf = np.concatenate([p[1] for p in passages]) if passages else np.zeros(0, dtype=np.float32)
+        rows = np.repeat(np.arange(len(passages)), [p[0].size for p in passages])
+
+        df = np.bincount(ids, minlength=n_terms)
+        idf = (np.log((1 + len(passages)) / (1 + df)) + 1).astype(np.float32)
+        weights = tf * idf[ids]
+        norms = np.sqrt(np.bincount(rows, weights * weights, minlength=len(passages)))
+        weights /= np.maximum(norms, 1e-12)[rows]
+
+        order = np.argsort(ids, kind='stable')
+        indptr = np.searchsorted(ids[order], np.arange(n_terms + 1))
+        self.built = {
+            'df': df, 'idf': idf, 'indptr': indptr,
+            'rows': rows[order].astype(np.int32), 'weights': weights[order].astype(np.float32),
+            'chunk_lesson': chunk_lesson, 'lesson_ids': np.asarray(lesson_ids, dtype=np.int64)
+        }
+        self.built_version = version
+
+    def search(self, counts: Counter, k: int) -> List[Tuple[int, float]]:
+        built = self.built  # replaced as a whole, so a lookup never mixes two builds
+        if built is None or not built['chunk_lesson'].size:
+            return []
+        df, idf, indptr = built['df'], built['idf'], built['indptr']
+        query = {}
+        for term, n in counts.items():
+            term_id = self.vocabulary.get(term)
+            if term_id is not None and term_id < df.size and df[term_id]:
+                query[term_id] = (1 + math.log(n)) * float(idf[term_id])
+        norm = math.sqrt(sum(w * w for w in query.values()))
+        if not norm:
+            return []
+
+        scores = np.zeros(built['chunk_lesson'].size, dtype=np.float32)
+        for term_id, weight in query.items():
+            start, end = indptr[term_id], indptr[term_id + 1]
+            scores[built['rows'][start:end]] += (weight / norm) * built['weights'][start:end]
+        lesson_ids = built['lesson_ids']
+        best = np.zeros(lesson_ids.size, dtype=np.float32)
+        np.maximum.at(best, built['chunk_lesson'], scores)
+        top = np.argsort(-best, kind='stable')[:k]
+        return [(int(lesson_ids[i]), round(float(best[i]), 4)) for i in top if best[i] >= MIN_SCORE]
+
+
+class LessonIndex:
+    """Per-course question -> lesson similarity lookups"""
+
+    def __init__(self):
+        self.ttl = DEFAULT_TTL_SECONDS
+        self._courses: Dict[int, _CourseIndex] = {}
+        self._lock = threading.Lock()
+        self.metrics = {'lookups': 0, 'loads': 0, 'refreshes': 0, 'lessons_tokenized': 0, 'builds': 0}
+
+    def init_app(self, app) -> None:
+        self.ttl = app.config.get('LESSON_INDEX_TTL_SECONDS', self.ttl)
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.metrics[name] += n
+
+    # Loading
+
+    def _load(self, course_id: int) -> _CourseIndex:
+        index = _CourseIndex()
+        lessons = db.session.query(
+            Lesson.lesson_id, Lesson.updated_at, Lesson.lesson_title, Lesson.lesson_content
+        ).filter(Lesson.course_id == course_id).all()
+        for lesson in lessons:
+            index.set_lesson(lesson.lesson_id, lesson.updated_at, lesson.lesson_title, lesson.lesson_content)
+        self._count('loads')
+        self._count('lessons_tokenized', len(lessons))
+        return index
+
+    def _refresh(self, index: _CourseIndex, course_id: int) -> None:
+        """Re-read only the lessons added, changed or removed since they were indexed"""
+        current = dict(db.session.query(Lesson.lesson_id, Lesson.updated_at).filter(Lesson.course_id == course_id).all())
+        for lesson_id in set(index.lessons) - set(current):
+            index.remove_lesson(lesson_id)
+        changed = [lesson_id for lesson_id, updated_at in current.items()
+                   if lesson_id not in index.lessons or index.lessons[lesson_id][0] != updated_at]
+        if changed:
+            for lesson in db.session.query(
+                Lesson.lesson_id, Lesson.updated_at, Lesson.lesson_title, Lesson.lesson_content
+            ).filter(Lesson.lesson_id.in_(changed)).all():
+                index.set_lesson(lesson.lesson_id, lesson.updated_at, lesson.lesson_title, lesson.lesson_content)
+        index.checked_at = time.monotonic()
+        self._count('refreshes')
+        self._count('lessons_tokenized', len(changed))
+
+    def _course(self, course_id: int) -> _CourseIndex:
+        def prepare():
+            with self._lock:
+                index = self._courses.get(course_id)
+            if index is None:
+                index = self._load(course_id)
+                with self._lock:
+                    self._courses[course_id] = index
+            elif time.monotonic() - index.checked_at > self.ttl:
+                self._refresh(index, course_id)
+            if index.dirty:
+                index.build()
+                self._count('builds')
+                logger.debug(f"[IncorrectAnswer] Built lesson index for course {course_id}: "
+                             f"{len(index.lessons)} lessons, {index.built['chunk_lesson'].size} passages")
+            return index
+
+        with self._lock:
+            index = self._courses.get(course_id)
+        if index is not None and not index.dirty and time.monotonic() - index.checked_at <= self.ttl:
+            return index
+        # Concurrent lookups for the same course wait for one load/rebuild
+        return flights.do(('lesson_index', course_id), prepare)[0]
+
+    # Public API
+
+    def related_lessons(self, course_id: Optional[int], text: str, k: int = 3) -> List[Tuple[int, float]]:
+        """Up to k (lesson_id, similarity) of the course most similar to `text`, best first"""
+        if not course_id:
+            return []
+        self._count('lookups')
+        return self._course(course_id).search(tokenize(text), k)
+
+    def lesson_changed(self, lesson) -> None:
+        """Re-index a created or edited lesson (call after committing)"""
+        with self._lock:
+            index = self._courses.get(lesson.course_id)
+            for course_id, other in self._courses.items():
+                if course_id != lesson.course_id:
+                    other.remove_lesson(lesson.lesson_id)
+        if index is not None:
+            index.set_lesson(lesson.lesson_id, lesson.updated_at, lesson.lesson_title, lesson.lesson_content)
+            self._count('lessons_tokenized')
+
+    def lesson_removed(self, lesson_id: int, course_id: int) -> None:
+        """Drop a deleted lesson (call after committing)"""
+        with self._lock:
+            index = self._courses.get(course_id)
+        if index is not None:
+            index.remove_lesson(lesson_id)
+
+    def invalidate(self, course_id: Optional[int] = None) -> None:
+        """Forget one course (or every course); it is reloaded on the next lookup"""
+        with self._lock:
+            if course_id is None:
+                self._courses.clear()
+            else:
+                self._courses.pop(course_id, None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            courses = list(self._courses.values())
+            metrics = dict(self.metrics)
+        return dict(
+            metrics,
+            courses=len(courses),
+            lessons=sum(len(index.lessons) for index in courses),
+            passages=sum(int(index.built['chunk_lesson'].size) for index in courses if index.built),
+            terms=sum(len(index.vocabulary) for index in courses),
+            ttl_seconds=self.ttl
+        )
+
+
+lesson_index = LessonIndex()
@@ -6,8 +6,15 @@ from models import (
     db, User, Lesson, Course, Quiz, QuizResult, Topic, 
     LessonProgress, AIRecommendation, LearningAnalytics, Enrollment
 )
-from sqlalchemy import func, and_, or_
+from sqlalchemy import func, and_, or_, insert
 import json
+from collections import Counter
+from services.progress_counters import progress_percentage
+from ai_models.collaborative_filtering import cf_model
+from ai_models.lesson_index import lesson_index
+from services.singleflight import single_flight
+from services import answer_analysis, lesson_summaries
+from services.grading import get_grader
 
 logger = logging.getLogger(__name__)
 
@@ -15,8 +22,9 @@ class LessonRecommendationEngine:
     """Engine for generating intelligent lesson recommendations"""
     
     @staticmethod
-    def get_user_weak_areas(user_id: int, course_id: Optional[int] = None) -> List[Dict]:
-        """Identify weak areas based on quiz performance"""
+    @single_flight
+    def get_user_weak_areas(user_id: int, course_id: Optional[int] = None, strict: bool = False) -> List[Dict]:
+        """Identify weak areas based on quiz performance (strict: raise instead of returning [] on error)"""
         try:
             query = db.session.query(
                 Topic.topic_id,
@@ -52,10 +60,13 @@ class LessonRecommendationEngine:
             } for area in weak_areas]
             
         except Exception as e:
+            if strict:
+                raise
             logger.error(f"[Recommendation] Error getting weak areas: {e}")
             return []
     
     @staticmethod
+    @single_flight
     def get_incomplete_lessons(user_id: int, course_id: Optional[int] = None) -> List[Dict]:
         """Get incomplete lessons for recommendation"""
         try:
@@ -73,73 +84,93 @@ class LessonRecommendationEngine:
             if course_id:
                 query = query.filter(Lesson.course_id == course_id)
             
-            lessons = query.order_by(Lesson.lesson_order).all()
-            return [lesson.to_dict() for lesson in lessons]
+            lessons = query.options(Lesson.load_fields()).order_by(Lesson.lesson_order).all()
+            return [lesson.to_summary_dict() for lesson in lessons]
             
         except Exception as e:
             logger.error(f"[Recommendation] Error getting incomplete lessons: {e}")
             return []
     
     @staticmethod
-    def get_progress_by_course(user_id: int) -> List[Dict]:
-        """Get learning progress for each course"""
+    @single_flight
+    def get_progress_by_course(user_id: int, strict: bool = False) -> List[Dict]:
+        """Get learning progress for each course (one query over the maintained counters).
+
+        strict: raise instead of returning [] on error (cached callers must not store the fallback).
+        """
         try:
-            enrollments = Enrollment.query.filter_by(user_id=user_id).all()
-            progress_list = []
-            
-            for enrollment in enrollments:
-                course = Course.query.get(enrollment.course_id)
-                total_lessons = Lesson.query.filter_by(course_id=enrollment.course_id).count()
-                completed_lessons = db.session.query(LessonProgress).filter(
-                    and_(
-                        LessonProgress.user_id == user_id,
-                        LessonProgress.lesson_id.in_(
-                            db.session.query(Lesson.lesson_id).filter(
-                                Lesson.course_id == enrollment.course_id
-                            )
-                        ),
-                        LessonProgress.is_completed == True
-                    )
-                ).count()
-                
-                progress_percentage = (completed_lessons / total_lessons * 100) if total_lessons > 0 else 0
-                
-                progress_list.append({
-                    'course_id': course.course_id,
-                    'course_name': course.course_name,
-                    'total_lessons': total_lessons,
-                    'completed_lessons': completed_lessons,
-                    'progress_percentage': progress_percentage,
-                    'enrolled_at': enrollment.enrolled_at.isoformat() if enrollment.enrolled_at else None
-                })
+            rows = db.session.query(Enrollment, Course.course_name, Course.lesson_count).join(
+                Course, Course.course_id == Enrollment.course_id
+            ).filter(Enrollment.user_id == user_id).order_by(Enrollment.enrollment_id).all()
             
-            return progress_list
+            return [{
+                'course_id': enrollment.course_id,
+                'course_name': course_name,
+                'total_lessons': lesson_count,
+                'completed_lessons': enrollment.completed_count,
+                'progress_percentage': progress_percentage(enrollment.completed_count, lesson_count),
+                'enrolled_at': enrollment.enrolled_at.isoformat() if enrollment.enrolled_at else None
+            } for enrollment, course_name, lesson_count in rows]
             
         except Exception as e:
+            if strict:
+                raise
             logger.error(f"[Recommendation] Error getting progress: {e}")
             return []
     
     @staticmethod
+    @single_flight
     def generate_recommendations(user_id: int, course_id: Optional[int] = None) -> List[Dict]:
-        """Generate comprehensive recommendations"""
+        """Generate comprehensive recommendations.
+
+        Three queries (weak topics, the user's progress rows, candidate lessons);
+        candidates are then scored in memory:
+        1. weak-topic courses: every lesson not completed (priority 1)
+        2. the collaborative model's best unfinished lessons, when a model is
+           loaded and knows the user (cf_model.slots of them, priority 2)
+        3. lessons never started (priority 2)
+        4. the 3 most recently accessed, unfinished lessons of the last 7 days (priority 2)
+        """
         try:
+            weak_areas = LessonRecommendationEngine.get_user_weak_areas(user_id, course_id)
+            
+            progress_rows = db.session.query(
+                LessonProgress.lesson_id,
+                LessonProgress.is_completed,
+                LessonProgress.last_accessed,
+                LessonProgress.time_spent_minutes
+            ).filter(LessonProgress.user_id == user_id).all()
+            progress = {row.lesson_id: row for row in progress_rows}
+            
+            recent_since = datetime.utcnow() - timedelta(days=7)
+            recent = sorted(
+                (row for row in progress_rows
+                 if row.is_completed == False and row.last_accessed and row.last_accessed >= recent_since),
+                key=lambda row: row.last_accessed, reverse=True
+            )[:3]
+            
+            lesson_query = db.session.query(
+                Lesson.lesson_id, Lesson.course_id, Lesson.lesson_title, Lesson.lesson_order
+            )
+            if course_id:
+                # Weak topics are already limited to this course; recent lessons may be elsewhere
+                lesson_query = lesson_query.filter(or_(
+                    Lesson.course_id == course_id,
+                    Lesson.lesson_id.in_([row.lesson_id for row in recent])
+                ))
+            lessons = lesson_query.all()
+            by_id = {lesson.lesson_id: lesson for lesson in lessons}
+            by_course: Dict[int, List[Any]] = {}
+            for lesson in sorted(lessons, key=lambda l: l.lesson_id):
+                by_course.setdefault(lesson.course_id, []).append(lesson)
+            
             recommendations = []
             
             # 1. Weak areas - high priority
-            weak_areas = LessonRecommendationEngine.get_user_weak_areas(user_id, course_id)
             for area in weak_areas:
-                # Find lessons related to this topic
-                lessons = Lesson.query.filter_by(
-                    course_id=area['course_id']
-                ).all()
-                
-                for lesson in lessons:
-                    progress = LessonProgress.query.filter_by(
-                        user_id=user_id,
-                        lesson_id=lesson.lesson_id
-                    ).first()
-                    
-                    if not progress or not progress.is_completed:
+                for lesson in by_course.get(area['course_id'], []):
+                    row = progress.get(lesson.lesson_id)
+                    if not row or not row.is_completed:
                         recommendations.append({
                             'type': 'weak_area_review',
                             'priority': 1,  # Highest
@@ -151,36 +182,42 @@ class LessonRecommendationEngine:
                             'avg_score': area['avg_score']
                         })
             
-            # 2. Incomplete lessons - medium priority
-            incomplete_lessons = LessonRecommendationEngine.get_incomplete_lessons(user_id, course_id)
-            for lesson in incomplete_lessons:
-                # Check if this lesson hasn't been started
-                progress = LessonProgress.query.filter_by(
-                    user_id=user_id,
-                    lesson_id=lesson['lesson_id']
-                ).first()
-                
-                if not progress:
+            # 2. Lessons learners with similar histories went on to study - medium priority
+            candidates = [lesson for lesson in lessons if not course_id or lesson.course_id == course_id]
+            recommended = {rec['lesson_id'] for rec in recommendations}
+            allowed = [
+                lesson.lesson_id for lesson in candidates
+                if lesson.lesson_id not in recommended
+                and not (lesson.lesson_id in progress and progress[lesson.lesson_id].is_completed)
+            ]
+            for lesson_id, _ in cf_model.top_k(user_id, cf_model.slots, allowed):
+                lesson = by_id[lesson_id]
+                recommendations.append({
+                    'type': 'collaborative',
+                    'priority': 2,
+                    'lesson_id': lesson.lesson_id,
+                    'lesson_title': lesson.lesson_title,
+                    'course_id': lesson.course_id,
+                    'reason': "Những học viên có quá trình học giống bạn thường học bài này tiếp theo."
+                })
+            
+            # 3. Lessons not started yet - medium priority
+            for lesson in sorted(candidates, key=lambda l: (l.lesson_order, l.lesson_id)):
+                if lesson.lesson_id not in progress:
                     recommendations.append({
                         'type': 'incomplete_lesson',
                         'priority': 2,  # Medium
-                        'lesson_id': lesson['lesson_id'],
-                        'lesson_title': lesson['lesson_title'],
-                        'course_id': lesson['course_id'],
+                        'lesson_id': lesson.lesson_id,
+                        'lesson_title': lesson.lesson_title,
+                        'course_id': lesson.course_id,
                         'reason': "Bạn chưa bắt đầu bài học này. Hãy hoàn thành để tiến bộ."
                     })
             
-            # 3. Recently accessed but not completed - medium priority
-            recent_progress = LessonProgress.query.filter(
-                and_(
-                    LessonProgress.user_id == user_id,
-                    LessonProgress.is_completed == False,
-                    LessonProgress.last_accessed >= datetime.utcnow() - timedelta(days=7)
-                )
-            ).order_by(LessonProgress.last_accessed.desc()).limit(3).all()
-            
-            for progress in recent_progress:
-                lesson = Lesson.query.get(progress.lesson_id)
+            # 4. Recently accessed but not completed - medium priority
+            for row in recent:
+                lesson = by_id.get(row.lesson_id)
+                if not lesson:
+                    continue
                 recommendations.append({
                     'type': 'in_progress',
                     'priority': 2,
@@ -188,7 +225,7 @@ class LessonRecommendationEngine:
                     'lesson_title': lesson.lesson_title,
                     'course_id': lesson.course_id,
                     'reason': f"Bạn vừa mới truy cập bài học này. Tiếp tục hoàn thành nó.",
-                    'time_spent': progress.time_spent_minutes
+                    'time_spent': row.time_spent_minutes
                 })
             
             # Sort by priority and remove duplicates
@@ -210,23 +247,41 @@ class LessonRecommendationEngine:
 class LearningAnalyticsEngine:
     """Engine for analyzing learning patterns and progress"""
     
+    TREND_WINDOW = 3  # quizzes compared at each end of the history
+    
     @staticmethod
-    def analyze_learning_patterns(user_id: int, course_id: Optional[int] = None) -> Dict:
-        """Analyze user's learning patterns"""
+    def _results_query(columns, user_id: int, course_id: Optional[int] = None):
+        query = db.session.query(*columns).filter(QuizResult.user_id == user_id)
+        if course_id:
+            query = query.join(
+                Quiz, QuizResult.quiz_id == Quiz.quiz_id
+            ).filter(Quiz.course_id == course_id)
+        return query
+    
+    @staticmethod
+    @single_flight
+    def analyze_learning_patterns(user_id: int, course_id: Optional[int] = None,
+                                  scores_page: Optional[int] = None, scores_per_page: int = 20,
+                                  strict: bool = False) -> Dict:
+        """Analyze user's learning patterns.
+
+        Statistics come from one aggregate query; the trend compares the first
+        and last TREND_WINDOW results (in submission order) with two LIMIT
+        queries. The raw score series is only included when scores_page is
+        given, one page at a time. strict: raise instead of returning {} on error.
+        """
         try:
-            # Get all quiz results
-            query = db.session.query(QuizResult).filter(
-                QuizResult.user_id == user_id
-            )
-            
-            if course_id:
-                query = query.join(
-                    Quiz, QuizResult.quiz_id == Quiz.quiz_id
-                ).filter(Quiz.course_id == course_id)
-            
-            quiz_results = query.all()
-            
-            if not quiz_results:
+            score = func.coalesce(QuizResult.score, 0)
+            stats = LearningAnalyticsEngine._results_query([
+                func.count(QuizResult.result_id),
+                func.avg(score),
+                func.max(score),
+                func.min(score),
+                func.sum(func.coalesce(QuizResult.time_taken_minutes, 0))
+            ], user_id, course_id).one()
+            total, avg_score, best_score, worst_score, total_time = stats
+            
+            if not total:
                 return {
                     'total_quizzes': 0,
                     'average_score': 0,
@@ -236,41 +291,58 @@ class LearningAnalyticsEngine:
                     'improvement_trend': 'insufficient_data'
                 }
             
-            scores = [float(q.score) if q.score else 0 for q in quiz_results]
-            
-            # Calculate statistics
-            avg_score = sum(scores) / len(scores)
-            best_score = max(scores)
-            worst_score = min(scores)
-            total_time = sum([q.time_taken_minutes or 0 for q in quiz_results])
-            
             # Calculate improvement trend (last 3 vs first 3)
             trend = 'stable'
-            if len(scores) >= 6:
-                first_avg = sum(scores[:3]) / 3
-                last_avg = sum(scores[-3:]) / 3
+            window = LearningAnalyticsEngine.TREND_WINDOW
+            if total >= 2 * window:
+                def window_avg(order):
+                    rows = LearningAnalyticsEngine._results_query(
+                        [score], user_id, course_id
+                    ).order_by(order).limit(window).all()
+                    return sum(float(row[0]) for row in rows) / window
+                
+                first_avg = window_avg(QuizResult.result_id.asc())
+                last_avg = window_avg(QuizResult.result_id.desc())
                 if last_avg > first_avg + 5:
                     trend = 'improving'
                 elif last_avg < first_avg - 5:
                     trend = 'declining'
             
-            return {
-                'total_quizzes': len(quiz_results),
-                'average_score': avg_score,
-                'best_score': best_score,
-                'worst_score': worst_score,
-                'total_time_minutes': total_time,
-                'improvement_trend': trend,
-                'scores': scores
+            result = {
+                'total_quizzes': total,
+                'average_score': float(avg_score),
+                'best_score': float(best_score),
+                'worst_score': float(worst_score),
+                'total_time_minutes': int(total_time or 0),
+                'improvement_trend': trend
             }
             
+            if scores_page is not None:
+                scores_page = max(1, scores_page)
+                scores_per_page = max(1, min(scores_per_page, 100))
+                rows = LearningAnalyticsEngine._results_query(
+                    [score], user_id, course_id
+                ).order_by(QuizResult.result_id).offset((scores_page - 1) * scores_per_page).limit(scores_per_page).all()
+                result['scores'] = [float(row[0]) for row in rows]
+                result['scores_pagination'] = {
+                    'total': total,
+                    'pages': (total + scores_per_page - 1) // scores_per_page,
+                    'current_page': scores_page,
+                    'per_page': scores_per_page
+                }
+            
+            return result
+            
         except Exception as e:
+            if strict:
+                raise
             logger.error(f"[Analytics] Error analyzing patterns: {e}")
             return {}
     
     @staticmethod
-    def get_strengths_and_weaknesses(user_id: int) -> Dict:
-        """Identify learning strengths and weaknesses"""
+    @single_flight
+    def get_strengths_and_weaknesses(user_id: int, strict: bool = False) -> Dict:
+        """Identify learning strengths and weaknesses (strict: raise instead of returning empty lists on error)"""
         try:
             topics_stats = db.session.query(
                 Topic.topic_id,
@@ -310,6 +382,8 @@ class LearningAnalyticsEngine:
             
             
         except Exception as e:
+            if strict:
+                raise
             logger.error(f"[Analytics] Error getting strengths/weaknesses: {e}")
             return {'strengths': [], 'weaknesses': []}
 
@@ -317,13 +391,15 @@ class LearningAnalyticsEngine:
 class IncorrectAnswerRecommendationEngine:
     """Engine để phân tích câu trả lời sai và gợi ý bài học"""
     
+    RELATED_LESSONS = 3
+    
     @staticmethod
     def analyze_incorrect_answer(user_id: int, question_id: int, user_answer: int,
                                  correct_answer: int, quiz_id: int) -> Optional[Dict]:
         """
         Phân tích một câu trả lời sai và gợi ý bài học cần ôn
         """
-        from models import QuizQuestion, IncorrectAnswerAnalysis, Lesson, Topic
+        from models import QuizQuestion, IncorrectAnswerAnalysis, IncorrectAnswerLesson
         
         try:
             # Lấy thông tin câu hỏi
@@ -341,11 +417,12 @@ class IncorrectAnswerRecommendationEngine:
             if existing:
                 return existing.to_dict()
             
-            # Lấy lesson liên quan
-            lesson = None
-            if question.course_id:
-                lessons = Lesson.query.filter_by(course_id=question.course_id).all()
-                lesson = lessons[0] if lessons else None
+            # Bài học có nội dung gần nhất với câu hỏi (chỉ mục TF-IDF trong bộ nhớ)
+            related = lesson_index.related_lessons(
+                question.course_id, f"{question.question_text}\n{question.explanation or ''}",
+                k=IncorrectAnswerRecommendationEngine.RELATED_LESSONS
+            )
+            recommended_lessons = [lesson_id for lesson_id, _ in related]
             
             # Đếm bao nhiêu lần sinh viên sai câu này
             similar_wrong = IncorrectAnswerAnalysis.query.filter_by(
@@ -358,52 +435,183 @@ class IncorrectAnswerRecommendationEngine:
             if similar_wrong > 2:
                 error_type = 'systematic'  # Sai liên tục
             
-            # Tìm các bài học liên quan
-            recommended_lessons = []
-            if question.topic_id:
-                topic = Topic.query.get(question.topic_id)
-                if topic and question.course_id:
-                    related_lessons = Lesson.query.filter_by(
-                        course_id=question.course_id
-                    ).order_by(Lesson.lesson_order).limit(3).all()
-                    recommended_lessons = [l.lesson_id for l in related_lessons]
-            
             # Tạo bản ghi phân tích
             analysis = IncorrectAnswerAnalysis(
                 user_id=user_id,
                 question_id=question_id,
                 topic_id=question.topic_id,
                 course_id=question.course_id,
-                lesson_id=lesson.lesson_id if lesson else None,
+                lesson_id=recommended_lessons[0] if recommended_lessons else None,
                 quiz_id=quiz_id,
                 question_text=question.question_text,
                 user_answer=user_answer,
                 correct_answer=correct_answer,
                 difficulty_level=question.difficulty_level,
                 error_type=error_type,
-                recommended_lessons=json.dumps(recommended_lessons),
                 times_similar_wrong=similar_wrong,
                 ai_analysis=f"Sinh viên đã trả lời sai {similar_wrong + 1} lần. Có thể là lỗi khái niệm.",
                 analyzed_at=datetime.utcnow()
             )
             
             db.session.add(analysis)
+            db.session.flush()
+            if related:
+                db.session.execute(insert(IncorrectAnswerLesson),
+                                   IncorrectAnswerRecommendationEngine._lesson_links(analysis.analysis_id, related))
             db.session.commit()
             
             logger.info(f"[IncorrectAnswer] Analyzed incorrect answer - User: {user_id}, Question: {question_id}")
-            return analysis.to_dict()
+            return analysis.to_dict(recommended_lessons)
             
         except Exception as e:
             logger.error(f"[IncorrectAnswer] Error analyzing: {e}")
             return None
     
+    @staticmethod
+    def _lesson_links(analysis_id: int, related) -> List[Dict]:
+        """incorrect_answer_lessons rows for the (lesson_id, score) pairs of lesson_index.related_lessons"""
+        return [{'analysis_id': analysis_id, 'lesson_id': lesson_id, 'position': position, 'score': score}
+                for position, (lesson_id, score) in enumerate(related)]
+    
+    @staticmethod
+    def build_ai_prompt(question, user_answer, correct_answer) -> str:
+        """Prompt asking the AI service why the student's answer is wrong"""
+        options = []
+        if question.options:
+            try:
+                options = json.loads(question.options)
+            except Exception as e:
+                logger.debug(f"[IncorrectAnswer] Failed to parse question options JSON: {e}")
+        if not isinstance(options, list):
+            options = []
+        
+        grader = get_grader(question.question_type)
+        user_answer_text = grader.describe(options, user_answer)
+        if question.question_type == 'short_answer':
+            correct_answer_text = ' / '.join(str(opt) for opt in options) or 'Không rõ'
+        else:
+            correct_answer_text = grader.describe(options, correct_answer)
+        
+        return f"""Phân tích tại sao sinh viên trả lời sai câu hỏi này:
+
+Câu hỏi: {question.question_text}
+
+Lựa chọn:
+{chr(10).join([f"{i}. {opt}" for i, opt in enumerate(options)])}
+
+Sinh viên chọn: {user_answer_text} (sai)
+Đáp án đúng: {correct_answer_text}
+
+Giải thích: {question.explanation}
+
+Hãy:
+1. Xác định lỗi khái niệm cụ thể
+2. Giải thích tại sao sinh viên sai
+3. Gợi ý khái niệm cần ôn lại
+
+Trả lời bằng tiếng Việt, ngắn gọn (2-3 câu)."""
+    
+    @staticmethod
+    def analyze_quiz_result(result) -> Optional[List[Dict]]:
+        """
+        Phân tích tất cả câu trả lời sai của một lần nộp bài (QuizResult).
+        
+        Số truy vấn không phụ thuộc số câu sai: một truy vấn lấy câu trả lời sai kèm câu hỏi,
+        một truy vấn lấy các phân tích trước đó (và một lấy bài học gợi ý của chúng),
+        một lệnh INSERT cho tất cả bản ghi mới và một cho các bài học gợi ý.
+        Phân tích AI được gửi sang luồng nền (services/answer_analysis.py).
+        """
+        from models import QuizQuestion, QuizAnswer, IncorrectAnswerAnalysis, IncorrectAnswerLesson
+        
+        try:
+            wrong = db.session.query(QuizAnswer, QuizQuestion).join(
+                QuizQuestion, QuizQuestion.question_id == QuizAnswer.question_id
+            ).filter(
+                QuizAnswer.result_id == result.result_id,
+                QuizAnswer.is_correct == False
+            ).order_by(QuizAnswer.answer_id).all()
+            if not wrong:
+                return []
+            unique = {}
+            for answer, question in wrong:
+                unique.setdefault(question.question_id, (answer, question))
+            
+            # Các lần sai trước đó của sinh viên với cùng câu hỏi
+            previous = IncorrectAnswerAnalysis.query.filter(
+                IncorrectAnswerAnalysis.user_id == result.user_id,
+                IncorrectAnswerAnalysis.question_id.in_(list(unique))
+            ).all()
+            times_wrong = Counter(analysis.question_id for analysis in previous)
+            analyzed = [analysis for analysis in previous if analysis.quiz_id == result.quiz_id]
+            lesson_ids = IncorrectAnswerLesson.lesson_ids_for([analysis.analysis_id for analysis in analyzed])
+            analyses = {analysis.question_id: analysis.to_dict(lesson_ids.get(analysis.analysis_id, []))
+                        for analysis in analyzed}
+            
+            rows, related_by_question = [], {}
+            now = datetime.utcnow()
+            for answer, question in unique.values():
+                if question.question_id in analyses:
+                    continue  # Đã phân tích cho bài kiểm tra này
+                related = lesson_index.related_lessons(
+                    question.course_id, f"{question.question_text}\n{question.explanation or ''}",
+                    k=IncorrectAnswerRecommendationEngine.RELATED_LESSONS
+                )
+                related_by_question[question.question_id] = related
+                similar_wrong = times_wrong[question.question_id]
+                rows.append({
+                    'user_id': result.user_id,
+                    'question_id': question.question_id,
+                    'topic_id': question.topic_id,
+                    'course_id': question.course_id,
+                    'lesson_id': related[0][0] if related else None,
+                    'quiz_id': result.quiz_id,
+                    'question_text': question.question_text,
+                    'user_answer': answer.selected_answer,
+                    'correct_answer': question.correct_answer,
+                    'difficulty_level': question.difficulty_level,
+                    'error_type': 'systematic' if similar_wrong > 2 else 'conceptual',
+                    'times_similar_wrong': similar_wrong,
+                    'ai_analysis': f"Sinh viên đã trả lời sai {similar_wrong + 1} lần. Có thể là lỗi khái niệm.",
+                    'created_at': now,
+                    'analyzed_at': now
+                })
+            
+            if rows:
+                # Rows are matched back by question_id (unique within the batch), so RETURNING order is irrelevant
+                inserted = db.session.scalars(insert(IncorrectAnswerAnalysis).returning(IncorrectAnswerAnalysis), rows).all()
+                prompts, links = {}, []
+                for analysis in inserted:
+                    answer, question = unique[analysis.question_id]
+                    related = related_by_question[analysis.question_id]
+                    links.extend(IncorrectAnswerRecommendationEngine._lesson_links(analysis.analysis_id, related))
+                    analyses[analysis.question_id] = analysis.to_dict([lesson_id for lesson_id, _ in related])
+                    user_answer = answer.selected_answer if answer.selected_answer is not None else answer.answer_text
+                    prompts[analysis.analysis_id] = IncorrectAnswerRecommendationEngine.build_ai_prompt(
+                        question, user_answer, question.correct_answer
+                    )
+                if links:
+                    db.session.execute(insert(IncorrectAnswerLesson), links)
+                db.session.commit()
+                
+                for analysis_id, prompt in prompts.items():
+                    answer_analysis.enqueue(analysis_id, prompt)
+            
+            logger.info(f"[IncorrectAnswer] Analyzed result {result.result_id} - User: {result.user_id}, "
+                        f"{len(rows)} new of {len(analyses)} incorrect answers")
+            return [analyses[question_id] for question_id in unique]
+            
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"[IncorrectAnswer] Error analyzing result {result.result_id}: {e}")
+            return None
+    
     @staticmethod
     def get_incorrect_answer_insights(user_id: int, course_id: Optional[int] = None,
                                      limit: int = 10) -> List[Dict]:
         """
         Lấy danh sách những câu trả lời sai gần đây và gợi ý bài học
         """
-        from models import IncorrectAnswerAnalysis, Lesson
+        from models import IncorrectAnswerAnalysis, IncorrectAnswerLesson
         
         try:
             query = IncorrectAnswerAnalysis.query.filter_by(user_id=user_id)
@@ -416,23 +624,17 @@ class IncorrectAnswerRecommendationEngine:
                 IncorrectAnswerAnalysis.created_at.desc()
             ).limit(limit).all()
             
+            # Bài học gợi ý của tất cả lỗi: một truy vấn liên kết + một truy vấn IN (qua cache)
+            lesson_ids = IncorrectAnswerLesson.lesson_ids_for([answer.analysis_id for answer in incorrect_answers])
+            lessons = lesson_summaries.get_many(lid for ids in lesson_ids.values() for lid in ids)
+            
             insights = []
             for answer in incorrect_answers:
-                recommended_lesson_details = []
-                
-                if answer.recommended_lessons:
-                    try:
-                        lesson_ids = json.loads(answer.recommended_lessons)
-                        for lid in lesson_ids:
-                            lesson = Lesson.query.get(lid)
-                            if lesson:
-                                recommended_lesson_details.append({
-                                    'lesson_id': lesson.lesson_id,
-                                    'lesson_title': lesson.lesson_title,
-                                    'duration_minutes': lesson.duration_minutes
-                                })
-                    except Exception as e:
-                        logger.debug(f"[IncorrectAnswer] Failed to parse recommended_lessons JSON: {e}")
+                recommended_lesson_details = [{
+                    'lesson_id': lid,
+                    'lesson_title': lessons[lid]['lesson_title'],
+                    'duration_minutes': lessons[lid]['duration_minutes']
+                } for lid in lesson_ids.get(answer.analysis_id, []) if lid in lessons]
                 
                 insights.append({
                     'analysis_id': answer.analysis_id,
@@ -59,18 +59,14 @@ def before_request():
 
 @app.after_request
 def after_request(response):
-    """Add UTF-8 charset to all responses and prevent caching for development"""
+    """Add UTF-8 charset to all responses"""
     if 'charset' not in response.headers.get('Content-Type', '').lower():
         if response.headers.get('Content-Type', '').startswith('application/json'):
             response.headers['Content-Type'] = 'application/json; charset=utf-8'
         elif response.headers.get('Content-Type', '').startswith('text/html'):
             response.headers['Content-Type'] = 'text/html; charset=utf-8'
     
-    # Prevent caching during development
-    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-    response.headers['Pragma'] = 'no-cache'
-    response.headers['Expires'] = '0'
-    
+    # Cache-Control / compression: see services/http_cache.py
     return response
 
 @jwt.expired_token_loader
@@ -135,6 +131,42 @@ app.register_blueprint(ai_compat.bp, url_prefix='/api/ai')
 app.register_blueprint(incorrect_answers.bp, url_prefix='')
 app.register_blueprint(ai_lessons.bp, url_prefix='/api/ai')
 
+# Quiz attempt sessions (store + periodic autosave flush)
+from services.quiz_attempts import attempt_manager
+attempt_manager.init_app(app)
+
+# Question pool index: rebuild interval for edits made by other workers
+from services import question_pool
+question_pool.init_app(app)
+
+# Buffered lesson access timestamps (batched flush instead of a write per GET)
+from services import lesson_activity
+lesson_activity.init_app(app)
+
+# Per-user analytics cache (invalidated by quiz, lesson-completion and enrollment events)
+from services.analytics_cache import analytics_cache
+analytics_cache.init_app(app)
+
+# Collaborative-filtering factors (memory-mapped; rule-based recommendations only when absent)
+from ai_models.collaborative_filtering import cf_model
+cf_model.init_app(app)
+
+# Question -> lesson similarity index (built per course on first use, updated on lesson edits)
+from ai_models.lesson_index import lesson_index
+lesson_index.init_app(app)
+
+# Background AI analysis of incorrect answers queued by bulk analysis
+from services import answer_analysis
+answer_analysis.init_app(app)
+
+# Lesson summaries for recommended-lesson lists (one IN query for the cache misses)
+from services import lesson_summaries
+lesson_summaries.init_app(app)
+
+# HTTP caching policy, ETags and gzip/brotli (no-store everywhere when DEBUG is on)
+from services.http_cache import http_cache
+http_cache.init_app(app, FRONTEND_DIR)
+
 # Sanity check for duplicate URL rules (warn only)
 def _detect_duplicate_routes(application):
     seen = {}
@@ -172,16 +204,16 @@ def health_check():
 
 @app.route('/')
 def index():
-    return send_from_directory(str(FRONTEND_DIR), 'index.html')
+    return http_cache.static_response('index.html') or send_from_directory(str(FRONTEND_DIR), 'index.html')
 
 @app.route('/<path:filename>')
 def serve_static(filename):
     file_path = FRONTEND_DIR / filename
     
     if file_path.exists() and file_path.is_file():
-        return send_from_directory(str(FRONTEND_DIR), filename)
+        return http_cache.static_response(filename) or send_from_directory(str(FRONTEND_DIR), filename)
     
-    return send_from_directory(str(FRONTEND_DIR), 'index.html')
+    return http_cache.static_response('index.html') or send_from_directory(str(FRONTEND_DIR), 'index.html')
 
 if __name__ == '__main__':
     with app.app_context():
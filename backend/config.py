@@ -14,19 +14,18 @@ class Config:
     USE_WINDOWS_AUTH = os.getenv('USE_WINDOWS_AUTH', 'False').lower() == 'true'
     SQL_DRIVER = os.getenv('SQL_DRIVER', 'ODBC Driver 17 for SQL Server')
     
+    # No driver autocommit: each request/service commits once (services/unit_of_work.py)
     if USE_WINDOWS_AUTH or (not SQL_USERNAME and not SQL_PASSWORD):
         SQLALCHEMY_DATABASE_URI = (
             f"mssql+pyodbc://{SQL_SERVER}/{SQL_DATABASE}"
             f"?driver={SQL_DRIVER.replace(' ', '+')}"
             f"&trusted_connection=yes"
-            f"&autocommit=True"
             f"&timeout=10"
         )
     else:
         SQLALCHEMY_DATABASE_URI = (
             f"mssql+pyodbc://{SQL_USERNAME}:{SQL_PASSWORD}@{SQL_SERVER}/{SQL_DATABASE}"
             f"?driver={SQL_DRIVER.replace(' ', '+')}"
-            f"&autocommit=True"
             f"&timeout=10"
         )
     
@@ -39,6 +38,50 @@ class Config:
     JWT_DECODE_ALGORITHMS = ['HS256']
     
     DEBUG = os.getenv('DEBUG', 'False').lower() == 'true'
-    AI_MODEL_PATH = os.getenv('AI_MODEL_PATH', 'ai_models/recommendation_model.h5')
+    # Collaborative filtering artifact base path (.npy factors + .json index, relative to backend/);
+    # written by scripts/train_recommender.py and memory-mapped at startup
+    AI_MODEL_PATH = os.getenv('AI_MODEL_PATH', 'ai_models/recommendation_model')
     ENABLE_AI = os.getenv('ENABLE_AI', 'True').lower() == 'true'
-    AI_PROVIDER = os.getenv('AI_PROVIDER', 'gemini')
\ No newline at end of file
+    AI_PROVIDER = os.getenv('AI_PROVIDER', 'gemini')
+    
+    # Quiz attempt sessions: 'memory' or a dotted path to an AttemptStore subclass
+    QUIZ_ATTEMPT_STORE = os.getenv('QUIZ_ATTEMPT_STORE', 'memory')
+    QUIZ_ATTEMPT_FLUSH_SECONDS = int(os.getenv('QUIZ_ATTEMPT_FLUSH_SECONDS', '10'))
+    QUIZ_TIME_GRACE_SECONDS = int(os.getenv('QUIZ_TIME_GRACE_SECONDS', '30'))
+    
+    # Lesson access timestamps are buffered and flushed in batches
+    LESSON_ACCESS_FLUSH_SECONDS = float(os.getenv('LESSON_ACCESS_FLUSH_SECONDS', '5'))
+    LESSON_ACCESS_MAX_PENDING = int(os.getenv('LESSON_ACCESS_MAX_PENDING', '500'))
+    LESSON_TIME_FLUSH_SECONDS = float(os.getenv('LESSON_TIME_FLUSH_SECONDS', '30'))
+    
+    # Shared part of GET /api/courses is cached per process (services/course_catalog.py)
+    COURSE_CATALOG_TTL_SECONDS = float(os.getenv('COURSE_CATALOG_TTL_SECONDS', '60'))
+    
+    # HTTP caching/compression (services/http_cache.py); always off when DEBUG is on
+    HTTP_CACHE_ENABLED = os.getenv('HTTP_CACHE_ENABLED', 'True').lower() == 'true'
+    STATIC_MAX_AGE_SECONDS = int(os.getenv('STATIC_MAX_AGE_SECONDS', '31536000'))
+    HTTP_COMPRESS_MIN_BYTES = int(os.getenv('HTTP_COMPRESS_MIN_BYTES', '1024'))
+    HTTP_COMPRESS_LEVEL = int(os.getenv('HTTP_COMPRESS_LEVEL', '6'))
+    
+    # Recommendation slots given to the collaborative model (ai_models/collaborative_filtering.py)
+    RECOMMENDATION_CF_SLOTS = int(os.getenv('RECOMMENDATION_CF_SLOTS', '3'))
+    
+    # Per-user analytics cache (services/analytics_cache.py): 'memory' or a dotted path to an AnalyticsCacheStore subclass
+    ANALYTICS_CACHE_ENABLED = os.getenv('ANALYTICS_CACHE_ENABLED', 'True').lower() == 'true'
+    ANALYTICS_CACHE_STORE = os.getenv('ANALYTICS_CACHE_STORE', 'memory')
+    ANALYTICS_CACHE_TTL_SECONDS = float(os.getenv('ANALYTICS_CACHE_TTL_SECONDS', '300'))
+    ANALYTICS_CACHE_MAX_ENTRIES = int(os.getenv('ANALYTICS_CACHE_MAX_ENTRIES', '2000'))
+    
+    # Question -> lesson TF-IDF index (ai_models/lesson_index.py); other workers re-check changed lessons after this
+    LESSON_INDEX_TTL_SECONDS = float(os.getenv('LESSON_INDEX_TTL_SECONDS', '600'))
+    
+    # Bulk incorrect-answer analysis: AI prompts are sent in the background (services/answer_analysis.py)
+    INCORRECT_ANSWER_AI_FLUSH_SECONDS = float(os.getenv('INCORRECT_ANSWER_AI_FLUSH_SECONDS', '2'))
+    INCORRECT_ANSWER_AI_MAX_PENDING = int(os.getenv('INCORRECT_ANSWER_AI_MAX_PENDING', '50'))
+    
+    # Cached lesson summaries for incorrect-answer insights (services/lesson_summaries.py)
+    LESSON_SUMMARY_TTL_SECONDS = float(os.getenv('LESSON_SUMMARY_TTL_SECONDS', '300'))
+    LESSON_SUMMARY_MAX_ENTRIES = int(os.getenv('LESSON_SUMMARY_MAX_ENTRIES', '2000'))
+    
+    # Question pools for randomized quizzes (services/question_pool.py); other workers rebuild after this
+    QUESTION_POOL_TTL_SECONDS = float(os.getenv('QUESTION_POOL_TTL_SECONDS', '300'))
\ No newline at end of file
@@ -1,4 +1,5 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import load_only
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_jwt_extended import create_access_token
@@ -55,6 +56,7 @@ class Course(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
+    lesson_count = db.Column(db.Integer, nullable=False, default=0)  # maintained by services/progress_counters.py
     
     def to_dict(self):
         return {
@@ -63,6 +65,7 @@ class Course(db.Model):
             'description': self.description,
             'thumbnail_url': self.thumbnail_url,
             'instructor_id': self.instructor_id,
+            'lesson_count': self.lesson_count,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
@@ -76,9 +79,24 @@ class Lesson(db.Model):
     lesson_order = db.Column(db.Integer, nullable=False)
     video_url = db.Column(db.String(500))
     duration_minutes = db.Column(db.Integer)
+    # Quiz currently attached to this lesson (see Quiz.lesson_id for history).
+    # Plain integer rather than a FK to avoid a lessons <-> quizzes FK cycle.
+    current_quiz_id = db.Column(db.Integer)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Fields of list responses; lesson_content is only sent when requested via ?fields=
+    SUMMARY_FIELDS = ('lesson_id', 'course_id', 'lesson_title', 'lesson_order', 'video_url', 'duration_minutes')
+    LIST_FIELDS = SUMMARY_FIELDS + ('lesson_content',)
+    
+    @classmethod
+    def load_fields(cls, fields=SUMMARY_FIELDS):
+        """Query option loading only these columns (the body column stays unloaded)"""
+        return load_only(*(getattr(cls, field) for field in fields))
+    
+    def to_summary_dict(self, fields=SUMMARY_FIELDS):
+        return {field: getattr(self, field) for field in fields}
+    
     def to_dict(self):
         return {
             'lesson_id': self.lesson_id,
@@ -98,6 +116,7 @@ class Enrollment(db.Model):
     course_id = db.Column(db.Integer, db.ForeignKey('courses.course_id'), nullable=False)
     enrolled_at = db.Column(db.DateTime, default=datetime.utcnow)
     progress_percentage = db.Column(db.Numeric(5, 2), default=0)
+    completed_count = db.Column(db.Integer, nullable=False, default=0)  # completed lessons of the course, see services/progress_counters.py
     last_accessed = db.Column(db.DateTime)
     
     __table_args__ = (db.UniqueConstraint('user_id', 'course_id'),)
@@ -109,6 +128,7 @@ class Enrollment(db.Model):
             'course_id': self.course_id,
             'enrolled_at': self.enrolled_at.isoformat() if self.enrolled_at else None,
             'progress_percentage': float(self.progress_percentage) if self.progress_percentage else 0,
+            'completed_count': self.completed_count,
             'last_accessed': self.last_accessed.isoformat() if self.last_accessed else None
         }
 
@@ -132,9 +152,9 @@ class QuizQuestion(db.Model):
     topic_id = db.Column(db.Integer, db.ForeignKey('topics.topic_id'))
     course_id = db.Column(db.Integer, db.ForeignKey('courses.course_id'))
     question_text = db.Column(db.UnicodeText, nullable=False)
-    question_type = db.Column(db.String(20), default='multiple_choice')
-    options = db.Column(db.UnicodeText)  # JSON string
-    correct_answer = db.Column(db.Integer, nullable=False)
+    question_type = db.Column(db.String(20), default='multiple_choice')  # multiple_choice, multiple_select, true_false, short_answer
+    options = db.Column(db.UnicodeText)  # JSON string (accepted answers for short_answer)
+    correct_answer = db.Column(db.Integer, nullable=False)  # option index (bitmask for multiple_select), see services/grading.py
     explanation = db.Column(db.UnicodeText)
     difficulty_level = db.Column(db.Integer, default=1)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -152,6 +172,8 @@ class QuizQuestion(db.Model):
         }
         if include_answer:
             data['correct_answer'] = self.correct_answer
+        elif self.question_type == 'short_answer':
+            data['options'] = None  # accepted answers are the answer key
         return data
 
 class Quiz(db.Model):
@@ -161,8 +183,12 @@ class Quiz(db.Model):
     quiz_name = db.Column(db.String(200), nullable=False)
     course_id = db.Column(db.Integer, db.ForeignKey('courses.course_id'))
     topic_id = db.Column(db.Integer, db.ForeignKey('topics.topic_id'))
+    lesson_id = db.Column(db.Integer, db.ForeignKey('lessons.lesson_id'), index=True)
     time_limit_minutes = db.Column(db.Integer)
     passing_score = db.Column(db.Integer, default=60)
+    # JSON list of pool rules [{"topic_id": 1, "difficulty_level": 2, "count": 3}, ...].
+    # When set, each student gets a randomized variant instead of the fixed mapping.
+    pool_spec = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def to_dict(self):
@@ -171,10 +197,54 @@ class Quiz(db.Model):
             'quiz_name': self.quiz_name,
             'course_id': self.course_id,
             'topic_id': self.topic_id,
+            'lesson_id': self.lesson_id,
             'time_limit_minutes': self.time_limit_minutes,
-            'passing_score': self.passing_score
+            'passing_score': self.passing_score,
+            'is_randomized': bool(self.pool_spec)
         }
 
+class QuizVariant(db.Model):
+    """Per-student quiz variant drawn from question pools.
+
+    The drawn question ids are stored, so later question-bank edits cannot
+    change a variant. Rows created before question_ids existed are rebuilt
+    from seed + pool version by QuestionPoolIndex.
+    """
+    __tablename__ = 'quiz_variants'
+    
+    variant_id = db.Column(db.Integer, primary_key=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quizzes.quiz_id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
+    seed = db.Column(db.BigInteger, nullable=False)
+    pool_version = db.Column(db.Integer, nullable=False)
+    question_ids = db.Column(db.Text)  # JSON list of drawn question ids, in quiz order
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class QuizAttempt(db.Model):
+    """Server-side quiz attempt. Live state is kept in the attempt store and
+    flushed here periodically; this row is the durable copy used for resume."""
+    __tablename__ = 'quiz_attempts'
+    
+    attempt_id = db.Column(db.String(36), primary_key=True)  # uuid4
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quizzes.quiz_id'), nullable=False)
+    variant_id = db.Column(db.Integer, db.ForeignKey('quiz_variants.variant_id'))
+    status = db.Column(db.String(20), default='in_progress')  # in_progress, submitted
+    answers = db.Column(db.Text)  # JSON: {"question_id": {"selected_answer": 1, "time_spent_seconds": 12}}
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime)  # started_at + time_limit_minutes (NULL = untimed)
+    saved_at = db.Column(db.DateTime)
+    result_id = db.Column(db.Integer, db.ForeignKey('quiz_results.result_id'))
+    
+    __table_args__ = (
+        db.Index('idx_quiz_attempts_user_quiz', 'user_id', 'quiz_id', 'status'),
+        # At most one open attempt per user and quiz (concurrent starts: one insert wins)
+        db.Index('uq_quiz_attempts_open', 'user_id', 'quiz_id', unique=True,
+                 mssql_where=db.text("status = 'in_progress'"),
+                 postgresql_where=db.text("status = 'in_progress'"),
+                 sqlite_where=db.text("status = 'in_progress'")),
+    )
+
 class QuizQuestionMapping(db.Model):
     __tablename__ = 'quiz_question_mapping'
     
@@ -191,7 +261,8 @@ class QuizAnswer(db.Model):
     answer_id = db.Column(db.Integer, primary_key=True)
     result_id = db.Column(db.Integer, db.ForeignKey('quiz_results.result_id'), nullable=False)
     question_id = db.Column(db.Integer, db.ForeignKey('quiz_questions.question_id'), nullable=False)
-    selected_answer = db.Column(db.Integer)
+    selected_answer = db.Column(db.Integer)  # option index, or bitmask for multiple_select
+    answer_text = db.Column(db.UnicodeText)  # free-text responses (short_answer, textual true_false)
     is_correct = db.Column(db.Boolean)
     time_spent_seconds = db.Column(db.Integer)
 
@@ -205,6 +276,7 @@ class QuizResult(db.Model):
     total_questions = db.Column(db.Integer)
     correct_answers = db.Column(db.Integer)
     time_taken_minutes = db.Column(db.Integer)
+    variant_id = db.Column(db.Integer, db.ForeignKey('quiz_variants.variant_id'))
     submitted_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def to_dict(self):
@@ -257,6 +329,10 @@ class AIRecommendation(db.Model):
     content_id = db.Column(db.Integer)
     priority = db.Column(db.Integer, default=1)
     reason = db.Column(db.String(500))
+    # Weak topic behind a 'weak_area_review' row and its average score at precompute time.
+    # Plain integer (no FK) so deleting a topic is not blocked by stale recommendations.
+    topic_id = db.Column(db.Integer)
+    score = db.Column(db.Numeric(5, 2))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_viewed = db.Column(db.Boolean, default=False)
 
@@ -370,6 +446,7 @@ class AIGeneratedQuestion(db.Model):
     approval_date = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     times_used = db.Column(db.Integer, default=0)  # Track usage statistics
+    quiz_question_id = db.Column(db.Integer, db.ForeignKey('quiz_questions.question_id'))  # Set when promoted to the question bank on approval
     
     def to_dict(self, include_answer=False):
         data = {
@@ -384,6 +461,7 @@ class AIGeneratedQuestion(db.Model):
             'difficulty_level': self.difficulty_level,
             'generated_by': self.generated_by,
             'is_approved': self.is_approved,
+            'quiz_question_id': self.quiz_question_id,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
         if include_answer:
@@ -441,20 +519,14 @@ class IncorrectAnswerAnalysis(db.Model):
     error_type = db.Column(db.String(50))  # conceptual, careless, misunderstanding
     concept_area = db.Column(db.String(200))  # Khái niệm cụ thể bị sai
     ai_analysis = db.Column(db.Text)  # AI phân tích lỗi
-    recommended_lessons = db.Column(db.Text)  # JSON array of lesson_ids
     times_similar_wrong = db.Column(db.Integer, default=0)  # Bao nhiêu lần sai tương tự
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     analyzed_at = db.Column(db.DateTime)
     
-    def to_dict(self):
-        recommended = []
-        if self.recommended_lessons:
-            try:
-                recommended = json.loads(self.recommended_lessons)
-            except Exception as e:
-                # If parsing fails, return empty list and log at debug level
-                import logging
-                logging.getLogger(__name__).debug(f"Failed to parse recommended_lessons JSON: {e}")
+    def to_dict(self, recommended_lessons=None):
+        """recommended_lessons: lesson ids from IncorrectAnswerLesson.lesson_ids_for (queried when omitted)"""
+        if recommended_lessons is None:
+            recommended_lessons = IncorrectAnswerLesson.lesson_ids_for([self.analysis_id]).get(self.analysis_id, [])
         
         return {
             'analysis_id': self.analysis_id,
@@ -471,7 +543,7 @@ class IncorrectAnswerAnalysis(db.Model):
             'error_type': self.error_type,
             'concept_area': self.concept_area,
             'ai_analysis': self.ai_analysis,
-            'recommended_lessons': recommended,
+            'recommended_lessons': recommended_lessons,
             'times_similar_wrong': self.times_similar_wrong,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'analyzed_at': self.analyzed_at.isoformat() if self.analyzed_at else None
@@ -479,3 +551,74 @@ class IncorrectAnswerAnalysis(db.Model):
 
 
 
+
+class IncorrectAnswerLesson(db.Model):
+    """Bài học gợi ý cho một lỗi sai (thay cho cột JSON recommended_lessons)"""
+    __tablename__ = 'incorrect_answer_lessons'
+    
+    analysis_id = db.Column(db.Integer, db.ForeignKey('incorrect_answer_analysis.analysis_id', ondelete='CASCADE'), primary_key=True)
+    lesson_id = db.Column(db.Integer, db.ForeignKey('lessons.lesson_id', ondelete='CASCADE'), primary_key=True, index=True)
+    position = db.Column(db.Integer, nullable=False, default=0)  # 0 = liên quan nhất
+    score = db.Column(db.Numeric(5, 4))  # độ tương đồng TF-IDF (ai_models/lesson_index.py)
+    
+    @classmethod
+    def lesson_ids_for(cls, analysis_ids):
+        """{analysis_id: [lesson_id, ...] in recommendation order} in one query"""
+        result = {}
+        if not analysis_ids:
+            return result
+        rows = db.session.query(cls.analysis_id, cls.lesson_id).filter(
+            cls.analysis_id.in_(list(analysis_ids))
+        ).order_by(cls.analysis_id, cls.position).all()
+        for analysis_id, lesson_id in rows:
+            result.setdefault(analysis_id, []).append(lesson_id)
+        return result
+
+
+class QuestionStatistic(db.Model):
+    """Item-analysis statistics per quiz question (refreshed in batch by ItemAnalysisEngine)"""
+    __tablename__ = 'question_statistics'
+    
+    question_id = db.Column(db.Integer, db.ForeignKey('quiz_questions.question_id'), primary_key=True)
+    response_count = db.Column(db.Integer, default=0)
+    correct_count = db.Column(db.Integer, default=0)
+    p_value = db.Column(db.Float)  # Difficulty: tỉ lệ trả lời đúng (0-1)
+    point_biserial = db.Column(db.Float)  # Discrimination: tương quan đúng/sai với điểm bài
+    distractor_counts = db.Column(db.Text)  # JSON: {"option_index": count, "none": count}
+    median_time_seconds = db.Column(db.Float)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        counts = {}
+        if self.distractor_counts:
+            try:
+                counts = json.loads(self.distractor_counts)
+            except Exception:
+                counts = {}
+        return {
+            'question_id': self.question_id,
+            'response_count': self.response_count,
+            'correct_count': self.correct_count,
+            'p_value': self.p_value,
+            'point_biserial': self.point_biserial,
+            'distractor_counts': counts,
+            'median_time_seconds': self.median_time_seconds,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class BatchJobState(db.Model):
+    """High-water marks for incremental batch jobs (e.g. last processed answer_id)"""
+    __tablename__ = 'batch_job_state'
+    
+    job_name = db.Column(db.String(100), primary_key=True)
+    high_water_mark = db.Column(db.Integer, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class UserDashboardSnapshot(db.Model):
+    """Denormalized student dashboard, updated incrementally by enrollment,
+    lesson-completion and quiz-submission events (see services/dashboard_snapshot.py)"""
+    __tablename__ = 'user_dashboard_snapshots'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), primary_key=True)
+    payload = db.Column(db.UnicodeText, nullable=False)  # JSON: {"courses": [...], "recent_quizzes": [...]}
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
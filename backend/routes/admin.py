@@ -1,6 +1,6 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
-from utils import get_current_user_id
+from utils import get_current_user_id, parse_fields
 from models import (
     db,
     User,
@@ -15,6 +15,7 @@ from models import (
     QuizResult,
     Assignment,
     Notification,
+    QuestionStatistic,
 )
 from functools import wraps
 from datetime import datetime
@@ -22,6 +23,14 @@ import json
 import logging
 import re
 from ai_models.ai_service import get_ai_service
+from ai_models.item_analysis import ItemAnalysisEngine
+from ai_models.lesson_index import lesson_index
+from services.question_pool import parse_pool_spec, get_question_pool_index
+from services import course_catalog, dashboard_snapshot, lesson_summaries, progress_counters
+from services.analytics_cache import analytics_cache
+from services.singleflight import flights
+from services.unit_of_work import unit_of_work
+from services.upsert import insert_ignore
 
 bp = Blueprint('admin', __name__)
 logger = logging.getLogger(__name__)
@@ -39,9 +48,11 @@ def admin_required(f):
     return decorated_function
 
 
-def generate_quiz_for_lesson(lesson_id: int, num_questions: int = 5) -> int:
+def generate_quiz_for_lesson(lesson_id: int, num_questions: int = 5, requested_by: int = None) -> int:
     """Generate a multiple-choice quiz for a lesson using AI and save as a Quiz with mappings.
 
+    `requested_by` (admin user id) is recorded on the GenerationRequest audit row;
+    without it no audit row is written (generation_requests.user_id is NOT NULL).
     Returns the created quiz_id.
     Raises RuntimeError/ValueError on failures.
     """
@@ -167,61 +178,55 @@ Trả về CHÍNH XÁC JSON array gồm {num_questions} phần tử, mỗi phầ
     if len(clean_questions) == 0:
         raise RuntimeError('No valid questions parsed from AI response')
 
-    # Create a Quiz for this lesson (name includes lesson id for lookup)
-    quiz_name = f"LessonQuiz:{lesson.lesson_id}:{(lesson.lesson_title or '')[:80]}"
-    quiz = Quiz(quiz_name=quiz_name, course_id=lesson.course_id, topic_id=None)
-    db.session.add(quiz)
-    db.session.commit()
-
-    created_question_ids = []
-    order = 1
-    for q in clean_questions[:num_questions]:
-        qq = QuizQuestion(
-            topic_id=None,
-            course_id=lesson.course_id,
-            question_text=q['question_text'],
-            question_type='multiple_choice',
-            options=json.dumps(q['options']),
-            correct_answer=int(q['correct_answer']),
-            explanation=q.get('explanation'),
-            difficulty_level=int(q.get('difficulty_level', 1))
-        )
-        db.session.add(qq)
-        db.session.commit()
-
-        mapping = QuizQuestionMapping(quiz_id=quiz.quiz_id, question_id=qq.question_id, question_order=order)
-        db.session.add(mapping)
-        db.session.commit()
-
-        created_question_ids.append(qq.question_id)
-        order += 1
-
-    # Record generation request including raw response for auditing
-    try:
-        gen = GenerationRequest(
-            user_id=None,
-            request_type='question_generation',
-            topic_id=None,
-            course_id=lesson.course_id,
-            lesson_id=lesson.lesson_id,
-            input_prompt=prompt,
-            request_params=json.dumps({'num_questions': num_questions}),
-            status='completed',
-            result_ids=json.dumps({'quiz_id': quiz.quiz_id, 'question_ids': created_question_ids}),
-            error_message=None,
-            processing_time_seconds=0.0,
-            completed_at=datetime.utcnow()
-        )
-        # save raw response into error_message field if necessary (or extend model)
-        try:
-            gen.error_message = f"AI raw response: {raw_response[:2000]}"
-        except Exception as e:
-            logger.debug(f"[Admin] Failed to store raw response: {e}")
-        db.session.add(gen)
-        db.session.commit()
-    except Exception as e:
-        logger.error(f"[Admin] Error creating generation request: {e}")
-        db.session.rollback()
+    # Create a Quiz for this lesson and make it the lesson's current quiz.
+    # The name prefix is kept for readability in admin listings only.
+    # Everything below is one transaction: two batched flushes and a single commit,
+    # so a failure leaves neither a half-built quiz nor a dangling current_quiz_id.
+    with unit_of_work(autoflush=False) as session:
+        quiz_name = f"LessonQuiz:{lesson.lesson_id}:{(lesson.lesson_title or '')[:80]}"
+        quiz = Quiz(quiz_name=quiz_name, course_id=lesson.course_id, topic_id=None, lesson_id=lesson.lesson_id)
+        created = [
+            QuizQuestion(
+                topic_id=None,
+                course_id=lesson.course_id,
+                question_text=q['question_text'],
+                question_type='multiple_choice',
+                options=json.dumps(q['options']),
+                correct_answer=int(q['correct_answer']),
+                explanation=q.get('explanation'),
+                difficulty_level=int(q.get('difficulty_level', 1))
+            )
+            for q in clean_questions[:num_questions]
+        ]
+        session.add(quiz)
+        session.add_all(created)
+        session.flush()  # assigns quiz_id / question_ids
+
+        lesson.current_quiz_id = quiz.quiz_id
+        session.add_all([
+            QuizQuestionMapping(quiz_id=quiz.quiz_id, question_id=qq.question_id, question_order=order)
+            for order, qq in enumerate(created, start=1)
+        ])
+        created_question_ids = [qq.question_id for qq in created]
+
+        # Record generation request including raw response for auditing
+        if requested_by is not None:
+            session.add(GenerationRequest(
+                user_id=requested_by,
+                request_type='question_generation',
+                topic_id=None,
+                course_id=lesson.course_id,
+                lesson_id=lesson.lesson_id,
+                input_prompt=prompt,
+                request_params=json.dumps({'num_questions': num_questions}),
+                status='completed',
+                result_ids=json.dumps({'quiz_id': quiz.quiz_id, 'question_ids': created_question_ids}),
+                # save raw response into error_message field (the model has no dedicated column)
+                error_message=f"AI raw response: {str(raw_response)[:2000]}",
+                processing_time_seconds=0.0,
+                completed_at=datetime.utcnow()
+            ))
+    get_question_pool_index().invalidate()
 
     return quiz.quiz_id
 
@@ -282,6 +287,8 @@ def delete_user(user_id):
         if not user:
             return jsonify({'error': 'User not found'}), 404
 
+        dashboard_snapshot.invalidate(user_id)
+        analytics_cache.invalidate(user_id)
         db.session.delete(user)
         db.session.commit()
 
@@ -339,6 +346,7 @@ def create_course():
         )
         db.session.add(course)
         db.session.commit()
+        course_catalog.invalidate()
 
         return jsonify({
             'message': 'Course created successfully',
@@ -367,9 +375,13 @@ def update_course(course_id):
             course.thumbnail_url = data['thumbnail_url']
         if 'is_active' in data:
             course.is_active = data['is_active']
+        if {'course_name', 'description', 'thumbnail_url'} & set(data):
+            dashboard_snapshot.invalidate_course(course_id)
+            analytics_cache.invalidate_all()
 
         course.updated_at = datetime.utcnow()
         db.session.commit()
+        course_catalog.invalidate()
 
         return jsonify({
             'message': 'Course updated successfully',
@@ -389,8 +401,14 @@ def delete_course(course_id):
         if not course:
             return jsonify({'error': 'Course not found'}), 404
 
+        dashboard_snapshot.invalidate_course(course_id)
+        analytics_cache.invalidate_all()
         db.session.delete(course)
         db.session.commit()
+        course_catalog.invalidate()
+        lesson_index.invalidate(course_id)
+        lesson_summaries.invalidate()
+        get_question_pool_index().invalidate()  # the course's questions were deleted with it
 
         return jsonify({'message': 'Course deleted successfully'}), 200
     except Exception as e:
@@ -403,12 +421,18 @@ def delete_course(course_id):
 @admin_required
 def get_course_lessons_admin(course_id):
     try:
+        try:
+            fields = parse_fields(request.args.get('fields'), Lesson.LIST_FIELDS, Lesson.SUMMARY_FIELDS)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         course = Course.query.get(course_id)
         if not course:
             return jsonify({'error': 'Course not found'}), 404
 
-        lessons = Lesson.query.filter_by(course_id=course_id).order_by(Lesson.lesson_order).all()
-        return jsonify([lesson.to_dict() for lesson in lessons]), 200
+        lessons = Lesson.query.options(Lesson.load_fields(fields)).filter_by(
+            course_id=course_id
+        ).order_by(Lesson.lesson_order).all()
+        return jsonify([lesson.to_summary_dict(fields) for lesson in lessons]), 200
     except Exception as e:
         logger.exception("Failed to list course lessons")
         return jsonify({'error': str(e)}), 500
@@ -440,11 +464,22 @@ def enroll_user(course_id):
         user = User.query.get(user_id)
         if not user:
             return jsonify({'error': 'User not found'}), 404
-        existing = Enrollment.query.filter_by(user_id=user_id, course_id=course_id).first()
-        if existing:
+        course = Course.query.get(course_id)
+        if not course:
+            return jsonify({'error': 'Course not found'}), 404
+        completed_count = progress_counters.initial_completed_count(user_id, course_id)
+        progress = progress_counters.progress_percentage(completed_count, course.lesson_count)
+        inserted = insert_ignore(Enrollment, {
+            'user_id': user_id,
+            'course_id': course_id,
+            'completed_count': completed_count,
+            'progress_percentage': progress
+        }, keys=('user_id', 'course_id'))
+        if not inserted:
+            db.session.rollback()
             return jsonify({'message': 'Already enrolled'}), 200
-        enroll = Enrollment(user_id=user_id, course_id=course_id, progress_percentage=0)
-        db.session.add(enroll)
+        dashboard_snapshot.on_enrolled(user_id, course, progress)
+        analytics_cache.invalidate(user_id)
         db.session.commit()
         return jsonify({'message': 'User enrolled'}), 201
     except Exception as e:
@@ -465,6 +500,8 @@ def unenroll_user(course_id):
         if not enroll:
             return jsonify({'error': 'Enrollment not found'}), 404
         db.session.delete(enroll)
+        dashboard_snapshot.invalidate(user_id)
+        analytics_cache.invalidate(user_id)
         db.session.commit()
         return jsonify({'message': 'User unenrolled'}), 200
     except Exception as e:
@@ -495,11 +532,17 @@ def create_lesson():
             duration_minutes=data.get('duration_minutes')
         )
         db.session.add(lesson)
+        if course_id:
+            progress_counters.on_lesson_added(course_id)
+            dashboard_snapshot.invalidate_course(course_id)
+            analytics_cache.invalidate_all()
         db.session.commit()
+        course_catalog.invalidate()
+        lesson_index.lesson_changed(lesson)
 
         try:
             # Try to auto-generate quiz but don't block lesson creation on failure
-            generate_quiz_for_lesson(lesson.lesson_id, num_questions=5)
+            generate_quiz_for_lesson(lesson.lesson_id, num_questions=5, requested_by=get_current_user_id())
         except Exception as e:
             logger.exception(f"AI quiz generation failed for lesson {lesson.lesson_id}: {e}")
 
@@ -535,9 +578,11 @@ def update_lesson(lesson_id):
 
         lesson.updated_at = datetime.utcnow()
         db.session.commit()
+        lesson_index.lesson_changed(lesson)
+        lesson_summaries.invalidate(lesson_id)
 
         try:
-            generate_quiz_for_lesson(lesson.lesson_id, num_questions=5)
+            generate_quiz_for_lesson(lesson.lesson_id, num_questions=5, requested_by=get_current_user_id())
         except Exception as e:
             logger.exception(f"AI quiz generation failed for lesson update {lesson.lesson_id}: {e}")
 
@@ -559,8 +604,17 @@ def delete_lesson(lesson_id):
         if not lesson:
             return jsonify({'error': 'Lesson not found'}), 404
 
+        # Detach quizzes generated for this lesson so the FK does not block the delete
+        Quiz.query.filter_by(lesson_id=lesson_id).update({'lesson_id': None}, synchronize_session=False)
+        progress_counters.on_lesson_removed(lesson)
+        dashboard_snapshot.invalidate_course(lesson.course_id)
+        analytics_cache.invalidate_all()
+        course_id = lesson.course_id
         db.session.delete(lesson)
         db.session.commit()
+        course_catalog.invalidate()
+        lesson_index.lesson_removed(lesson_id, course_id)
+        lesson_summaries.invalidate(lesson_id)
 
         return jsonify({'message': 'Lesson deleted successfully'}), 200
     except Exception as e:
@@ -569,6 +623,153 @@ def delete_lesson(lesson_id):
         return jsonify({'error': str(e)}), 500
 
 
+# ------------------ Question bank & item analysis ------------------
+@bp.route('/questions', methods=['GET'])
+@admin_required
+def list_questions():
+    """Question bank with stored item statistics (course_id/topic_id filters optional)"""
+    try:
+        query = db.session.query(QuizQuestion, QuestionStatistic).outerjoin(
+            QuestionStatistic, QuestionStatistic.question_id == QuizQuestion.question_id
+        )
+        course_id = request.args.get('course_id', type=int)
+        topic_id = request.args.get('topic_id', type=int)
+        if course_id:
+            query = query.filter(QuizQuestion.course_id == course_id)
+        if topic_id:
+            query = query.filter(QuizQuestion.topic_id == topic_id)
+
+        result = []
+        for question, stats in query.order_by(QuizQuestion.question_id.desc()).all():
+            data = question.to_dict(include_answer=True)
+            data['stats'] = stats.to_dict() if stats else None
+            result.append(data)
+        return jsonify(result), 200
+    except Exception as e:
+        logger.exception("Failed to list questions")
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/questions/<int:question_id>', methods=['GET'])
+@admin_required
+def get_question(question_id):
+    try:
+        question = QuizQuestion.query.get(question_id)
+        if not question:
+            return jsonify({'error': 'Question not found'}), 404
+        data = question.to_dict(include_answer=True)
+        try:
+            data['options'] = json.loads(question.options) if question.options else []
+        except Exception:
+            pass
+        stats = QuestionStatistic.query.get(question_id)
+        data['stats'] = stats.to_dict() if stats else None
+        return jsonify(data), 200
+    except Exception as e:
+        logger.exception("Failed to fetch question")
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/quizzes/<int:quiz_id>/question-stats', methods=['GET'])
+@admin_required
+def get_quiz_question_stats(quiz_id):
+    """Item statistics for every question of a quiz, in quiz order"""
+    try:
+        quiz = Quiz.query.get(quiz_id)
+        if not quiz:
+            return jsonify({'error': 'Quiz not found'}), 404
+
+        rows = db.session.query(
+            QuizQuestionMapping.question_order,
+            QuizQuestion,
+            QuestionStatistic
+        ).join(
+            QuizQuestion, QuizQuestion.question_id == QuizQuestionMapping.question_id
+        ).outerjoin(
+            QuestionStatistic, QuestionStatistic.question_id == QuizQuestion.question_id
+        ).filter(
+            QuizQuestionMapping.quiz_id == quiz_id
+        ).order_by(QuizQuestionMapping.question_order).all()
+
+        return jsonify({
+            'quiz': quiz.to_dict(),
+            'questions': [{
+                'question_order': order,
+                'question_id': question.question_id,
+                'question_text': question.question_text,
+                'difficulty_level': question.difficulty_level,
+                'stats': stats.to_dict() if stats else None
+            } for order, question, stats in rows]
+        }), 200
+    except Exception as e:
+        logger.exception("Failed to fetch quiz question stats")
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/quizzes/<int:quiz_id>/pool', methods=['PUT'])
+@admin_required
+def set_quiz_pool(quiz_id):
+    """Turn a quiz into a randomized one drawn from question pools.
+
+    Input JSON: {"rules": [{"topic_id": 1, "difficulty_level": 2, "count": 3}, ...]}
+    Send {"rules": null} to go back to the fixed question mapping.
+    """
+    try:
+        quiz = Quiz.query.get(quiz_id)
+        if not quiz:
+            return jsonify({'error': 'Quiz not found'}), 404
+
+        rules = (request.get_json() or {}).get('rules')
+        if rules is None:
+            quiz.pool_spec = None
+            db.session.commit()
+            return jsonify({'message': 'Quiz pool removed', 'quiz': quiz.to_dict()}), 200
+
+        try:
+            rules = parse_pool_spec(rules)
+        except (ValueError, TypeError) as e:
+            return jsonify({'error': str(e)}), 400
+
+        index = get_question_pool_index()
+        index.ensure_loaded()
+        available = [
+            len(index.pool(quiz.course_id, r['topic_id'], r['difficulty_level'], index.version))
+            for r in rules
+        ]
+        quiz.pool_spec = json.dumps(rules)
+        db.session.commit()
+
+        return jsonify({
+            'message': 'Quiz pool updated',
+            'quiz': quiz.to_dict(),
+            'rules': [dict(rule, available=count) for rule, count in zip(rules, available)]
+        }), 200
+    except Exception as e:
+        db.session.rollback()
+        logger.exception("Failed to update quiz pool")
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/analytics-cache', methods=['GET'])
+@admin_required
+def get_analytics_cache_stats():
+    """Hit/miss counters of the per-user analytics cache and request coalescing (this worker process only)"""
+    return jsonify(dict(analytics_cache.stats(), single_flight=flights.stats())), 200
+
+
+@bp.route('/question-stats/refresh', methods=['POST'])
+@admin_required
+def refresh_question_stats():
+    """Run the incremental item-analysis batch now (normally run by scripts/refresh_question_stats.py)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        summary = ItemAnalysisEngine.refresh(full=bool(data.get('full')))
+        return jsonify(summary), 200
+    except Exception as e:
+        logger.exception("Failed to refresh question stats")
+        return jsonify({'error': str(e)}), 500
+
+
 # ------------------ Notifications ------------------
 @bp.route('/notifications/send', methods=['POST'])
 @admin_required
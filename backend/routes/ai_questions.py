@@ -7,6 +7,9 @@ from models import (
     Lesson, Course, QuizQuestionMapping, Quiz
 )
 from ai_models.ai_service import get_ai_service
+from ai_models.item_analysis import ItemAnalysisEngine
+from services.question_pool import promote_to_question_bank, get_question_pool_index
+from services.grading import registered_types
 import json
 from datetime import datetime
 import time
@@ -269,7 +272,13 @@ def get_generated_question(question_id):
         if user and user.role == 'student' and not question.is_approved:
             return jsonify({'error': 'Question not approved yet'}), 403
         
-        return jsonify(question.to_dict(include_answer=True)), 200
+        data = question.to_dict(include_answer=True)
+        if user and user.role == 'admin':
+            # Observed difficulty of existing questions in the same topic/level, for review
+            data['topic_calibration'] = ItemAnalysisEngine.get_topic_summary(
+                question.topic_id, question.difficulty_level
+            )
+        return jsonify(data), 200
         
     except Exception as e:
         logger.error(f"[Questions] Error getting question: {e}")
@@ -294,17 +303,25 @@ def approve_question(question_id):
         question.is_approved = True
         question.approved_by = user_id
         question.approval_date = datetime.utcnow()
+        # Approved questions join the question bank so quiz pools can draw them
+        bank_question = promote_to_question_bank(question)
         db.session.commit()
+        get_question_pool_index().add_question(bank_question)
         
         logger.info(f"[Questions] Question {question_id} approved by admin {user_id}")
         
         return jsonify({
             'message': 'Question approved successfully',
             'question_id': question_id,
-            'is_approved': True
+            'is_approved': True,
+            'quiz_question_id': bank_question.question_id,
+            'topic_calibration': ItemAnalysisEngine.get_topic_summary(
+                question.topic_id, question.difficulty_level
+            )
         }), 200
         
     except Exception as e:
+        db.session.rollback()
         logger.error(f"[Questions] Error approving: {e}")
         return jsonify({'error': str(e)}), 500
 
@@ -396,6 +413,11 @@ def update_generated_question(question_id):
         if 'explanation' in data:
             question.explanation = data.get('explanation')
 
+        if 'question_type' in data:
+            if data.get('question_type') not in registered_types():
+                return jsonify({'error': f"question_type must be one of {registered_types()}"}), 400
+            question.question_type = data.get('question_type')
+
         if 'difficulty_level' in data:
             try:
                 question.difficulty_level = int(data.get('difficulty_level'))
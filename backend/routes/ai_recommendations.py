@@ -3,12 +3,45 @@ from flask_jwt_extended import jwt_required
 from utils import get_current_user_id
 from models import db, User, AIRecommendation, Lesson, Course, QuizResult, Topic, LessonProgress, Enrollment
 from ai_models.lesson_recommendation import LessonRecommendationEngine, LearningAnalyticsEngine
+from ai_models.batch_recommendations import BatchRecommendationEngine
+from services.analytics_cache import analytics_cache
 from datetime import datetime
 import logging
 
 bp = Blueprint('ai_recommendations', __name__)
 logger = logging.getLogger(__name__)
 
+
+def _scores_page_args():
+    """(scores_page, scores_per_page) from the query string; the score series is opt-in"""
+    page = request.args.get('scores_page', type=int)
+    per_page = min(request.args.get('scores_per_page', 20, type=int), 100)
+    return page, per_page
+
+
+def _learning_analytics(user_id, course_id):
+    """Analytics bundle shared by /get-analytics and include_analytics (cached per user).
+
+    The engines run in strict mode: a failed query raises (a 500 for this
+    request) instead of caching an empty fallback as the user's analytics.
+    """
+    scores_page, scores_per_page = _scores_page_args()
+    
+    def compute():
+        strengths_weaknesses = LearningAnalyticsEngine.get_strengths_and_weaknesses(user_id, strict=True)
+        return {
+            'patterns': LearningAnalyticsEngine.analyze_learning_patterns(
+                user_id, course_id, scores_page, scores_per_page, strict=True),
+            'strengths': strengths_weaknesses.get('strengths', []),
+            'weaknesses': strengths_weaknesses.get('weaknesses', []),
+            'weak_areas': LessonRecommendationEngine.get_user_weak_areas(user_id, course_id, strict=True),
+            'course_progress': LessonRecommendationEngine.get_progress_by_course(user_id, strict=True)
+        }
+    
+    view = f"analytics:{course_id}:{scores_page}:{scores_per_page if scores_page else ''}"
+    return analytics_cache.get_or_compute(user_id, view, compute)
+
+
 @bp.route('/get-recommendations', methods=['GET'])
 @jwt_required()
 def get_recommendations():
@@ -17,34 +50,37 @@ def get_recommendations():
     Query params:
     - course_id: Optional course filter
     - include_analytics: Include learning analytics (true/false)
+    - scores_page, scores_per_page: Include one page of the raw quiz score series in the analytics
     """
     try:
         user_id = get_current_user_id()
         course_id = request.args.get('course_id', type=int)
         include_analytics = request.args.get('include_analytics', 'false').lower() == 'true'
         
-        # Get recommendations using the recommendation engine
-        recommendations = LessonRecommendationEngine.generate_recommendations(user_id, course_id)
+        # Serve the nightly precomputed recommendations; compute live only when none are stored
+        recommendations = BatchRecommendationEngine.get_precomputed(user_id, course_id)
+        source = 'precomputed'
+        if recommendations is None:
+            recommendations = LessonRecommendationEngine.generate_recommendations(user_id, course_id)
+            source = 'live'
         
         result = {
             'recommendations': recommendations,
-            'total_recommendations': len(recommendations)
+            'total_recommendations': len(recommendations),
+            'source': source
         }
         
         # Include analytics if requested
         if include_analytics:
-            analytics = LearningAnalyticsEngine.analyze_learning_patterns(user_id, course_id)
-            strengths_weaknesses = LearningAnalyticsEngine.get_strengths_and_weaknesses(user_id)
-            progress = LessonRecommendationEngine.get_progress_by_course(user_id)
-            
+            analytics = _learning_analytics(user_id, course_id)
             result['analytics'] = {
-                'patterns': analytics,
-                'strengths': strengths_weaknesses.get('strengths', []),
-                'weaknesses': strengths_weaknesses.get('weaknesses', []),
-                'course_progress': progress
+                'patterns': analytics['patterns'],
+                'strengths': analytics['strengths'],
+                'weaknesses': analytics['weaknesses'],
+                'course_progress': analytics['course_progress']
             }
         
-        logger.info(f"[Recommendations] Retrieved {len(recommendations)} recommendations for user {user_id}")
+        logger.info(f"[Recommendations] Retrieved {len(recommendations)} {source} recommendations for user {user_id}")
         return jsonify(result), 200
         
     except Exception as e:
@@ -59,23 +95,20 @@ def get_learning_analytics():
     Get comprehensive learning analytics for user
     Query params:
     - course_id: Optional course filter
+    - scores_page, scores_per_page: Include one page of the raw quiz score series
     """
     try:
         user_id = get_current_user_id()
         course_id = request.args.get('course_id', type=int)
         
-        # Get analytics
-        patterns = LearningAnalyticsEngine.analyze_learning_patterns(user_id, course_id)
-        strengths_weaknesses = LearningAnalyticsEngine.get_strengths_and_weaknesses(user_id)
-        progress = LessonRecommendationEngine.get_progress_by_course(user_id)
-        weak_areas = LessonRecommendationEngine.get_user_weak_areas(user_id, course_id)
+        analytics = _learning_analytics(user_id, course_id)
         
         return jsonify({
-            'learning_patterns': patterns,
-            'strengths': strengths_weaknesses.get('strengths', []),
-            'weaknesses': strengths_weaknesses.get('weaknesses', []),
-            'weak_areas': weak_areas,
-            'course_progress': progress
+            'learning_patterns': analytics['patterns'],
+            'strengths': analytics['strengths'],
+            'weaknesses': analytics['weaknesses'],
+            'weak_areas': analytics['weak_areas'],
+            'course_progress': analytics['course_progress']
         }), 200
         
     except Exception as e:
@@ -95,7 +128,10 @@ def get_weak_areas():
         user_id = get_current_user_id()
         course_id = request.args.get('course_id', type=int)
         
-        weak_areas = LessonRecommendationEngine.get_user_weak_areas(user_id, course_id)
+        weak_areas = analytics_cache.get_or_compute(
+            user_id, f"weak-areas:{course_id}",
+            lambda: LessonRecommendationEngine.get_user_weak_areas(user_id, course_id, strict=True)
+        )
         
         return jsonify({
             'weak_areas': weak_areas,
@@ -114,7 +150,9 @@ def get_progress():
     try:
         user_id = get_current_user_id()
         
-        progress = LessonRecommendationEngine.get_progress_by_course(user_id)
+        progress = analytics_cache.get_or_compute(
+            user_id, 'progress', lambda: LessonRecommendationEngine.get_progress_by_course(user_id, strict=True)
+        )
         
         # Calculate overall stats
         total_lessons = sum(p['total_lessons'] for p in progress)
@@ -1,43 +1,55 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required
-from utils import get_current_user_id
+from utils import get_current_user_id, parse_fields
 from models import db, Course, Enrollment, Lesson, LessonProgress
 from datetime import datetime
+from services import course_catalog, dashboard_snapshot, progress_counters
+from services.analytics_cache import analytics_cache
+from services.upsert import insert_ignore
+from services.unit_of_work import read_only
 
 bp = Blueprint('courses', __name__)
 
 @bp.route('', methods=['GET'])
 @jwt_required()
+@read_only
 def get_courses():
+    """Active courses with the caller's enrollment state.
+
+    Shared course data comes from services/course_catalog.py; responses carry an
+    ETag so a browser revalidating an unchanged catalog gets a 304.
+    """
     try:
         user_id = get_current_user_id()
         enrolled_only = request.args.get('enrolled_only', 'false').lower() == 'true'
         
-        if enrolled_only:
-            enrollments = Enrollment.query.filter_by(user_id=user_id).all()
-            course_ids = [e.course_id for e in enrollments]
-            courses = Course.query.filter(Course.course_id.in_(course_ids)).filter_by(is_active=True).all()
+        entry, enrollments = course_catalog.load(user_id)
+        etag = course_catalog.etag(entry, enrollments, enrolled_only)
+        # Weak comparison: the validator is weakened when the body gets compressed
+        if request.if_none_match.contains_weak(etag):
+            response = current_app.response_class(status=304)
         else:
-            courses = Course.query.filter_by(is_active=True).all()
-        
-        course_list = []
-        for course in courses:
-            course_data = course.to_dict()
-            enrollment = Enrollment.query.filter_by(user_id=user_id, course_id=course.course_id).first()
-            course_data['is_enrolled'] = enrollment is not None
-            if enrollment:
-                course_data['progress_percentage'] = float(enrollment.progress_percentage) if enrollment.progress_percentage else 0
-            course_list.append(course_data)
+            response = jsonify(course_catalog.render(entry, enrollments, enrolled_only))
         
-        return jsonify(course_list), 200
+        response.set_etag(etag)
+        # Stored by the browser but revalidated on every use; the body depends on the token
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.vary.add('Authorization')
+        return response
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @bp.route('/<int:course_id>', methods=['GET'])
 @jwt_required()
+@read_only
 def get_course(course_id):
     try:
+        try:
+            fields = parse_fields(request.args.get('fields'), Lesson.LIST_FIELDS, Lesson.SUMMARY_FIELDS)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         course = Course.query.get(course_id)
         
         if not course:
@@ -45,9 +57,11 @@ def get_course(course_id):
         
         course_data = course.to_dict()
         
-        # Get lessons
-        lessons = Lesson.query.filter_by(course_id=course_id).order_by(Lesson.lesson_order).all()
-        course_data['lessons'] = [lesson.to_dict() for lesson in lessons]
+        # Get lessons (summary columns only; bodies are fetched per lesson)
+        lessons = Lesson.query.options(Lesson.load_fields(fields)).filter_by(
+            course_id=course_id
+        ).order_by(Lesson.lesson_order).all()
+        course_data['lessons'] = [lesson.to_summary_dict(fields) for lesson in lessons]
         
         # Get enrollment info
         user_id = get_current_user_id()
@@ -74,16 +88,23 @@ def enroll_course(course_id):
         if not course:
             return jsonify({'error': 'Course not found'}), 404
         
-        existing_enrollment = Enrollment.query.filter_by(user_id=user_id, course_id=course_id).first()
-        if existing_enrollment:
+        # Single-statement insert-ignore: concurrent enroll requests cannot both insert
+        completed_count = progress_counters.initial_completed_count(user_id, course_id)
+        progress = progress_counters.progress_percentage(completed_count, course.lesson_count)
+        inserted = insert_ignore(Enrollment, {
+            'user_id': user_id,
+            'course_id': course_id,
+            'completed_count': completed_count,
+            'progress_percentage': progress
+        }, keys=('user_id', 'course_id'))
+        if not inserted:
+            db.session.rollback()
             return jsonify({'error': 'Already enrolled in this course'}), 400
         
-        enrollment = Enrollment(
-            user_id=user_id,
-            course_id=course_id
-        )
-        db.session.add(enrollment)
+        dashboard_snapshot.on_enrolled(user_id, course, progress)
+        analytics_cache.invalidate(user_id)
         db.session.commit()
+        enrollment = Enrollment.query.filter_by(user_id=user_id, course_id=course_id).first()
         
         return jsonify({
             'message': 'Enrolled successfully',
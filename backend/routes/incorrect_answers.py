@@ -3,11 +3,12 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
 from utils import get_current_user_id
 from models import (
-    db, User, IncorrectAnswerAnalysis, QuizAnswer, QuizResult, 
+    db, User, IncorrectAnswerAnalysis, IncorrectAnswerLesson, QuizAnswer, QuizResult, 
     QuizQuestion, Quiz, Lesson, Topic
 )
 from ai_models.lesson_recommendation import IncorrectAnswerRecommendationEngine
 from ai_models.ai_service import get_ai_service
+from services import answer_analysis, lesson_summaries
 from datetime import datetime
 import logging
 
@@ -53,38 +54,9 @@ def analyze_incorrect_answer():
             ai_service = get_ai_service()
             if ai_service:
                 try:
-                    # Lấy thông tin các lựa chọn
-                    import json
-                    options = []
-                    if question.options:
-                        try:
-                            options = json.loads(question.options)
-                        except Exception as e:
-                            logger.debug(f"[IncorrectAnswer] Failed to parse question options JSON: {e}")
-                            options = []
-                    
-                    user_answer_text = options[user_answer] if user_answer < len(options) else "Unknown"
-                    correct_answer_text = options[correct_answer] if correct_answer < len(options) else "Unknown"
-                    
-                    # Tạo prompt cho AI
-                    prompt = f"""Phân tích tại sao sinh viên trả lời sai câu hỏi này:
-
-Câu hỏi: {question.question_text}
-
-Lựa chọn:
-{chr(10).join([f"{i}. {opt}" for i, opt in enumerate(options)])}
-
-Sinh viên chọn: {user_answer_text} (sai)
-Đáp án đúng: {correct_answer_text}
-
-Giải thích: {question.explanation}
-
-Hãy:
-1. Xác định lỗi khái niệm cụ thể
-2. Giải thích tại sao sinh viên sai
-3. Gợi ý khái niệm cần ôn lại
-
-Trả lời bằng tiếng Việt, ngắn gọn (2-3 câu)."""
+                    prompt = IncorrectAnswerRecommendationEngine.build_ai_prompt(
+                        question, user_answer, correct_answer
+                    )
                     
                     ai_analysis = ai_service.generate_response(prompt)
                     if ai_analysis:
@@ -107,6 +79,49 @@ Trả lời bằng tiếng Việt, ngắn gọn (2-3 câu)."""
         return jsonify({'error': str(e)}), 500
 
 
+@bp.route('/api/incorrect-answers/analyze-result', methods=['POST'])
+@jwt_required()
+def analyze_quiz_result():
+    """
+    Phân tích tất cả câu trả lời sai của một lần nộp bài
+    Expected JSON: {"result_id": 1}
+    Phân tích AI chi tiết được cập nhật sau (chạy nền)
+    """
+    try:
+        user_id = get_current_user_id()
+        data = request.get_json() or {}
+        
+        result_id = data.get('result_id')
+        if not result_id:
+            return jsonify({'error': 'Missing required fields'}), 400
+        
+        result = QuizResult.query.filter_by(result_id=result_id, user_id=user_id).first()
+        if not result:
+            return jsonify({'error': 'Quiz result not found'}), 404
+        
+        analyses = IncorrectAnswerRecommendationEngine.analyze_quiz_result(result)
+        if analyses is None:
+            return jsonify({'error': 'Failed to analyze answers'}), 500
+        
+        # Tên bài học gợi ý cho trang kết quả (một truy vấn IN qua cache cho cả lần nộp)
+        lessons = lesson_summaries.get_many(lid for a in analyses for lid in a['recommended_lessons'])
+        for analysis in analyses:
+            analysis['recommended_lessons_detail'] = [
+                lessons[lid] for lid in analysis['recommended_lessons'] if lid in lessons
+            ]
+        
+        return jsonify({
+            'analyses': analyses,
+            'total': len(analyses),
+            'ai_analysis_pending': answer_analysis.pending(),
+            'message': 'Answers analyzed successfully'
+        }), 201
+        
+    except Exception as e:
+        logger.error(f"[IncorrectAnswer] Error analyzing result: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
 @bp.route('/api/incorrect-answers/insights', methods=['GET'])
 @jwt_required()
 def get_incorrect_answer_insights():
@@ -191,20 +206,12 @@ def get_incorrect_answer_detail(analysis_id):
         if not analysis:
             return jsonify({'error': 'Analysis not found'}), 404
         
-        # Lấy thông tin lesson được gợi ý
-        recommended_lessons = []
-        if analysis.recommended_lessons:
-            try:
-                import json
-                lesson_ids = json.loads(analysis.recommended_lessons)
-                for lid in lesson_ids:
-                    lesson = Lesson.query.get(lid)
-                    if lesson:
-                        recommended_lessons.append(lesson.to_dict())
-            except Exception as e:
-                logger.debug(f"[IncorrectAnswer] Failed to parse recommended_lessons JSON: {e}")
-        
-        result = analysis.to_dict()
+        # Lấy thông tin lesson được gợi ý (một truy vấn IN qua cache, không tải nội dung bài học)
+        lesson_ids = IncorrectAnswerLesson.lesson_ids_for([analysis_id]).get(analysis_id, [])
+        lessons = lesson_summaries.get_many(lesson_ids)
+        recommended_lessons = [lessons[lid] for lid in lesson_ids if lid in lessons]
+        
+        result = analysis.to_dict(lesson_ids)
         result['recommended_lessons_detail'] = recommended_lessons
         
         return jsonify(result), 200
@@ -229,33 +236,21 @@ def get_related_incorrect_answers(lesson_id):
         if not lesson:
             return jsonify({'error': 'Lesson not found'}), 404
         
-        # Lấy những câu hỏi của bài học này
-        questions = QuizQuestion.query.filter_by(lesson_id=lesson_id).all()
-        question_ids = [q.question_id for q in questions]
-        
-        if not question_ids:
-            return jsonify({
-                'lesson_id': lesson_id,
-                'lesson_title': lesson.lesson_title,
-                'related_mistakes': [],
-                'message': 'No quiz questions for this lesson'
-            }), 200
-        
-        # Lấy những lỗi sai liên quan
-        from sqlalchemy import func
-        mistakes = db.session.query(
-            IncorrectAnswerAnalysis
+        # Những lỗi sai có gợi ý bài học này
+        mistakes = IncorrectAnswerAnalysis.query.join(
+            IncorrectAnswerLesson, IncorrectAnswerLesson.analysis_id == IncorrectAnswerAnalysis.analysis_id
         ).filter(
             IncorrectAnswerAnalysis.user_id == user_id,
-            IncorrectAnswerAnalysis.question_id.in_(question_ids)
+            IncorrectAnswerLesson.lesson_id == lesson_id
         ).order_by(
             IncorrectAnswerAnalysis.created_at.desc()
         ).all()
+        lesson_ids = IncorrectAnswerLesson.lesson_ids_for([m.analysis_id for m in mistakes])
         
         return jsonify({
             'lesson_id': lesson_id,
             'lesson_title': lesson.lesson_title,
-            'related_mistakes': [m.to_dict() for m in mistakes],
+            'related_mistakes': [m.to_dict(lesson_ids.get(m.analysis_id, [])) for m in mistakes],
             'total_related_mistakes': len(mistakes)
         }), 200
         
@@ -1,16 +1,29 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
-from utils import get_current_user_id
+from utils import get_current_user_id, parse_fields
 from models import db, Lesson, LessonProgress, Enrollment, User
 from datetime import datetime
 from models import Quiz, QuizQuestion, QuizQuestionMapping
+from services.course_progress import get_lesson_progress_rows
+from services import dashboard_snapshot, progress_counters, lesson_activity
+from services.analytics_cache import analytics_cache
+from services.unit_of_work import read_only, transactional
 
 bp = Blueprint('lessons', __name__)
 
+# Fields of the course lesson listing (no lesson bodies; see ?fields=)
+LISTING_FIELDS = Lesson.SUMMARY_FIELDS + ('is_completed', 'time_spent_minutes')
+
 @bp.route('/course/<int:course_id>', methods=['GET'])
 @jwt_required()
+@read_only
 def get_course_lessons(course_id):
     try:
+        try:
+            fields = parse_fields(request.args.get('fields'), LISTING_FIELDS, LISTING_FIELDS)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         user_id = get_current_user_id()
         
         # Allow access if user is admin or enrolled in the course
@@ -22,19 +35,21 @@ def get_course_lessons(course_id):
             if not enrollment:
                 return jsonify({'error': 'Not enrolled in this course'}), 403
         
-        lessons = Lesson.query.filter_by(course_id=course_id).order_by(Lesson.lesson_order).all()
-        
-        lesson_list = []
-        for lesson in lessons:
-            lesson_data = lesson.to_dict()
-            if not is_admin:
-                progress = LessonProgress.query.filter_by(user_id=user_id, lesson_id=lesson.lesson_id).first()
-                lesson_data['is_completed'] = progress.is_completed if progress else False
-                lesson_data['time_spent_minutes'] = progress.time_spent_minutes if progress else 0
-            else:
-                lesson_data['is_completed'] = False
-                lesson_data['time_spent_minutes'] = 0
-            lesson_list.append(lesson_data)
+        # One LEFT JOIN to the user's progress; lesson_content is not loaded for the listing
+        rows = get_lesson_progress_rows(course_id, None if is_admin else user_id)
+        
+        lesson_list = [{
+            'lesson_id': lesson_id,
+            'course_id': course_id,
+            'lesson_title': lesson_title,
+            'lesson_order': lesson_order,
+            'video_url': video_url,
+            'duration_minutes': duration_minutes,
+            'is_completed': bool(is_completed),
+            'time_spent_minutes': time_spent or 0
+        } for lesson_id, lesson_title, lesson_order, video_url, duration_minutes, is_completed, time_spent in rows]
+        if fields != LISTING_FIELDS:
+            lesson_list = [{field: lesson[field] for field in fields} for lesson in lesson_list]
         
         return jsonify(lesson_list), 200
         
@@ -43,6 +58,7 @@ def get_course_lessons(course_id):
 
 @bp.route('/<int:lesson_id>', methods=['GET'])
 @jwt_required()
+@read_only
 def get_lesson(lesson_id):
     try:
         user_id = get_current_user_id()
@@ -67,25 +83,15 @@ def get_lesson(lesson_id):
         logger = logging.getLogger(__name__)
         logger.info(f"Lesson content for ID {lesson_id}: {repr(lesson_data.get('lesson_content', '')[:100])}")
         
-        # Only track progress for non-admin users
+        # Only track progress for non-admin users. The access timestamp goes through
+        # the write buffer (batched flush) so this GET does not write to lesson_progress.
         if not is_admin:
             progress = LessonProgress.query.filter_by(user_id=user_id, lesson_id=lesson_id).first()
+            accessed_at = lesson_activity.record_access(user_id, lesson_id)
             
-            if progress:
-                progress.last_accessed = datetime.utcnow()
-            else:
-                progress = LessonProgress(
-                    user_id=user_id,
-                    lesson_id=lesson_id,
-                    last_accessed=datetime.utcnow()
-                )
-                db.session.add(progress)
-            
-            db.session.commit()
-            
-            lesson_data['is_completed'] = progress.is_completed
-            lesson_data['time_spent_minutes'] = progress.time_spent_minutes
-            lesson_data['last_accessed'] = progress.last_accessed.isoformat() if progress.last_accessed else None
+            lesson_data['is_completed'] = bool(progress and progress.is_completed)
+            lesson_data['time_spent_minutes'] = (progress.time_spent_minutes or 0) if progress else 0
+            lesson_data['last_accessed'] = accessed_at.isoformat()
         else:
             # For admins viewing lesson, don't include progress data
             lesson_data['is_completed'] = False
@@ -99,8 +105,48 @@ def get_lesson(lesson_id):
         return jsonify({'error': str(e)}), 500
 
 
+def _event_lesson_id(event):
+    try:
+        return int(event['lesson_id'])
+    except (TypeError, KeyError, ValueError):
+        return None
+
+@bp.route('/heartbeat', methods=['POST'])
+@jwt_required()
+def lesson_heartbeat():
+    """Batched learning-time heartbeats: {"sent_ts": 1700000000.0, "events": [{"lesson_id", "seconds", "client_ts"}]}
+
+    Timestamps are epoch seconds on the client clock. Nothing is written here;
+    time is merged in memory and flushed to time_spent_minutes in batches.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        events = data.get('events')
+        if not isinstance(events, list):
+            return jsonify({'error': 'events must be a list'}), 400
+        
+        user_id = get_current_user_id()
+        events = events[:100]
+        
+        # Only lessons of courses the user is enrolled in (one query for the whole batch)
+        lesson_ids = {_event_lesson_id(event) for event in events} - {None}
+        enrolled = {row[0] for row in db.session.query(Lesson.lesson_id).join(
+            Enrollment, Enrollment.course_id == Lesson.course_id
+        ).filter(
+            Enrollment.user_id == user_id,
+            Lesson.lesson_id.in_(lesson_ids)
+        ).all()} if lesson_ids else set()
+        events = [event for event in events if _event_lesson_id(event) in enrolled]
+        
+        accepted = lesson_activity.heartbeats.record(user_id, events, data.get('sent_ts'))
+        return jsonify({'accepted_seconds': round(accepted, 1)}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @bp.route('/<int:lesson_id>/quiz', methods=['GET'])
 @jwt_required()
+@read_only
 def get_lesson_quiz(lesson_id):
     """Return the quiz associated with a lesson (if any)"""
     try:
@@ -117,9 +163,8 @@ def get_lesson_quiz(lesson_id):
             if not enrollment:
                 return jsonify({'error': 'Not enrolled in this course'}), 403
 
-        # Find quiz by naming convention created by AI: LessonQuiz:{lesson_id}:
-        prefix = f"LessonQuiz:{lesson_id}:"
-        quiz = Quiz.query.filter(Quiz.quiz_name.startswith(prefix)).first()
+        # Current quiz is tracked directly on the lesson row
+        quiz = Quiz.query.get(lesson.current_quiz_id) if lesson.current_quiz_id else None
         if not quiz:
             return jsonify({'message': 'No quiz available for this lesson yet'}), 200
 
@@ -153,6 +198,7 @@ def get_lesson_quiz(lesson_id):
 
 @bp.route('/<int:lesson_id>/complete', methods=['POST'])
 @jwt_required()
+@transactional
 def complete_lesson(lesson_id):
     try:
         user_id = get_current_user_id()
@@ -161,38 +207,17 @@ def complete_lesson(lesson_id):
         if not lesson:
             return jsonify({'error': 'Lesson not found'}), 404
         
-        progress = LessonProgress.query.filter_by(user_id=user_id, lesson_id=lesson_id).first()
+        now = datetime.utcnow()
+        newly_completed = progress_counters.mark_completed(user_id, lesson_id, now)
         
-        if not progress:
-            progress = LessonProgress(
-                user_id=user_id,
-                lesson_id=lesson_id,
-                is_completed=True,
-                completion_date=datetime.utcnow()
-            )
-            db.session.add(progress)
-        else:
-            progress.is_completed = True
-            if not progress.completion_date:
-                progress.completion_date = datetime.utcnow()
-        
-        # Update course progress
-        enrollment = Enrollment.query.filter_by(user_id=user_id, course_id=lesson.course_id).first()
-        if enrollment:
-            total_lessons = Lesson.query.filter_by(course_id=lesson.course_id).count()
-            # Get all lessons for this course
-            all_lessons = Lesson.query.filter_by(course_id=lesson.course_id).all()
-            lesson_ids = [l.lesson_id for l in all_lessons]
-            completed_progress = LessonProgress.query.filter(
-                LessonProgress.user_id == user_id,
-                LessonProgress.lesson_id.in_(lesson_ids),
-                LessonProgress.is_completed == True
-            ).count()
-            
-            enrollment.progress_percentage = (completed_progress / total_lessons * 100) if total_lessons > 0 else 0
-        
-        db.session.commit()
+        # Update course progress: O(1) counter bump, only the first time a lesson is completed
+        if newly_completed:
+            analytics_cache.invalidate(user_id)
+            enrollment = progress_counters.on_lesson_completed(user_id, lesson.course_id)
+            if enrollment:
+                dashboard_snapshot.on_lesson_completed(user_id, lesson.course_id, enrollment.progress_percentage)
         
+        progress = LessonProgress.query.filter_by(user_id=user_id, lesson_id=lesson_id).first()
         return jsonify({
             'message': 'Lesson marked as completed',
             'progress': {
@@ -4,11 +4,15 @@ from utils import get_current_user_id
 # Thêm Course vào dòng import này để dùng cho toàn file
 from models import db, Enrollment, LessonProgress, Lesson, QuizResult, Topic, LearningAnalytics, Quiz, Course
 from sqlalchemy import func
+from services.course_progress import get_lesson_progress_rows
+from services import dashboard_snapshot
+from services.unit_of_work import read_only
 
 bp = Blueprint('progress', __name__)
 
 @bp.route('/course/<int:course_id>', methods=['GET'])
 @jwt_required()
+@read_only
 def get_course_progress(course_id):
     try:
         user_id = get_current_user_id()
@@ -17,26 +21,25 @@ def get_course_progress(course_id):
         if not enrollment:
             return jsonify({'error': 'Not enrolled in this course'}), 404
         
-        # Get all lessons
-        lessons = Lesson.query.filter_by(course_id=course_id).order_by(Lesson.lesson_order).all()
+        # Lessons + this user's progress in one LEFT JOIN (no per-lesson queries)
+        rows = get_lesson_progress_rows(course_id, user_id)
         
         completed_count = 0
         total_time = 0
         lesson_details = []
         
-        for lesson in lessons:
-            progress = LessonProgress.query.filter_by(user_id=user_id, lesson_id=lesson.lesson_id).first()
-            is_completed = progress.is_completed if progress else False
-            time_spent = progress.time_spent_minutes if progress else 0
+        for lesson_id, lesson_title, lesson_order, _, _, is_completed, time_spent in rows:
+            is_completed = bool(is_completed)
+            time_spent = time_spent or 0
             
             if is_completed:
                 completed_count += 1
             total_time += time_spent
             
             lesson_details.append({
-                'lesson_id': lesson.lesson_id,
-                'lesson_title': lesson.lesson_title,
-                'lesson_order': lesson.lesson_order,
+                'lesson_id': lesson_id,
+                'lesson_title': lesson_title,
+                'lesson_order': lesson_order,
                 'is_completed': is_completed,
                 'time_spent_minutes': time_spent
             })
@@ -46,7 +49,7 @@ def get_course_progress(course_id):
         return jsonify({
             'course_id': course_id,
             'progress_percentage': progress_percentage,
-            'total_lessons': len(lessons),
+            'total_lessons': len(rows),
             'completed_lessons': completed_count,
             'total_time_spent_minutes': total_time,
             'lessons': lesson_details
@@ -57,6 +60,7 @@ def get_course_progress(course_id):
 
 @bp.route('/analytics', methods=['GET'])
 @jwt_required()
+@read_only
 def get_learning_analytics():
     try:
         user_id = get_current_user_id()
@@ -99,63 +103,8 @@ def get_dashboard():
     try:
         user_id = get_current_user_id()
         
-        # Lấy danh sách khóa học đã đăng ký
-        enrollments = Enrollment.query.filter_by(user_id=user_id).all()
-        
-        # Xây dựng danh sách chi tiết (quan trọng để sửa lỗi frontend)
-        courses_progress = []
-        total_progress = 0
-        total_lessons_completed = 0
-        
-        for enrollment in enrollments:
-            course = Course.query.get(enrollment.course_id)
-            if course:
-                progress = float(enrollment.progress_percentage) if enrollment.progress_percentage else 0
-                total_progress += progress
-                
-                # Tính số bài học đã hoàn thành của khóa này
-                completed_lessons = LessonProgress.query.filter_by(
-                    user_id=user_id, is_completed=True
-                ).join(Lesson, Lesson.lesson_id == LessonProgress.lesson_id).filter(
-                    Lesson.course_id == course.course_id
-                ).count()
-                
-                total_lessons_completed += completed_lessons
-
-                courses_progress.append({
-                    'course_id': course.course_id,
-                    'course_name': course.course_name,
-                    'description': course.description,
-                    'thumbnail_url': course.thumbnail_url,
-                    'progress_percentage': progress,
-                    'completed_lessons': completed_lessons
-                })
-        
-        total_courses = len(courses_progress)
-        average_progress = (total_progress / total_courses) if total_courses > 0 else 0
-        
-        # Lấy kết quả quiz gần đây
-        recent_quizzes = QuizResult.query.filter_by(user_id=user_id).order_by(
-            QuizResult.submitted_at.desc()
-        ).limit(5).all()
-        
-        recent_quizzes_data = []
-        for q in recent_quizzes:
-            quiz = Quiz.query.get(q.quiz_id)
-            recent_quizzes_data.append({
-                'quiz_id': q.quiz_id,
-                'quiz_name': quiz.quiz_name if quiz else f"Quiz #{q.quiz_id}",
-                'score': float(q.score),
-                'submitted_at': q.submitted_at.isoformat() if q.submitted_at else None
-            })
-
-        return jsonify({
-            'total_courses': total_courses,
-            'average_progress': average_progress,
-            'total_lessons_completed': total_lessons_completed,
-            'courses_progress': courses_progress, # Trường này sửa lỗi undefined length
-            'recent_quizzes': recent_quizzes_data
-        }), 200
+        # Snapshot được cập nhật dần theo sự kiện (đăng ký, hoàn thành bài, nộp quiz): một lần đọc
+        return jsonify(dashboard_snapshot.get_dashboard(user_id)), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
@@ -1,14 +1,29 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
 from utils import get_current_user_id
-from models import db, Quiz, QuizQuestion, QuizResult, QuizAnswer, Topic, QuizQuestionMapping
+from models import db, Quiz, QuizQuestion, QuizResult, QuizAnswer, Topic, QuizQuestionMapping, QuizVariant, QuizAttempt
 from ai_models.ai_service import get_ai_service
+from services.question_pool import create_variant, open_variant, variant_question_ids
+from services.quiz_attempts import attempt_manager, AttemptError
+from services.grading import grade_answers, get_grader
+from services import dashboard_snapshot
+from services.analytics_cache import analytics_cache
+from services.unit_of_work import read_only, transactional
+from concurrent.futures import ThreadPoolExecutor
 import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# AI explanations requested at once for one submission
+AI_EXPLANATION_CONCURRENCY = 4
 
 bp = Blueprint('quizzes', __name__)
 
 @bp.route('', methods=['GET'])
 @jwt_required()
+@read_only
 def get_quizzes():
     try:
         course_id = request.args.get('course_id', type=int)
@@ -37,23 +52,39 @@ def get_quiz(quiz_id):
         
         quiz_data = quiz.to_dict()
         
-        # Get questions for this quiz
-        mappings = QuizQuestionMapping.query.filter_by(quiz_id=quiz_id).order_by(QuizQuestionMapping.question_order).all()
-        questions = []
-        for mapping in mappings:
-            question = QuizQuestion.query.get(mapping.question_id)
-            if question:
-                questions.append(question.to_dict(include_answer=False))
+        if quiz.pool_spec:
+            # Randomized quiz: show the student's ungraded variant, so a refresh keeps the questions
+            user_id = get_current_user_id()
+            variant = open_variant(quiz, user_id)
+            if variant:
+                question_ids = variant_question_ids(quiz, variant)
+            else:
+                # First visit: draw one from the question pools (the only write this endpoint makes)
+                variant, question_ids = create_variant(quiz, user_id)
+                db.session.commit()
+            by_id = {q.question_id: q for q in QuizQuestion.query.filter(QuizQuestion.question_id.in_(question_ids)).all()} if question_ids else {}
+            questions = [by_id[qid].to_dict(include_answer=False) for qid in question_ids if qid in by_id]
+            quiz_data['variant_id'] = variant.variant_id
+        else:
+            # Get questions for this quiz
+            mappings = QuizQuestionMapping.query.filter_by(quiz_id=quiz_id).order_by(QuizQuestionMapping.question_order).all()
+            questions = []
+            for mapping in mappings:
+                question = QuizQuestion.query.get(mapping.question_id)
+                if question:
+                    questions.append(question.to_dict(include_answer=False))
         
         quiz_data['questions'] = questions
         
         return jsonify(quiz_data), 200
         
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 @bp.route('/<int:quiz_id>/submit', methods=['POST'])
 @jwt_required()
+@transactional
 def submit_quiz(quiz_id):
     try:
         user_id = get_current_user_id()
@@ -62,125 +93,310 @@ def submit_quiz(quiz_id):
         if not quiz:
             return jsonify({'error': 'Quiz not found'}), 404
         
-        data = request.get_json()
+        # This one-shot endpoint trusts the client's clock; timed quizzes go through
+        # server-side attempts (POST /<quiz_id>/attempts) so the deadline is enforced
+        if quiz.time_limit_minutes:
+            return jsonify({'error': 'Timed quizzes must be submitted through an attempt'}), 409
+
+        data = request.get_json() or {}
         answers = data.get('answers', [])
-        time_taken_minutes = data.get('time_taken_minutes', 0)
-        
-        # Get questions
-        mappings = QuizQuestionMapping.query.filter_by(quiz_id=quiz_id).all()
-        question_ids = [m.question_id for m in mappings]
-        questions = {q.question_id: q for q in QuizQuestion.query.filter(QuizQuestion.question_id.in_(question_ids)).all()}
-
-        total_questions = len(questions)
-        correct_count = 0
-        answer_details = []
-
-        # Get AI service for generating explanations
-        ai_service = get_ai_service()
-        
-        for answer_data in answers:
-            question_id = answer_data.get('question_id')
-            selected_answer = answer_data.get('selected_answer')
-            time_spent = answer_data.get('time_spent_seconds', 0)
-
-            if question_id not in questions:
-                continue
-
-            question = questions[question_id]
-            is_correct = (selected_answer == question.correct_answer)
-
-            if is_correct:
-                correct_count += 1
-
-            # Build answer detail
-            answer_detail = {
-                'question_id': question_id,
-                'selected_answer': selected_answer,
-                'is_correct': is_correct,
-                'correct_answer': question.correct_answer,
-                'explanation': question.explanation,
-                'ai_explanation': None,
-                'time_spent_seconds': time_spent
-            }
-
-            # Generate AI explanation for wrong answers
-            if not is_correct and ai_service:
-                try:
-                    # FIX: Better options parsing to prevent crashes
-                    if isinstance(question.options, str):
-                        options = json.loads(question.options)
-                    elif isinstance(question.options, list):
-                        options = question.options
-                    else:
-                        options = []
-                except:
+        try:
+            time_taken_minutes = max(0, int(data.get('time_taken_minutes') or 0))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'time_taken_minutes must be an integer'}), 400
+
+        # Get questions (pool-based quizzes rebuild the student's variant from seed + pool version)
+        variant_id = None
+        if quiz.pool_spec:
+            variant = QuizVariant.query.get(data.get('variant_id')) if data.get('variant_id') else None
+            if not variant or variant.quiz_id != quiz_id or variant.user_id != user_id:
+                return jsonify({'error': 'Invalid or missing variant_id'}), 400
+            # A variant is graded once: not again here, and not if an attempt owns it
+            already_used = db.session.query(
+                QuizResult.query.filter_by(variant_id=variant.variant_id).exists()
+            ).scalar() or db.session.query(
+                QuizAttempt.query.filter_by(variant_id=variant.variant_id).exists()
+            ).scalar()
+            if already_used:
+                return jsonify({'error': 'This quiz variant has already been submitted'}), 409
+            variant_id = variant.variant_id
+            question_ids = variant_question_ids(quiz, variant)
+        else:
+            mappings = QuizQuestionMapping.query.filter_by(quiz_id=quiz_id).all()
+            question_ids = [m.question_id for m in mappings]
+
+        result, payload, pending_explanations = _grade_and_save(quiz, user_id, question_ids, answers, time_taken_minutes, variant_id)
+        db.session.commit()
+        _add_ai_explanations(pending_explanations)
+        
+        return jsonify({
+            'message': 'Quiz submitted successfully',
+            'result': payload
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+def _grade_and_save(quiz, user_id, question_ids, answers, time_taken_minutes, variant_id=None):
+    """Grade answers against the given questions and add the QuizResult / QuizAnswer rows.
+
+    Returns (result, response payload, pending AI explanations). The caller
+    commits, then passes the pending explanations to _add_ai_explanations so no
+    transaction stays open while the AI service answers.
+    """
+    questions = {q.question_id: q for q in QuizQuestion.query.filter(QuizQuestion.question_id.in_(question_ids)).all()} if question_ids else {}
+
+    total_questions = len(questions)
+    correct_count = 0
+    answer_details = []
+    pending_explanations = []
+    
+    for answer_data, is_correct in grade_answers(questions, answers):
+        question_id = answer_data.get('question_id')
+        selected_answer = answer_data.get('selected_answer')
+        time_spent = answer_data.get('time_spent_seconds', 0)
+
+        question = questions[question_id]
+
+        if is_correct:
+            correct_count += 1
+
+        # Build answer detail
+        answer_detail = {
+            'question_id': question_id,
+            'question_type': question.question_type or 'multiple_choice',
+            'selected_answer': selected_answer,
+            'is_correct': is_correct,
+            'correct_answer': question.correct_answer,
+            'explanation': question.explanation,
+            'ai_explanation': None,
+            'time_spent_seconds': time_spent
+        }
+        if question.question_type == 'short_answer':
+            answer_detail['accepted_answers'] = question.options
+
+        # Wrong answers get an AI explanation once the grade is committed
+        if not is_correct:
+            try:
+                # FIX: Better options parsing to prevent crashes
+                if isinstance(question.options, str):
+                    options = json.loads(question.options)
+                elif isinstance(question.options, list):
+                    options = question.options
+                else:
                     options = []
-                
-                try:
-                    user_answer_text = options[selected_answer] if isinstance(selected_answer, int) and selected_answer < len(options) else 'Không rõ'
-                    correct_answer_text = options[question.correct_answer] if isinstance(question.correct_answer, int) and question.correct_answer < len(options) else 'Không rõ'
-                    
-                    ai_exp = ai_service.generate_explanation(
-                        question.question_text,
-                        user_answer_text,
-                        correct_answer_text
-                    )
-                    if ai_exp:
-                        answer_detail['ai_explanation'] = ai_exp
-                except Exception as e:
-                    import logging
-                    logging.getLogger(__name__).warning(f"Failed to generate AI explanation for question {question_id}: {e}")
-
-            answer_details.append(answer_detail)
-        
-        score = (correct_count / total_questions * 100) if total_questions > 0 else 0
-        
-        # Save quiz result
-        result = QuizResult(
-            user_id=user_id,
-            quiz_id=quiz_id,
-            score=score,
-            total_questions=total_questions,
-            correct_answers=correct_count,
-            time_taken_minutes=time_taken_minutes
+            except:
+                options = []
+            
+            try:
+                grader = get_grader(question.question_type)
+                user_answer_text = grader.describe(options, selected_answer)
+                if question.question_type == 'short_answer':
+                    correct_answer_text = ' / '.join(str(opt) for opt in options) or 'Không rõ'
+                else:
+                    correct_answer_text = grader.describe(options, question.correct_answer)
+                pending_explanations.append((answer_detail, question.question_text, user_answer_text, correct_answer_text))
+            except Exception as e:
+                logger.warning(f"Failed to prepare AI explanation for question {question_id}: {e}")
+
+        answer_details.append(answer_detail)
+    
+    score = (correct_count / total_questions * 100) if total_questions > 0 else 0
+    
+    # Save quiz result
+    result = QuizResult(
+        user_id=user_id,
+        quiz_id=quiz.quiz_id,
+        score=score,
+        total_questions=total_questions,
+        correct_answers=correct_count,
+        time_taken_minutes=time_taken_minutes,
+        variant_id=variant_id
+    )
+    db.session.add(result)
+    db.session.flush()
+    
+    # Save individual answers
+    for detail in answer_details:
+        selected, answer_text = get_grader(detail['question_type']).to_storage(detail['selected_answer'])
+        quiz_answer = QuizAnswer(
+            result_id=result.result_id,
+            question_id=detail['question_id'],
+            selected_answer=selected,
+            answer_text=answer_text,
+            is_correct=detail['is_correct'],
+            time_spent_seconds=detail['time_spent_seconds']
         )
-        db.session.add(result)
-        db.session.flush()
-        
-        # Save individual answers
-        for answer_data in answers:
-            question_id = answer_data.get('question_id')
-            if question_id in questions:
-                question = questions[question_id]
-                quiz_answer = QuizAnswer(
-                    result_id=result.result_id,
-                    question_id=question_id,
-                    selected_answer=answer_data.get('selected_answer'),
-                    is_correct=(answer_data.get('selected_answer') == question.correct_answer),
-                    time_spent_seconds=answer_data.get('time_spent_seconds', 0)
-                )
-                db.session.add(quiz_answer)
+        db.session.add(quiz_answer)
+    
+    dashboard_snapshot.on_quiz_submitted(user_id, quiz, result)
+    analytics_cache.invalidate(user_id)
+    
+    return result, {
+        'result_id': result.result_id,
+        'score': float(score),
+        'total_questions': total_questions,
+        'correct_answers': correct_count,
+        'passed': score >= quiz.passing_score,
+        'answers': answer_details
+    }, pending_explanations
+
+def _add_ai_explanations(pending_explanations):
+    """Fill 'ai_explanation' of the wrong answers in a graded payload (no database access)"""
+    if not pending_explanations:
+        return
+    ai_service = get_ai_service()
+    if not ai_service:
+        return
+    
+    def explain(item):
+        answer_detail, question_text, user_answer_text, correct_answer_text = item
+        try:
+            ai_exp = ai_service.generate_explanation(question_text, user_answer_text, correct_answer_text)
+            if ai_exp:
+                answer_detail['ai_explanation'] = ai_exp
+        except Exception as e:
+            logger.warning(f"Failed to generate AI explanation for question {answer_detail['question_id']}: {e}")
+    
+    with ThreadPoolExecutor(max_workers=min(AI_EXPLANATION_CONCURRENCY, len(pending_explanations))) as pool:
+        list(pool.map(explain, pending_explanations))
+
+@bp.route('/<int:quiz_id>/attempts', methods=['POST'])
+@jwt_required()
+def start_attempt(quiz_id):
+    """Start a server-side attempt, or resume the open one after a refresh.
+
+    An attempt left running past its deadline (page closed) is graded with the
+    answers saved in time and returned with its 'result'; the next call starts
+    a new attempt.
+    """
+    try:
+        user_id = get_current_user_id()
+        quiz = Quiz.query.get(quiz_id)
+        if not quiz:
+            return jsonify({'error': 'Quiz not found'}), 404
         
-        db.session.commit()
+        state = attempt_manager.start(quiz, user_id)
+        quiz_data = _attempt_payload(quiz, state)
+        if not attempt_manager.is_open(state):
+            payload = _submit_attempt(quiz, state, user_id)
+            if payload is None:
+                return jsonify({'error': 'Attempt already submitted'}), 409
+            quiz_data['attempt'].update(status='submitted', remaining_seconds=0)
+            quiz_data['result'] = payload
+        return jsonify(quiz_data), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"[QuizAttempts] Start failed for quiz {quiz_id}: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/attempts/<attempt_id>', methods=['GET'])
+@jwt_required()
+@read_only
+def get_attempt(attempt_id):
+    try:
+        state = attempt_manager.get(attempt_id, get_current_user_id())
+        return jsonify(_attempt_payload(Quiz.query.get(state['quiz_id']), state)), 200
+        
+    except AttemptError as e:
+        return jsonify({'error': str(e)}), e.status
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/attempts/<attempt_id>/answers', methods=['POST'])
+@jwt_required()
+def save_attempt_answers(attempt_id):
+    """Autosave a batch of answer deltas: {"answers": [{"question_id", "selected_answer", "time_spent_seconds"}]}
+
+    A delta {"question_id", "clear": true} withdraws a saved answer.
+    """
+    try:
+        data = request.get_json() or {}
+        saved = attempt_manager.save_answers(attempt_id, get_current_user_id(), data.get('answers', []))
+        state = attempt_manager.get(attempt_id, get_current_user_id())
+        return jsonify({
+            'saved': saved['saved'],
+            'remaining_seconds': attempt_manager.remaining_seconds(state)
+        }), 200
+        
+    except AttemptError as e:
+        return jsonify({'error': str(e)}), e.status
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/attempts/<attempt_id>/submit', methods=['POST'])
+@jwt_required()
+def submit_attempt(attempt_id):
+    """Grade the saved attempt. A final batch of deltas may be sent along while time remains."""
+    try:
+        user_id = get_current_user_id()
+        data = request.get_json(silent=True) or {}
+        state = attempt_manager.get(attempt_id, user_id)
+        if state['status'] != 'in_progress':
+            return jsonify({'error': 'Attempt already submitted'}), 409
+        
+        if data.get('answers'):
+            try:
+                attempt_manager.save_answers(attempt_id, user_id, data['answers'])
+            except AttemptError:
+                pass  # past the deadline: grade what was saved in time
+            state = attempt_manager.get(attempt_id, user_id)
+        
+        payload = _submit_attempt(Quiz.query.get(state['quiz_id']), state, user_id)
+        if payload is None:
+            return jsonify({'error': 'Attempt already submitted'}), 409
         
         return jsonify({
             'message': 'Quiz submitted successfully',
-            'result': {
-                'result_id': result.result_id,
-                'score': float(score),
-                'total_questions': total_questions,
-                'correct_answers': correct_count,
-                'passed': score >= quiz.passing_score,
-                'answers': answer_details
-            }
+            'result': payload
         }), 200
         
+    except AttemptError as e:
+        return jsonify({'error': str(e)}), e.status
     except Exception as e:
         db.session.rollback()
+        logger.error(f"[QuizAttempts] Submit failed for attempt {attempt_id}: {e}")
         return jsonify({'error': str(e)}), 500
 
+def _submit_attempt(quiz, state, user_id):
+    """Claim, grade and close an attempt; returns the result payload, or None when
+    another request claimed the attempt first"""
+    if not attempt_manager.claim(state['attempt_id']):
+        db.session.rollback()
+        return None
+    
+    elapsed_minutes = max(0, int((time.time() - state['started_at']) // 60))
+    if quiz.time_limit_minutes:
+        elapsed_minutes = min(elapsed_minutes, quiz.time_limit_minutes)
+    
+    result, payload, pending_explanations = _grade_and_save(
+        quiz, user_id, state['question_ids'],
+        attempt_manager.answers_for_grading(state),
+        elapsed_minutes, state.get('variant_id')
+    )
+    attempt_manager.finish(state['attempt_id'], result.result_id)
+    db.session.commit()
+    _add_ai_explanations(pending_explanations)
+    return payload
+
+def _attempt_payload(quiz, state):
+    by_id = {q.question_id: q for q in QuizQuestion.query.filter(QuizQuestion.question_id.in_(state['question_ids'])).all()} if state['question_ids'] else {}
+    quiz_data = quiz.to_dict()
+    quiz_data['questions'] = [by_id[qid].to_dict(include_answer=False) for qid in state['question_ids'] if qid in by_id]
+    quiz_data['variant_id'] = state.get('variant_id')
+    quiz_data['attempt'] = {
+        'attempt_id': state['attempt_id'],
+        'status': state['status'],
+        'answers': state['answers'],
+        'remaining_seconds': attempt_manager.remaining_seconds(state)
+    }
+    return quiz_data
+
 @bp.route('/results', methods=['GET'])
 @jwt_required()
+@read_only
 def get_quiz_results():
     try:
         user_id = get_current_user_id()
@@ -198,6 +414,7 @@ def get_quiz_results():
 
 @bp.route('/questions', methods=['GET'])
 @jwt_required()
+@read_only
 def get_questions():
     try:
         course_id = request.args.get('course_id', type=int)
@@ -0,0 +1 @@
+# Services package (in-process subsystems shared by routes)
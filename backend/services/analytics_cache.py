@@ -0,0 +1,214 @@
+"""Per-user cache for the learning analytics endpoints.
+
+Computed payloads are cached per (user, view) in an LRU store with a TTL
+(in-process by default; ANALYTICS_CACHE_STORE may name a shared-store
+subclass instead). Each user has a generation token that is part of every
+key, so `invalidate(user_id)` drops all of that user's views at once. The
+events that change analytics call it: quiz submission, first completion of a
+lesson, enrollment and unenrollment. It runs immediately and again after the
+surrounding transaction commits, so a read that raced with the write cannot
+leave a stale entry behind. Course structure edits call `invalidate_all()`.
+
+Concurrent misses for the same key are computed once per process
+(services/singleflight.py): the first request computes, the others wait
+for its result.
+"""
+import importlib
+import logging
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db
+from services.singleflight import flights
+
+logger = logging.getLogger(__name__)
+
+_PENDING = 'analytics_cache_pending'
+
+
+class AnalyticsCacheStore(ABC):
+    """Key-value interface with per-entry TTL (values are JSON-serializable).
+
+    Shared-store implementations should rely on the backend's own expiry.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+
+class InMemoryLRUStore(AnalyticsCacheStore):
+    """Per-process LRU store; the least recently used entry goes first when full"""
+
+    def __init__(self, max_entries: int = 2000):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._data: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def _load_store(spec: str, max_entries: int) -> AnalyticsCacheStore:
+    if not spec or spec == 'memory':
+        return InMemoryLRUStore(max_entries)
+    module_name, _, class_name = spec.rpartition('.')
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+class AnalyticsCache:
+    """Cached analytics payloads with per-user invalidation and hit/miss metrics"""
+
+    def __init__(self):
+        self.store: AnalyticsCacheStore = InMemoryLRUStore()
+        self.ttl = 300.0
+        self.enabled = True
+        self._metrics_lock = threading.Lock()
+        self.metrics = {'hits': 0, 'misses': 0, 'coalesced': 0, 'invalidations': 0}
+
+    def init_app(self, app) -> None:
+        self.enabled = app.config.get('ANALYTICS_CACHE_ENABLED', True)
+        self.ttl = app.config.get('ANALYTICS_CACHE_TTL_SECONDS', self.ttl)
+        self.store = _load_store(app.config.get('ANALYTICS_CACHE_STORE', 'memory'),
+                                 app.config.get('ANALYTICS_CACHE_MAX_ENTRIES', 2000))
+
+    def _count(self, name: str) -> None:
+        with self._metrics_lock:
+            self.metrics[name] += 1
+
+    # Generations: a new token orphans every key built with the old one
+
+    def _generation(self, name: str) -> str:
+        key = f'analytics:gen:{name}'
+        token = self.store.get(key)
+        if token is None:
+            token = uuid.uuid4().hex[:12]
+            self.store.set(key, token)
+        return token
+
+    def _key(self, user_id: int, view: str) -> str:
+        return f"analytics:{self._generation('*')}:{user_id}:{self._generation(str(user_id))}:{view}"
+
+    def _bump(self, name: str) -> None:
+        self.store.set(f'analytics:gen:{name}', uuid.uuid4().hex[:12])
+
+    # Public API
+
+    def get_or_compute(self, user_id: int, view: str, compute: Callable[[], Any]) -> Any:
+        """Cached value of `view` for the user, computing it at most once per process on a miss.
+
+        `compute` must raise on failure; whatever it returns is cached for the TTL.
+        """
+        if not self.enabled:
+            return compute()
+        key = self._key(user_id, view)
+        value = self.store.get(key)
+        if value is not None:
+            self._count('hits')
+            return value
+
+        def compute_and_store():
+            result = compute()
+            # Not stored if the user was invalidated while computing
+            if self._key(user_id, view) == key:
+                self.store.set(key, result, self.ttl)
+            return result
+
+        value, shared = flights.do(key, compute_and_store)
+        self._count('coalesced' if shared else 'misses')
+        return value
+
+    def invalidate(self, user_id: int) -> None:
+        """Drop the user's cached analytics now and again after the current transaction commits"""
+        self._bump(str(user_id))
+        self._count('invalidations')
+        session = db.session()
+        if session.in_transaction():
+            session.info.setdefault(_PENDING, set()).add(str(user_id))
+
+    def invalidate_all(self) -> None:
+        """Drop every user's cached analytics (course or lesson structure changed)"""
+        self._bump('*')
+        self._count('invalidations')
+        session = db.session()
+        if session.in_transaction():
+            session.info.setdefault(_PENDING, set()).add('*')
+
+    def _after_commit(self, names) -> None:
+        for name in names:
+            self._bump(name)
+
+    def stats(self) -> Dict:
+        with self._metrics_lock:
+            metrics = dict(self.metrics)
+        lookups = metrics['hits'] + metrics['misses']
+        metrics['hit_rate'] = round(metrics['hits'] / lookups, 4) if lookups else None
+        metrics['ttl_seconds'] = self.ttl
+        if isinstance(self.store, InMemoryLRUStore):
+            metrics['entries'] = len(self.store)
+            metrics['evictions'] = self.store.evictions
+        return metrics
+
+
+analytics_cache = AnalyticsCache()
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    names = session.info.pop(_PENDING, None)
+    if names:
+        analytics_cache._after_commit(names)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending(session):
+    session.info.pop(_PENDING, None)
@@ -0,0 +1,106 @@
+"""Background AI analysis of incorrect answers.
+
+Bulk analysis (IncorrectAnswerRecommendationEngine.analyze_quiz_result)
+stores its rows with a placeholder ai_analysis and queues one prompt per
+row here, so the request does not wait for the model. A background thread
+sends the queued prompts (AI_CONCURRENCY at a time) every flush interval
+and writes the answers back with one bulk UPDATE. Prompts whose AI call
+fails keep the placeholder; they are logged, not retried.
+
+The final flush runs from atexit, where no executor accepts new work and
+new threads may be refused, so the flushing thread always works through
+the prompts itself and extra worker threads are only a speed-up.
+"""
+import logging
+import queue
+import threading
+from typing import Dict
+
+from sqlalchemy import update
+
+from models import db, IncorrectAnswerAnalysis
+from services.write_buffer import CoalescingBuffer
+
+logger = logging.getLogger(__name__)
+
+AI_CONCURRENCY = 4
+
+
+def _generate(ai_service, prompt: str):
+    try:
+        return ai_service.generate_response(prompt)
+    except Exception as e:
+        logger.warning(f"[IncorrectAnswer] Background AI analysis failed: {e}")
+        return None
+
+
+def _generate_all(ai_service, batch: Dict[int, str]) -> Dict[int, str]:
+    """Run the prompts on up to AI_CONCURRENCY threads, the calling thread included"""
+    work = queue.Queue()
+    for item in batch.items():
+        work.put(item)
+    texts = {}
+
+    def worker():
+        while True:
+            try:
+                analysis_id, prompt = work.get_nowait()
+            except queue.Empty:
+                return
+            texts[analysis_id] = _generate(ai_service, prompt)
+
+    helpers = []
+    for _ in range(min(AI_CONCURRENCY, len(batch)) - 1):
+        thread = threading.Thread(target=worker, name='incorrect-answer-ai-worker', daemon=True)
+        try:
+            thread.start()
+        except RuntimeError:
+            break  # interpreter shutting down: the calling thread does the rest
+        helpers.append(thread)
+    worker()
+    for thread in helpers:
+        thread.join()
+    return texts
+
+
+def _flush(batch: Dict[int, str]) -> None:
+    from ai_models.ai_service import get_ai_service
+    try:
+        ai_service = get_ai_service()
+    except Exception as e:
+        logger.warning(f"[IncorrectAnswer] AI service unavailable, dropping {len(batch)} queued analyses: {e}")
+        return
+    if not ai_service:
+        return
+
+    texts = _generate_all(ai_service, batch)
+    rows = [{'analysis_id': analysis_id, 'ai_analysis': text} for analysis_id, text in texts.items() if text]
+    if not rows:
+        return
+    try:
+        # Rows deleted meanwhile are simply not matched
+        db.session.execute(update(IncorrectAnswerAnalysis), rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    logger.info(f"[IncorrectAnswer] Stored background AI analysis for {len(rows)} answers")
+
+
+analysis_queue = CoalescingBuffer('incorrect-answer-ai', _flush, interval=2.0, max_entries=50)
+
+
+def enqueue(analysis_id: int, prompt: str) -> None:
+    analysis_queue.add(analysis_id, prompt)
+
+
+def pending() -> int:
+    return len(analysis_queue)
+
+
+def init_app(app) -> None:
+    analysis_queue.init_app(
+        app,
+        interval=app.config.get('INCORRECT_ANSWER_AI_FLUSH_SECONDS', 2),
+        max_entries=app.config.get('INCORRECT_ANSWER_AI_MAX_PENDING', 50)
+    )
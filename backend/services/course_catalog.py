@@ -0,0 +1,103 @@
+"""Course catalog (GET /api/courses) with a versioned in-memory cache.
+
+The shared part of the catalog (active courses and their to_dict()) is the
+same for every student, so it is cached per process under a version number.
+Admin course/lesson edits call `invalidate()` after committing, which bumps
+the version; a build that raced with an edit is discarded instead of stored.
+Other worker processes do not see the bump, so entries also expire after
+COURSE_CATALOG_TTL_SECONDS. The per-user part (enrollment and progress) is
+always read fresh: one outer join on a cache miss, one enrollment query on a hit.
+"""
+import hashlib
+import json
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import and_
+
+from models import db, Course, Enrollment
+
+DEFAULT_TTL_SECONDS = 60
+
+_lock = threading.Lock()
+_version = 0
+_entry: Optional[Dict] = None  # {'version', 'built_at', 'courses', 'course_ids', 'digest'}
+
+
+def invalidate() -> None:
+    """Drop the cached catalog (call after committing a course or lesson change)"""
+    global _version, _entry
+    with _lock:
+        _version += 1
+        _entry = None
+
+
+def _ttl() -> float:
+    return current_app.config.get('COURSE_CATALOG_TTL_SECONDS', DEFAULT_TTL_SECONDS)
+
+
+def _store(version: int, courses: List[Dict]) -> Dict:
+    global _entry
+    digest = hashlib.sha1(json.dumps(courses, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    entry = {
+        'version': version,
+        'built_at': time.monotonic(),
+        'courses': courses,
+        'course_ids': {course['course_id'] for course in courses},
+        'digest': digest
+    }
+    with _lock:
+        if version == _version:
+            _entry = entry
+    return entry
+
+
+def _progress(value) -> float:
+    return float(value) if value else 0
+
+
+def load(user_id: int) -> Tuple[Dict, Dict[int, float]]:
+    """Return (catalog entry, {course_id: progress_percentage} for the user's enrollments)"""
+    with _lock:
+        entry, version = _entry, _version
+    if entry and time.monotonic() - entry['built_at'] < _ttl():
+        enrollments = {
+            course_id: _progress(progress)
+            for course_id, progress in db.session.query(
+                Enrollment.course_id, Enrollment.progress_percentage
+            ).filter(Enrollment.user_id == user_id).all()
+            if course_id in entry['course_ids']
+        }
+        return entry, enrollments
+
+    rows = db.session.query(Course, Enrollment.enrollment_id, Enrollment.progress_percentage).outerjoin(
+        Enrollment, and_(Enrollment.course_id == Course.course_id, Enrollment.user_id == user_id)
+    ).filter(Course.is_active == True).order_by(Course.course_id).all()
+    entry = _store(version, [course.to_dict() for course, _, _ in rows])
+    enrollments = {
+        course.course_id: _progress(progress)
+        for course, enrollment_id, progress in rows if enrollment_id is not None
+    }
+    return entry, enrollments
+
+
+def etag(entry: Dict, enrollments: Dict[int, float], enrolled_only: bool) -> str:
+    """Validator covering the shared catalog content and this user's view of it"""
+    user_part = json.dumps(sorted(enrollments.items()))
+    return hashlib.sha1(f"{entry['digest']}|{user_part}|{int(enrolled_only)}".encode('utf-8')).hexdigest()
+
+
+def render(entry: Dict, enrollments: Dict[int, float], enrolled_only: bool) -> List[Dict]:
+    course_list = []
+    for course in entry['courses']:
+        enrolled = course['course_id'] in enrollments
+        if enrolled_only and not enrolled:
+            continue
+        course_data = dict(course)
+        course_data['is_enrolled'] = enrolled
+        if enrolled:
+            course_data['progress_percentage'] = enrollments[course['course_id']]
+        course_list.append(course_data)
+    return course_list
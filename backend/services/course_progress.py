@@ -0,0 +1,39 @@
+"""Set-based lesson progress reads shared by the course/lesson listing routes"""
+from typing import List
+
+from sqlalchemy import and_
+
+from models import db, Lesson, LessonProgress
+
+
+def get_lesson_progress_rows(course_id: int, user_id: int = None) -> List:
+    """Lessons of a course with the user's progress, in one LEFT JOIN.
+
+    Returns lightweight rows (lesson_id, lesson_title, lesson_order, video_url,
+    duration_minutes, is_completed, time_spent_minutes) ordered by lesson_order;
+    lesson_content is never loaded. Without a user_id the progress columns are NULL.
+    """
+    columns = [
+        Lesson.lesson_id,
+        Lesson.lesson_title,
+        Lesson.lesson_order,
+        Lesson.video_url,
+        Lesson.duration_minutes,
+    ]
+    if user_id is None:
+        return db.session.query(
+            *columns,
+            db.literal(None).label('is_completed'),
+            db.literal(None).label('time_spent_minutes')
+        ).filter(Lesson.course_id == course_id).order_by(Lesson.lesson_order).all()
+
+    return db.session.query(
+        *columns,
+        LessonProgress.is_completed,
+        LessonProgress.time_spent_minutes
+    ).outerjoin(
+        LessonProgress,
+        and_(LessonProgress.lesson_id == Lesson.lesson_id, LessonProgress.user_id == user_id)
+    ).filter(
+        Lesson.course_id == course_id
+    ).order_by(Lesson.lesson_order).all()
@@ -0,0 +1,164 @@
+"""Per-user dashboard snapshots.
+
+The student dashboard is stored denormalized in `user_dashboard_snapshots`
+and served with a single primary-key read. Enrollment, lesson-completion and
+quiz-submission events patch the snapshot inside the caller's transaction;
+changes that cannot be applied as a patch (course edits, unenrollment) delete
+the snapshot so the next read rebuilds it. scripts/rebuild_dashboard_snapshots.py
+repairs drift offline.
+"""
+import json
+import logging
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Enrollment, Course, Lesson, LessonProgress, QuizResult, Quiz, UserDashboardSnapshot
+
+logger = logging.getLogger(__name__)
+
+RECENT_QUIZ_LIMIT = 5
+
+
+def _course_entry(course, progress_percentage, completed_lessons: int) -> Dict:
+    return {
+        'course_id': course.course_id,
+        'course_name': course.course_name,
+        'description': course.description,
+        'thumbnail_url': course.thumbnail_url,
+        'progress_percentage': round(float(progress_percentage), 2) if progress_percentage else 0,
+        'completed_lessons': completed_lessons
+    }
+
+
+def _quiz_entry(quiz_id: int, quiz_name: Optional[str], score, submitted_at) -> Dict:
+    return {
+        'quiz_id': quiz_id,
+        'quiz_name': quiz_name or f"Quiz #{quiz_id}",
+        'score': round(float(score), 2) if score is not None else 0,
+        'submitted_at': submitted_at.isoformat() if submitted_at else None
+    }
+
+
+def build_snapshot(user_id: int) -> Dict:
+    """Compute the dashboard payload from scratch (three set-based queries)"""
+    courses = db.session.query(Course, Enrollment.progress_percentage).join(
+        Enrollment, Enrollment.course_id == Course.course_id
+    ).filter(Enrollment.user_id == user_id).order_by(Enrollment.enrollment_id).all()
+
+    completed = dict(db.session.query(
+        Lesson.course_id, func.count(LessonProgress.progress_id)
+    ).join(
+        Lesson, Lesson.lesson_id == LessonProgress.lesson_id
+    ).filter(
+        LessonProgress.user_id == user_id,
+        LessonProgress.is_completed == True
+    ).group_by(Lesson.course_id).all())
+
+    recent = db.session.query(
+        QuizResult.quiz_id, Quiz.quiz_name, QuizResult.score, QuizResult.submitted_at
+    ).outerjoin(
+        Quiz, Quiz.quiz_id == QuizResult.quiz_id
+    ).filter(
+        QuizResult.user_id == user_id
+    ).order_by(QuizResult.submitted_at.desc()).limit(RECENT_QUIZ_LIMIT).all()
+
+    return {
+        'courses': [_course_entry(course, progress, completed.get(course.course_id, 0)) for course, progress in courses],
+        'recent_quizzes': [_quiz_entry(*row) for row in recent]
+    }
+
+
+def render(payload: Dict) -> Dict:
+    """Dashboard response (totals are derived from the stored course entries)"""
+    courses = payload['courses']
+    total_courses = len(courses)
+    return {
+        'total_courses': total_courses,
+        'average_progress': (sum(c['progress_percentage'] for c in courses) / total_courses) if total_courses else 0,
+        'total_lessons_completed': sum(c['completed_lessons'] for c in courses),
+        'courses_progress': courses,
+        'recent_quizzes': payload['recent_quizzes']
+    }
+
+
+def get_dashboard(user_id: int) -> Dict:
+    """Serve the dashboard from the snapshot, building and storing it on a miss"""
+    row = UserDashboardSnapshot.query.get(user_id)
+    if row:
+        return render(json.loads(row.payload))
+
+    payload = build_snapshot(user_id)
+    try:
+        db.session.add(UserDashboardSnapshot(user_id=user_id, payload=json.dumps(payload, ensure_ascii=False)))
+        db.session.commit()
+    except IntegrityError:
+        # Built concurrently by another request; ours is equally fresh
+        db.session.rollback()
+    return render(payload)
+
+
+def rebuild(user_id: int) -> None:
+    """Replace a user's snapshot with a freshly computed one. The caller commits."""
+    payload = json.dumps(build_snapshot(user_id), ensure_ascii=False)
+    row = UserDashboardSnapshot.query.get(user_id)
+    if row:
+        row.payload = payload
+    else:
+        db.session.add(UserDashboardSnapshot(user_id=user_id, payload=payload))
+
+
+def invalidate(user_id: int) -> None:
+    """Drop a user's snapshot; the next dashboard read rebuilds it. The caller commits."""
+    UserDashboardSnapshot.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+
+
+def invalidate_course(course_id: int) -> None:
+    """Drop the snapshots of everyone enrolled in a course (course edited/deleted)"""
+    enrolled = db.session.query(Enrollment.user_id).filter(Enrollment.course_id == course_id)
+    UserDashboardSnapshot.query.filter(
+        UserDashboardSnapshot.user_id.in_(enrolled)
+    ).delete(synchronize_session=False)
+
+
+def _patch(user_id: int, fn: Callable[[Dict], bool]) -> None:
+    # Row lock so concurrent events for the same user serialize; no snapshot yet
+    # means nothing to patch (it is built on first read). A patch returning False
+    # could not be applied and the snapshot is dropped instead.
+    row = db.session.query(UserDashboardSnapshot).filter_by(user_id=user_id).with_for_update().first()
+    if not row:
+        return
+    payload = json.loads(row.payload)
+    if fn(payload):
+        row.payload = json.dumps(payload, ensure_ascii=False)
+    else:
+        db.session.delete(row)
+
+
+def on_enrolled(user_id: int, course, progress_percentage=0) -> None:
+    def apply(payload):
+        if not any(c['course_id'] == course.course_id for c in payload['courses']):
+            payload['courses'].append(_course_entry(course, progress_percentage, 0))
+        return True
+    _patch(user_id, apply)
+
+
+def on_lesson_completed(user_id: int, course_id: int, progress_percentage, newly_completed: bool = True) -> None:
+    def apply(payload):
+        for entry in payload['courses']:
+            if entry['course_id'] == course_id:
+                entry['progress_percentage'] = round(float(progress_percentage), 2) if progress_percentage else 0
+                if newly_completed:
+                    entry['completed_lessons'] += 1
+                return True
+        return False
+    _patch(user_id, apply)
+
+
+def on_quiz_submitted(user_id: int, quiz, result) -> None:
+    def apply(payload):
+        entry = _quiz_entry(quiz.quiz_id, quiz.quiz_name, result.score, result.submitted_at)
+        payload['recent_quizzes'] = [entry] + payload['recent_quizzes'][:RECENT_QUIZ_LIMIT - 1]
+        return True
+    _patch(user_id, apply)
@@ -0,0 +1,272 @@
+"""Grader registry for quiz question types.
+
+Each grader compiles a question's answer key once (cached on the raw
+correct_answer / options values) and grades a whole batch of responses of its
+type in one call. `grade_answers` compares multiple-choice answers inline and
+buckets every other type, so adding types never adds work to the
+multiple-choice path (see scripts/bench_graders.py).
+
+Answer key conventions (quiz_questions.correct_answer is an INT):
+- multiple_choice: index of the correct option
+- multiple_select: bitmask of correct option indices (bit i = option i)
+- true_false:      index of the correct option; options default to ["Đúng", "Sai"]
+- short_answer:    options holds the JSON list of accepted answers; correct_answer is unused
+"""
+import json
+import logging
+import string
+import unicodedata
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TYPE = 'multiple_choice'
+TRUE_FALSE_OPTIONS = ['Đúng', 'Sai']
+
+
+def _build_normalization_table() -> Dict[int, Optional[str]]:
+    """Translation table: lowercase, strip Vietnamese/Latin diacritics, punctuation -> space"""
+    table = {}
+    for block in (range(0x00C0, 0x0250), range(0x1E00, 0x1F00)):
+        for code in block:
+            char = chr(code)
+            base = ''.join(c for c in unicodedata.normalize('NFD', char) if not unicodedata.combining(c))
+            if base and base != char:
+                table[code] = base.lower()
+    for code in range(0x0300, 0x0370):  # stray combining marks (NFD input)
+        table[code] = None
+    table[ord('đ')] = 'd'
+    table[ord('Đ')] = 'd'
+    for char in string.ascii_uppercase:
+        table[ord(char)] = char.lower()
+    for char in string.punctuation + '“”‘’–—…':
+        table[ord(char)] = ' '
+    return table
+
+
+NORMALIZATION_TABLE = _build_normalization_table()
+
+
+def normalize_text(value: Any) -> str:
+    """Canonical form of a free-text answer (single translate pass + whitespace collapse)"""
+    if value is None:
+        return ''
+    return ' '.join(str(value).translate(NORMALIZATION_TABLE).lower().split())
+
+
+def _parse_options(options) -> List:
+    if isinstance(options, list):
+        return options
+    if not options:
+        return []
+    try:
+        parsed = json.loads(options)
+        return parsed if isinstance(parsed, list) else []
+    except (TypeError, ValueError):
+        return []
+
+
+class Grader:
+    """Base grader. Subclasses set `question_type` and override compile/grade_batch."""
+
+    question_type = None
+
+    @staticmethod
+    def compile(correct_answer, options):
+        """Build the answer key from the stored question fields (cached per distinct value)"""
+        return correct_answer
+
+    @staticmethod
+    def grade_batch(keys: List, responses: List) -> List[bool]:
+        return [response == key for key, response in zip(keys, responses)]
+
+    @staticmethod
+    def to_storage(response) -> Tuple[Optional[int], Optional[str]]:
+        """(selected_answer, answer_text) columns for a QuizAnswer row"""
+        return (response if isinstance(response, int) and not isinstance(response, bool) else None), None
+
+    @staticmethod
+    def describe(options: List, value) -> str:
+        """Human-readable answer text (used in AI explanations)"""
+        if isinstance(value, int) and not isinstance(value, bool) and 0 <= value < len(options):
+            return str(options[value])
+        return 'Không rõ'
+
+
+_GRADERS: Dict[str, Grader] = {}
+
+
+def register_grader(cls):
+    """Class decorator registering a grader for its question_type"""
+    _GRADERS[cls.question_type] = cls()
+    return cls
+
+
+def get_grader(question_type: Optional[str]) -> Grader:
+    return _GRADERS.get(question_type or DEFAULT_TYPE) or _GRADERS[DEFAULT_TYPE]
+
+
+def registered_types() -> List[str]:
+    return sorted(_GRADERS)
+
+
+@register_grader
+class MultipleChoiceGrader(Grader):
+    """Hot path: the key is the option index, grading is integer equality"""
+    question_type = 'multiple_choice'
+
+
+@register_grader
+class MultipleSelectGrader(Grader):
+    """Correct iff the selected option set equals the key bitmask"""
+    question_type = 'multiple_select'
+
+    @staticmethod
+    def to_mask(response) -> Optional[int]:
+        if isinstance(response, bool):
+            return None
+        if isinstance(response, int):
+            return response
+        if isinstance(response, (list, tuple, set)):
+            mask = 0
+            for index in response:
+                if isinstance(index, int) and 0 <= index < 63:
+                    mask |= 1 << index
+            return mask
+        return None
+
+    @staticmethod
+    def grade_batch(keys, responses):
+        to_mask = MultipleSelectGrader.to_mask
+        return [key is not None and to_mask(response) == key for key, response in zip(keys, responses)]
+
+    @staticmethod
+    def to_storage(response):
+        return MultipleSelectGrader.to_mask(response), None
+
+    @staticmethod
+    def describe(options, value):
+        mask = MultipleSelectGrader.to_mask(value)
+        if not mask:
+            return 'Không rõ'
+        return ', '.join(str(opt) for i, opt in enumerate(options) if mask >> i & 1)
+
+
+@register_grader
+class TrueFalseGrader(Grader):
+    """Accepts the option index, a boolean, or the option text ("đúng", "true", ...)"""
+    question_type = 'true_false'
+
+    TRUE_WORDS = frozenset(['dung', 'true', 't', 'yes', 'co'])
+    FALSE_WORDS = frozenset(['sai', 'false', 'f', 'no', 'khong'])
+
+    @staticmethod
+    def compile(correct_answer, options):
+        parsed = _parse_options(options) or TRUE_FALSE_OPTIONS
+        # Map option text / boolean synonyms onto option indices
+        lookup = {}
+        for index, option in enumerate(parsed):
+            text = normalize_text(option)
+            lookup[text] = index
+            if text in TrueFalseGrader.TRUE_WORDS:
+                lookup[True] = index
+            elif text in TrueFalseGrader.FALSE_WORDS:
+                lookup[False] = index
+        return correct_answer, lookup
+
+    @staticmethod
+    def _index(response, lookup) -> Optional[int]:
+        if isinstance(response, bool):
+            return lookup.get(response)
+        if isinstance(response, int):
+            return response
+        if isinstance(response, str):
+            text = normalize_text(response)
+            if text in lookup:
+                return lookup[text]
+            if text in TrueFalseGrader.TRUE_WORDS:
+                return lookup.get(True)
+            if text in TrueFalseGrader.FALSE_WORDS:
+                return lookup.get(False)
+        return None
+
+    @staticmethod
+    def grade_batch(keys, responses):
+        index = TrueFalseGrader._index
+        return [index(response, key[1]) == key[0] for key, response in zip(keys, responses)]
+
+    @staticmethod
+    def to_storage(response):
+        if isinstance(response, bool):
+            return None, 'true' if response else 'false'
+        if isinstance(response, int):
+            return response, None
+        return None, (str(response) if response is not None else None)
+
+    @staticmethod
+    def describe(options, value):
+        if isinstance(value, bool) or isinstance(value, str):
+            return str(value)
+        return Grader.describe(options or TRUE_FALSE_OPTIONS, value)
+
+
+@register_grader
+class ShortAnswerGrader(Grader):
+    """Correct iff the normalized response matches a normalized accepted answer"""
+    question_type = 'short_answer'
+
+    @staticmethod
+    def compile(correct_answer, options):
+        return frozenset(normalize_text(answer) for answer in _parse_options(options) if normalize_text(answer))
+
+    @staticmethod
+    def grade_batch(keys, responses):
+        return [response is not None and normalize_text(response) in key for key, response in zip(keys, responses)]
+
+    @staticmethod
+    def to_storage(response):
+        return None, (str(response) if response is not None else None)
+
+    @staticmethod
+    def describe(options, value):
+        return str(value) if value not in (None, '') else 'Không rõ'
+
+
+@lru_cache(maxsize=4096)
+def _compiled_key(question_type: str, correct_answer, options):
+    return get_grader(question_type).compile(correct_answer, options)
+
+
+def grade_answers(questions: Dict[int, Any], answers: List[Dict]) -> List[Tuple[Dict, bool]]:
+    """Grade a submission. Returns (answer_data, is_correct) for answers whose question is known.
+
+    Multiple-choice answers are compared inline (the hot path); other types
+    are bucketed and each bucket is graded in one grade_batch call. Output
+    order follows the input order.
+    """
+    buckets: Dict[str, Tuple[List[int], List, List]] = {}
+    graded: List[Tuple[Dict, bool]] = []
+    lookup = questions.get
+    append = graded.append
+    for answer_data in answers:
+        question = lookup(answer_data.get('question_id'))
+        if question is None:
+            continue
+        question_type = question.question_type
+        if question_type is None or question_type == DEFAULT_TYPE:
+            append((answer_data, answer_data.get('selected_answer') == question.correct_answer))
+            continue
+        bucket = buckets.get(question_type)
+        if bucket is None:
+            bucket = buckets[question_type] = ([], [], [])
+        bucket[0].append(len(graded))
+        bucket[1].append(_compiled_key(question_type, question.correct_answer, question.options))
+        bucket[2].append(answer_data.get('selected_answer'))
+        append((answer_data, False))
+
+    for question_type, (positions, keys, responses) in buckets.items():
+        results = get_grader(question_type).grade_batch(keys, responses)
+        for position, is_correct in zip(positions, results):
+            graded[position] = (graded[position][0], bool(is_correct))
+    return graded
@@ -0,0 +1,210 @@
+"""HTTP caching and compression for the API and the static frontend.
+
+Production policy (DEBUG off and HTTP_CACHE_ENABLED):
+- Frontend files are read once at startup. Local js/css references in the HTML
+  pages are fingerprinted with a content hash (`api.js?v=1a2b3c4d`); a request
+  carrying the current fingerprint is served `public, max-age=..., immutable`,
+  every other static response is `no-cache` with an ETag (so HTML is always
+  revalidated and picks up new fingerprints).
+- Compressible files are pre-compressed at startup: gzip, plus brotli when the
+  optional `brotli` package is installed.
+- API GET responses get an ETag over the JSON body and answer a matching
+  If-None-Match with 304; endpoints that set their own ETag / Cache-Control
+  keep them. JSON and HTML bodies above HTTP_COMPRESS_MIN_BYTES are compressed
+  on the fly.
+- Anything else defaults to `no-cache, no-store`.
+
+With DEBUG on, every response is `no-cache, no-store` and nothing is
+compressed or pre-loaded, so edited frontend files show up immediately.
+"""
+import gzip
+import hashlib
+import logging
+import mimetypes
+import posixpath
+import re
+from pathlib import Path
+from typing import Dict, Optional
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+NO_STORE = 'no-cache, no-store, must-revalidate'
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+MAX_PRELOAD_BYTES = 5 * 1024 * 1024
+_ASSET_REF = re.compile(r'''((?:src|href)=["'])([^"'?#:]+\.(?:js|css))(["'])''')
+
+
+def _compressible(mimetype: Optional[str]) -> bool:
+    return bool(mimetype) and mimetype.startswith(COMPRESSIBLE_TYPES)
+
+
+class StaticAsset:
+    def __init__(self, path: str, data: bytes, mimetype: str):
+        self.path = path
+        self.mimetype = mimetype
+        self.data = data
+        self.fingerprint = hashlib.sha1(data).hexdigest()[:10]
+        self.variants: Dict[str, bytes] = {}
+
+    def compress(self, level: int, min_bytes: int) -> None:
+        if not _compressible(self.mimetype) or len(self.data) < min_bytes:
+            return
+        self.variants['gzip'] = gzip.compress(self.data, compresslevel=level)
+        if brotli is not None:
+            self.variants['br'] = brotli.compress(self.data, quality=min(level + 3, 11))
+
+
+class HttpCache:
+    """Response caching policy, static asset store and compression (see module docstring)"""
+
+    def __init__(self):
+        self.enabled = False
+        self.static_max_age = 31536000
+        self.min_bytes = 1024
+        self.level = 6
+        self.assets: Dict[str, StaticAsset] = {}
+
+    def init_app(self, app, static_dir) -> None:
+        self.enabled = app.config.get('HTTP_CACHE_ENABLED', True) and not app.config.get('DEBUG')
+        self.static_max_age = app.config.get('STATIC_MAX_AGE_SECONDS', self.static_max_age)
+        self.min_bytes = app.config.get('HTTP_COMPRESS_MIN_BYTES', self.min_bytes)
+        self.level = app.config.get('HTTP_COMPRESS_LEVEL', self.level)
+        app.after_request(self.after_request)
+        if not self.enabled:
+            logger.info("[HttpCache] DEBUG mode: caching and compression disabled")
+            return
+
+        self.load_static(Path(static_dir))
+        # Flask's built-in static route ('/<path:filename>') serves frontend files;
+        # answer from the pre-compressed store and fall back for anything else.
+        original = app.view_functions.get('static')
+        if original is not None:
+            def serve_static(filename):
+                return self.static_response(filename) or original(filename=filename)
+            app.view_functions['static'] = serve_static
+
+    # Static assets
+
+    def load_static(self, root: Path) -> None:
+        assets = {}
+        for file_path in sorted(root.rglob('*')):
+            if not file_path.is_file() or file_path.stat().st_size > MAX_PRELOAD_BYTES:
+                continue
+            rel = file_path.relative_to(root).as_posix()
+            mimetype = mimetypes.guess_type(rel)[0] or 'application/octet-stream'
+            assets[rel] = StaticAsset(rel, file_path.read_bytes(), mimetype)
+
+        # Fingerprint references after every asset's hash is known
+        for asset in assets.values():
+            if asset.mimetype == 'text/html':
+                asset.data = self._fingerprint_refs(asset, assets)
+                asset.fingerprint = hashlib.sha1(asset.data).hexdigest()[:10]
+        for asset in assets.values():
+            asset.compress(self.level, self.min_bytes)
+
+        self.assets = assets
+        raw = sum(len(a.data) for a in assets.values() if a.variants)
+        packed = sum(len(a.variants['gzip']) for a in assets.values() if a.variants)
+        logger.info(f"[HttpCache] Loaded {len(assets)} static files; compressed {raw} -> {packed} bytes (gzip)"
+                    f"{', brotli enabled' if brotli else ''}")
+
+    @staticmethod
+    def _fingerprint_refs(page: StaticAsset, assets: Dict[str, StaticAsset]) -> bytes:
+        base = posixpath.dirname(page.path)
+
+        def replace(match):
+            ref = match.group(2)
+            target = ref.lstrip('/') if ref.startswith('/') else posixpath.normpath(posixpath.join(base, ref))
+            asset = assets.get(target)
+            if asset is None:
+                return match.group(0)
+            return f"{match.group(1)}{ref}?v={asset.fingerprint}{match.group(3)}"
+
+        return _ASSET_REF.sub(replace, page.data.decode('utf-8')).encode('utf-8')
+
+    def _choose_encoding(self, available) -> Optional[str]:
+        best, best_q = None, 0
+        for encoding in ('br', 'gzip'):
+            if encoding in available:
+                quality = request.accept_encodings[encoding]
+                if quality > best_q:
+                    best, best_q = encoding, quality
+        return best
+
+    def static_response(self, filename: str):
+        """Response for a pre-loaded frontend file, or None when it is not in the store"""
+        from flask import current_app
+
+        asset = self.assets.get(filename) if self.enabled else None
+        if asset is None:
+            return None
+        encoding = self._choose_encoding(asset.variants)
+        response = current_app.response_class(asset.variants.get(encoding, asset.data), mimetype=asset.mimetype)
+        response.set_etag(f"{asset.fingerprint}-{encoding}" if encoding else asset.fingerprint)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if asset.variants:
+            response.vary.add('Accept-Encoding')
+        if request.args.get('v') == asset.fingerprint:
+            response.headers['Cache-Control'] = f'public, max-age={self.static_max_age}, immutable'
+        else:
+            response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+
+    # Dynamic responses
+
+    def after_request(self, response):
+        if not self.enabled:
+            response.headers['Cache-Control'] = NO_STORE
+            response.headers['Pragma'] = 'no-cache'
+            response.headers['Expires'] = '0'
+            return response
+
+        is_api_get = request.method == 'GET' and request.path.startswith('/api/')
+        if (is_api_get and response.status_code == 200 and response.mimetype == 'application/json'
+                and 'ETag' not in response.headers and not response.is_streamed):
+            response.add_etag()
+            response.headers.setdefault('Cache-Control', 'private, no-cache')
+            response.vary.add('Authorization')
+            response.make_conditional(request)
+
+        if 'Cache-Control' not in response.headers:
+            response.headers['Cache-Control'] = NO_STORE
+            response.headers['Pragma'] = 'no-cache'
+            response.headers['Expires'] = '0'
+
+        self._compress(response)
+        return response
+
+    def _compress(self, response) -> None:
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in ('application/json', 'text/html')):
+            return
+        data = response.get_data()
+        if len(data) < self.min_bytes:
+            return
+        encoding = self._choose_encoding(('br', 'gzip') if brotli else ('gzip',))
+        if encoding is None:
+            return
+        if encoding == 'br':
+            body = brotli.compress(data, quality=4)
+        else:
+            body = gzip.compress(data, compresslevel=self.level)
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            # Same validator for both representations, so it must be weak
+            response.set_etag(etag, weak=True)
+
+
+http_cache = HttpCache()
@@ -0,0 +1,195 @@
+"""Buffered lesson activity writes (last_accessed timestamps, learning time).
+
+`get_lesson` records accesses here instead of committing a lesson_progress
+update on every read; the buffer keeps the latest access per (user, lesson)
+and writes them in batches. Learning-time heartbeats are merged per
+(user, lesson) as time intervals, so overlapping or repeated heartbeats
+(several tabs, client retries) are counted once, and only whole minutes are
+flushed to lesson_progress.time_spent_minutes as aggregated increments.
+"""
+import logging
+import operator
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from models import db, Lesson, LessonProgress
+from services.upsert import upsert
+from services.write_buffer import CoalescingBuffer
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_KEYS = ('user_id', 'lesson_id')
+
+
+def _live(batch: Dict[Tuple[int, int], object]) -> Dict[Tuple[int, int], object]:
+    """Drop keys for lessons deleted since they were buffered (the insert would violate the FK)"""
+    lesson_ids = {lesson_id for _, lesson_id in batch}
+    live = {row[0] for row in db.session.query(Lesson.lesson_id).filter(Lesson.lesson_id.in_(lesson_ids)).all()}
+    return {key: value for key, value in batch.items() if key[1] in live}
+
+
+def _flush(batch: Dict[Tuple[int, int], object], write) -> None:
+    batch = _live(batch)
+    if not batch:
+        return
+    try:
+        write(batch)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def _write_access(batch: Dict[Tuple[int, int], datetime]) -> None:
+    # One upsert per chunk; never moves a timestamp backwards
+    upsert(LessonProgress, [
+        {'user_id': u, 'lesson_id': l, 'last_accessed': ts, 'is_completed': False, 'time_spent_minutes': 0}
+        for (u, l), ts in batch.items()
+    ], keys=PROGRESS_KEYS, update={'last_accessed': 'max'})
+
+
+def _flush_access(batch: Dict[Tuple[int, int], datetime]) -> None:
+    _flush(batch, _write_access)
+
+
+access_buffer = CoalescingBuffer('lesson-access', _flush_access, merge=max)
+
+
+def record_access(user_id: int, lesson_id: int, at: datetime = None) -> datetime:
+    at = at or datetime.utcnow()
+    access_buffer.add((user_id, lesson_id), at)
+    return at
+
+
+MAX_HEARTBEAT_SECONDS = 120  # longest interval one heartbeat may claim
+HEARTBEAT_HORIZON_SECONDS = 600  # intervals kept for de-duplication; older events are dropped
+
+
+def _overlap(intervals: List[List[float]], start: float, end: float) -> float:
+    covered = 0.0
+    for s, e in intervals:
+        if s >= end:
+            break
+        if e > start:
+            covered += min(e, end) - max(s, start)
+    return covered
+
+
+def _insert_interval(intervals: List[List[float]], start: float, end: float) -> List[List[float]]:
+    """Insert [start, end] into a sorted list of disjoint intervals, merging overlaps"""
+    i = bisect_left(intervals, [start, end])
+    intervals.insert(i, [start, end])
+    merged = []
+    for s, e in intervals:
+        if merged and s <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], e)
+        else:
+            merged.append([s, e])
+    return merged
+
+
+class HeartbeatAggregator:
+    """Per-(user, lesson) interval union with a seconds carry.
+
+    New coverage is converted to seconds; whole minutes move to `time_buffer`
+    (flushed as `time_spent_minutes + n`) and the remainder is carried.
+    """
+
+    def __init__(self, time_buffer: CoalescingBuffer):
+        self.time_buffer = time_buffer
+        self._state: Dict[Tuple[int, int], Dict] = {}
+        self._lock = threading.Lock()
+        self._last_prune = time.time()
+
+    def record(self, user_id: int, events: List[Dict], sent_ts: float = None, now: float = None) -> float:
+        """Merge a batch of heartbeats; returns the seconds newly counted.
+
+        Each event is {lesson_id, seconds, client_ts} and covers
+        [client_ts - seconds, client_ts]. Client timestamps are shifted by the
+        batch's clock offset (`sent_ts`, default the newest client_ts) onto
+        server time, clipped to the present and to the de-duplication horizon.
+        """
+        now = now or time.time()
+        valid = []
+        for event in events or []:
+            try:
+                lesson_id = int(event['lesson_id'])
+                seconds = min(float(event['seconds']), MAX_HEARTBEAT_SECONDS)
+                client_ts = float(event['client_ts'])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if seconds > 0:
+                valid.append((lesson_id, seconds, client_ts))
+        if not valid:
+            return 0.0
+        if now - self._last_prune > HEARTBEAT_HORIZON_SECONDS:
+            self.prune(now)
+
+        try:
+            client_now = float(sent_ts)
+        except (TypeError, ValueError):
+            client_now = max(ts for _, _, ts in valid)
+        offset = now - client_now
+        horizon = now - HEARTBEAT_HORIZON_SECONDS
+        accepted = 0.0
+        with self._lock:
+            for lesson_id, seconds, client_ts in valid:
+                end = min(client_ts + offset, now)
+                start = max(end - seconds, horizon)
+                if end <= start:
+                    continue
+                state = self._state.setdefault((user_id, lesson_id), {'intervals': [], 'carry': 0.0})
+                new_seconds = (end - start) - _overlap(state['intervals'], start, end)
+                if new_seconds <= 0:
+                    continue
+                state['intervals'] = _insert_interval(state['intervals'], start, end)
+                state['carry'] += new_seconds
+                accepted += new_seconds
+                if state['carry'] >= 60:
+                    minutes = int(state['carry'] // 60)
+                    state['carry'] -= minutes * 60
+                    self.time_buffer.add((user_id, lesson_id), minutes)
+        return accepted
+
+    def prune(self, now: float = None) -> None:
+        """Drop intervals that fell out of the horizon (and idle keys with no carry)"""
+        now = now or time.time()
+        horizon = now - HEARTBEAT_HORIZON_SECONDS
+        with self._lock:
+            self._last_prune = now
+            for key in list(self._state):
+                state = self._state[key]
+                state['intervals'] = [iv for iv in state['intervals'] if iv[1] > horizon]
+                if not state['intervals'] and state['carry'] == 0:
+                    del self._state[key]
+
+
+def _write_time(batch: Dict[Tuple[int, int], int]) -> None:
+    upsert(LessonProgress, [
+        {'user_id': u, 'lesson_id': l, 'time_spent_minutes': m, 'is_completed': False}
+        for (u, l), m in batch.items()
+    ], keys=PROGRESS_KEYS, update={'time_spent_minutes': 'add'})
+
+
+def _flush_time(batch: Dict[Tuple[int, int], int]) -> None:
+    _flush(batch, _write_time)
+
+
+time_buffer = CoalescingBuffer('lesson-time', _flush_time, merge=operator.add)
+heartbeats = HeartbeatAggregator(time_buffer)
+
+
+def init_app(app) -> None:
+    access_buffer.init_app(
+        app,
+        interval=app.config.get('LESSON_ACCESS_FLUSH_SECONDS', 5),
+        max_entries=app.config.get('LESSON_ACCESS_MAX_PENDING', 500)
+    )
+    time_buffer.init_app(
+        app,
+        interval=app.config.get('LESSON_TIME_FLUSH_SECONDS', 30),
+        max_entries=app.config.get('LESSON_ACCESS_MAX_PENDING', 500)
+    )
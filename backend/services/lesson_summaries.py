@@ -0,0 +1,50 @@
+"""Small per-process cache of lesson summaries (Lesson.SUMMARY_FIELDS).
+
+Endpoints that list recommended lessons for many rows collect every lesson
+id first and call `get_many` once: cached summaries are served from memory
+and the rest are loaded with a single IN query (body column not loaded).
+Admin lesson edits call `invalidate(lesson_id)` after committing; other
+worker processes see the change once the entry expires
+(LESSON_SUMMARY_TTL_SECONDS).
+"""
+from typing import Dict, Iterable
+
+from models import Lesson
+from services.analytics_cache import InMemoryLRUStore
+
+DEFAULT_TTL_SECONDS = 300
+MAX_ENTRIES = 2000
+
+_store = InMemoryLRUStore(MAX_ENTRIES)
+_ttl = DEFAULT_TTL_SECONDS
+
+
+def init_app(app) -> None:
+    global _store, _ttl
+    _ttl = app.config.get('LESSON_SUMMARY_TTL_SECONDS', DEFAULT_TTL_SECONDS)
+    _store = InMemoryLRUStore(app.config.get('LESSON_SUMMARY_MAX_ENTRIES', MAX_ENTRIES))
+
+
+def get_many(lesson_ids: Iterable[int]) -> Dict[int, Dict]:
+    """{lesson_id: summary dict} for the lessons that exist"""
+    summaries, missing = {}, []
+    for lesson_id in set(lesson_ids):
+        summary = _store.get(lesson_id)
+        if summary is None:
+            missing.append(lesson_id)
+        else:
+            summaries[lesson_id] = summary
+    if missing:
+        for lesson in Lesson.query.options(Lesson.load_fields()).filter(Lesson.lesson_id.in_(missing)).all():
+            summary = lesson.to_summary_dict()
+            _store.set(lesson.lesson_id, summary, _ttl)
+            summaries[lesson.lesson_id] = summary
+    return summaries
+
+
+def invalidate(lesson_id: int = None) -> None:
+    """Drop one lesson (or every lesson) from the cache; call after committing the change"""
+    if lesson_id is None:
+        _store.clear()
+    else:
+        _store.delete(lesson_id)
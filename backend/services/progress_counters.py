@@ -0,0 +1,185 @@
+"""Denormalized progress counters: courses.lesson_count and enrollments.completed_count.
+
+Changes are single UPDATE statements with relative increments executed in the
+caller's transaction, so concurrent completions do not lose counts and
+progress_percentage is recomputed in O(1) instead of by counting lessons.
+scripts/check_progress_counters.py verifies (and with --fix repairs) them offline.
+"""
+from typing import Dict, List, Optional
+
+from sqlalchemy import case, func, or_
+
+from models import db, Course, Enrollment, Lesson, LessonProgress
+from services.upsert import insert_ignore
+
+
+def _progress_expr(completed, lesson_count):
+    """SQL expression for progress_percentage (clamped to 0..100)"""
+    return case(
+        (lesson_count <= 0, 0),
+        (completed >= lesson_count, 100),
+        else_=completed * 100.0 / lesson_count
+    )
+
+
+def _course_lesson_count(course_id_column):
+    return db.session.query(Course.lesson_count).filter(
+        Course.course_id == course_id_column
+    ).scalar_subquery()
+
+
+def _flip_completed(user_id: int, lesson_id: int, completion_date) -> bool:
+    return LessonProgress.query.filter(
+        LessonProgress.user_id == user_id,
+        LessonProgress.lesson_id == lesson_id,
+        or_(LessonProgress.is_completed == False, LessonProgress.is_completed.is_(None))
+    ).update({
+        LessonProgress.is_completed: True,
+        LessonProgress.completion_date: func.coalesce(LessonProgress.completion_date, completion_date)
+    }, synchronize_session=False) == 1
+
+
+def mark_completed(user_id: int, lesson_id: int, completion_date) -> bool:
+    """Mark a lesson completed for a user, creating the progress row if needed.
+
+    Returns True only for the request that actually completed it, so counters
+    are bumped once. A conditional UPDATE handles existing rows; a missing row
+    is created with an insert-ignore, and if a concurrent writer created it
+    first the UPDATE is retried against that row.
+    """
+    if _flip_completed(user_id, lesson_id, completion_date):
+        return True
+    if insert_ignore(LessonProgress, {
+        'user_id': user_id,
+        'lesson_id': lesson_id,
+        'is_completed': True,
+        'completion_date': completion_date
+    }, keys=('user_id', 'lesson_id')):
+        return True
+    return _flip_completed(user_id, lesson_id, completion_date)
+
+
+def on_lesson_completed(user_id: int, course_id: int) -> Optional[Enrollment]:
+    """Count one newly completed lesson and recompute progress in the same UPDATE.
+
+    Returns the refreshed enrollment (None when the user is not enrolled).
+    """
+    lesson_count = _course_lesson_count(Enrollment.course_id)
+    updated = Enrollment.query.filter_by(user_id=user_id, course_id=course_id).update({
+        Enrollment.completed_count: Enrollment.completed_count + 1,
+        # SET expressions see the pre-update row, hence the + 1 here as well
+        Enrollment.progress_percentage: _progress_expr(Enrollment.completed_count + 1, lesson_count)
+    }, synchronize_session=False)
+    if not updated:
+        return None
+    enrollment = Enrollment.query.filter_by(user_id=user_id, course_id=course_id).first()
+    db.session.refresh(enrollment)
+    return enrollment
+
+
+def _recompute_course_progress(course_id: int) -> None:
+    Enrollment.query.filter_by(course_id=course_id).update({
+        Enrollment.progress_percentage: _progress_expr(Enrollment.completed_count, _course_lesson_count(Enrollment.course_id))
+    }, synchronize_session=False)
+
+
+def on_lesson_added(course_id: int) -> None:
+    """Call after adding a lesson (same transaction)"""
+    Course.query.filter_by(course_id=course_id).update(
+        {Course.lesson_count: Course.lesson_count + 1}, synchronize_session=False
+    )
+    _recompute_course_progress(course_id)
+
+
+def on_lesson_removed(lesson: Lesson) -> None:
+    """Call before deleting a lesson (its progress rows must still exist)"""
+    completed_by = db.session.query(LessonProgress.user_id).filter(
+        LessonProgress.lesson_id == lesson.lesson_id,
+        LessonProgress.is_completed == True
+    )
+    Enrollment.query.filter(
+        Enrollment.course_id == lesson.course_id,
+        Enrollment.user_id.in_(completed_by),
+        Enrollment.completed_count > 0
+    ).update({Enrollment.completed_count: Enrollment.completed_count - 1}, synchronize_session=False)
+    Course.query.filter(
+        Course.course_id == lesson.course_id,
+        Course.lesson_count > 0
+    ).update({Course.lesson_count: Course.lesson_count - 1}, synchronize_session=False)
+    _recompute_course_progress(lesson.course_id)
+
+
+def initial_completed_count(user_id: int, course_id: int) -> int:
+    """Lessons of a course the user completed before enrolling (progress rows may predate enrollment)"""
+    return db.session.query(func.count(LessonProgress.progress_id)).join(
+        Lesson, Lesson.lesson_id == LessonProgress.lesson_id
+    ).filter(
+        LessonProgress.user_id == user_id,
+        LessonProgress.is_completed == True,
+        Lesson.course_id == course_id
+    ).scalar() or 0
+
+
+def progress_percentage(completed_count: int, lesson_count: int) -> float:
+    if not lesson_count:
+        return 0
+    return min(completed_count, lesson_count) * 100.0 / lesson_count
+
+
+def find_drift(course_id: Optional[int] = None) -> Dict[str, List[Dict]]:
+    """Compare stored counters with recounts (two grouped queries)"""
+    lesson_counts = db.session.query(
+        Course.course_id, Course.lesson_count, func.count(Lesson.lesson_id)
+    ).outerjoin(
+        Lesson, Lesson.course_id == Course.course_id
+    ).group_by(Course.course_id, Course.lesson_count)
+    if course_id:
+        lesson_counts = lesson_counts.filter(Course.course_id == course_id)
+
+    completed = db.session.query(
+        LessonProgress.user_id,
+        Lesson.course_id,
+        func.count(LessonProgress.progress_id).label('completed')
+    ).join(
+        Lesson, Lesson.lesson_id == LessonProgress.lesson_id
+    ).filter(
+        LessonProgress.is_completed == True
+    ).group_by(LessonProgress.user_id, Lesson.course_id).subquery()
+
+    enrollments = db.session.query(
+        Enrollment.enrollment_id, Enrollment.user_id, Enrollment.course_id,
+        Enrollment.completed_count, func.coalesce(completed.c.completed, 0)
+    ).outerjoin(
+        completed,
+        (completed.c.user_id == Enrollment.user_id) & (completed.c.course_id == Enrollment.course_id)
+    )
+    if course_id:
+        enrollments = enrollments.filter(Enrollment.course_id == course_id)
+
+    return {
+        'courses': [
+            {'course_id': cid, 'stored': stored, 'actual': actual}
+            for cid, stored, actual in lesson_counts.all() if stored != actual
+        ],
+        'enrollments': [
+            {'enrollment_id': eid, 'user_id': uid, 'course_id': cid, 'stored': stored, 'actual': actual}
+            for eid, uid, cid, stored, actual in enrollments.all() if stored != actual
+        ]
+    }
+
+
+def repair(drift: Dict[str, List[Dict]]) -> None:
+    """Write recounted values back and recompute progress of affected courses. The caller commits."""
+    courses = set()
+    for row in drift['courses']:
+        Course.query.filter_by(course_id=row['course_id']).update(
+            {Course.lesson_count: row['actual']}, synchronize_session=False
+        )
+        courses.add(row['course_id'])
+    for row in drift['enrollments']:
+        Enrollment.query.filter_by(enrollment_id=row['enrollment_id']).update(
+            {Enrollment.completed_count: row['actual']}, synchronize_session=False
+        )
+        courses.add(row['course_id'])
+    for course_id in courses:
+        _recompute_course_progress(course_id)
@@ -0,0 +1,247 @@
+"""In-memory question pools and per-student quiz assembly.
+
+Questions are indexed by (course_id, topic_id, difficulty_level). A variant
+draws its questions from the pools with a random seed and stores the drawn ids
+(quiz_variants.question_ids), so grading never depends on the index. The
+index is rebuilt from the database when question-bank writes call
+`invalidate()`, and at least every QUESTION_POOL_TTL_SECONDS so other worker
+processes pick up edits and deletions too.
+
+Variants created before question_ids existed are rebuilt from (seed,
+pool_version): each pool is a list of ids in ascending order and "the pool at
+version v" is the prefix of ids <= v.
+"""
+import json
+import logging
+import random
+import secrets
+import threading
+import time
+from bisect import bisect_right
+from typing import Dict, List, Tuple
+
+from models import db, QuizQuestion, QuizVariant, QuizResult, AIGeneratedQuestion
+
+logger = logging.getLogger(__name__)
+
+ANY = '*'  # wildcard for topic_id / difficulty_level in pool rules
+DEFAULT_TTL_SECONDS = 300
+
+
+def parse_pool_spec(raw) -> List[Dict]:
+    """Validate and normalize a quiz pool spec (JSON string or list of rules)"""
+    rules = json.loads(raw) if isinstance(raw, str) else raw
+    if not isinstance(rules, list) or not rules:
+        raise ValueError('pool_spec must be a non-empty list of rules')
+
+    normalized = []
+    for rule in rules:
+        if not isinstance(rule, dict):
+            raise ValueError('each pool rule must be an object')
+        count = int(rule.get('count', 0))
+        if count <= 0:
+            raise ValueError('pool rule count must be positive')
+        topic_id = rule.get('topic_id')
+        difficulty = rule.get('difficulty_level')
+        normalized.append({
+            'topic_id': int(topic_id) if topic_id is not None else None,
+            'difficulty_level': int(difficulty) if difficulty is not None else None,
+            'count': count
+        })
+    return normalized
+
+
+def _sample_indices(rng: random.Random, n: int, k: int) -> List[int]:
+    """Pick k distinct indices from range(n) in O(k) (Floyd's algorithm), then shuffle"""
+    k = min(k, n)
+    chosen = []
+    seen = set()
+    for j in range(n - k, n):
+        t = rng.randrange(j + 1)
+        if t in seen:
+            t = j
+        seen.add(t)
+        chosen.append(t)
+    rng.shuffle(chosen)
+    return chosen
+
+
+class QuestionPoolIndex:
+    """Process-wide index of question ids keyed by (course_id, topic_id, difficulty_level)"""
+
+    def __init__(self):
+        self._pools: Dict[Tuple, List[int]] = {}
+        self._version = 0
+        self._loaded_at = None  # monotonic time of the last build; None = build on next use
+        self._built_for = 0  # highest version the last build was asked for
+        self.ttl = DEFAULT_TTL_SECONDS
+        self._lock = threading.Lock()
+
+    def init_app(self, app) -> None:
+        self.ttl = app.config.get('QUESTION_POOL_TTL_SECONDS', DEFAULT_TTL_SECONDS)
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def _stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl
+
+    def _build(self) -> int:
+        # Full scan of four integer columns; the new pools replace the old ones in one assignment
+        rows = db.session.query(
+            QuizQuestion.question_id,
+            QuizQuestion.course_id,
+            QuizQuestion.topic_id,
+            QuizQuestion.difficulty_level
+        ).order_by(QuizQuestion.question_id).all()
+        pools: Dict[Tuple, List[int]] = {}
+        for question_id, course_id, topic_id, difficulty in rows:
+            for key in (
+                (course_id, topic_id, difficulty),
+                (course_id, topic_id, ANY),
+                (course_id, ANY, difficulty),
+                (course_id, ANY, ANY),
+            ):
+                pools.setdefault(key, []).append(question_id)
+        self._pools = pools
+        self._version = rows[-1][0] if rows else 0
+        self._loaded_at = time.monotonic()
+        return len(rows)
+
+    def ensure_loaded(self, min_version: int = 0) -> None:
+        """Rebuild the index when it was invalidated, has expired, or is older than min_version"""
+        if not self._stale() and self._built_for >= min_version:
+            return
+        with self._lock:
+            if not self._stale() and self._built_for >= min_version:
+                return
+            count = self._build()
+            # A deleted top question keeps version below min_version; do not rebuild for it again
+            self._built_for = max(self._version, min_version)
+            logger.info(f"[QuestionPool] Indexed {count} questions (version {self._version})")
+
+    def invalidate(self) -> None:
+        """Rebuild on next use; call after committing question-bank inserts, edits or deletes"""
+        self._loaded_at = None
+
+    def add_question(self, question: QuizQuestion) -> None:
+        """Register a committed question"""
+        self.invalidate()
+
+    def pool(self, course_id, topic_id, difficulty_level, pool_version: int) -> List[int]:
+        ids = self._pools.get((
+            course_id,
+            topic_id if topic_id is not None else ANY,
+            difficulty_level if difficulty_level is not None else ANY,
+        ), [])
+        return ids[:bisect_right(ids, pool_version)]
+
+    def assemble(self, course_id, rules: List[Dict], seed: int, pool_version: int) -> List[int]:
+        """Deterministically draw question ids for a variant (O(count) sampling per rule)"""
+        self.ensure_loaded(pool_version)
+        rng = random.Random(seed)
+        picked = []
+        used = set()
+        for rule in rules:
+            ids = self.pool(course_id, rule['topic_id'], rule['difficulty_level'], pool_version)
+            if not ids:
+                continue
+            # Draw a few extra to skip questions already taken by an overlapping rule
+            want = rule['count']
+            for idx in _sample_indices(rng, len(ids), want + len(used)):
+                qid = ids[idx]
+                if qid in used:
+                    continue
+                used.add(qid)
+                picked.append(qid)
+                want -= 1
+                if want == 0:
+                    break
+        rng.shuffle(picked)
+        return picked
+
+
+_pool_index = QuestionPoolIndex()
+
+
+def get_question_pool_index() -> QuestionPoolIndex:
+    return _pool_index
+
+
+def init_app(app) -> None:
+    _pool_index.init_app(app)
+
+
+def new_variant_seed() -> int:
+    return secrets.randbits(31)
+
+
+def promote_to_question_bank(gen_question: AIGeneratedQuestion) -> QuizQuestion:
+    """Copy an approved AI-generated question into quiz_questions so pools can use it.
+
+    Idempotent: returns the existing bank question if already promoted. The
+    caller commits.
+    """
+    if gen_question.quiz_question_id:
+        existing = QuizQuestion.query.get(gen_question.quiz_question_id)
+        if existing:
+            return existing
+
+    question = QuizQuestion(
+        topic_id=gen_question.topic_id,
+        course_id=gen_question.course_id,
+        question_text=gen_question.question_text,
+        question_type=gen_question.question_type or 'multiple_choice',
+        options=gen_question.options,
+        correct_answer=gen_question.correct_answer if gen_question.correct_answer is not None else 0,
+        explanation=gen_question.explanation,
+        difficulty_level=gen_question.difficulty_level or 1
+    )
+    db.session.add(question)
+    db.session.flush()
+    gen_question.quiz_question_id = question.question_id
+    return question
+
+
+def variant_question_ids(quiz, variant) -> List[int]:
+    """Ordered question ids of a stored variant"""
+    if variant.question_ids:
+        return json.loads(variant.question_ids)
+    rules = parse_pool_spec(quiz.pool_spec)
+    return _pool_index.assemble(quiz.course_id, rules, variant.seed, variant.pool_version)
+
+
+def open_variant(quiz, user_id: int):
+    """The user's latest variant of this quiz that has not been graded yet, or None"""
+    graded = db.session.query(QuizResult.result_id).filter(
+        QuizResult.variant_id == QuizVariant.variant_id
+    ).exists()
+    return QuizVariant.query.filter_by(quiz_id=quiz.quiz_id, user_id=user_id).filter(
+        ~graded
+    ).order_by(QuizVariant.variant_id.desc()).first()
+
+
+def create_variant(quiz, user_id: int):
+    """Draw a new variant for a pool-based quiz. Returns (QuizVariant, question_ids); caller commits."""
+    _pool_index.ensure_loaded()
+    seed = new_variant_seed()
+    drawn = _pool_index.assemble(quiz.course_id, parse_pool_spec(quiz.pool_spec), seed, _pool_index.version)
+    # Another worker may have deleted questions since this index was built
+    existing = {row[0] for row in db.session.query(QuizQuestion.question_id).filter(
+        QuizQuestion.question_id.in_(drawn)
+    ).all()} if drawn else set()
+    if len(existing) < len(drawn):
+        _pool_index.invalidate()
+    question_ids = [qid for qid in drawn if qid in existing]
+
+    variant = QuizVariant(
+        quiz_id=quiz.quiz_id,
+        user_id=user_id,
+        seed=seed,
+        pool_version=_pool_index.version,
+        question_ids=json.dumps(question_ids)
+    )
+    db.session.add(variant)
+    db.session.flush()
+    return variant, question_ids
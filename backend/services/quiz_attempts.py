@@ -0,0 +1,387 @@
+"""Server-side quiz attempt sessions with batched autosave.
+
+Answer deltas are merged into a key-value attempt store (in-process by
+default) and only dirty attempts are written to `quiz_attempts` by a
+background flusher every QUIZ_ATTEMPT_FLUSH_SECONDS. A click therefore costs a
+dictionary update, not a database round trip; after a restart attempts are
+reloaded from their last flushed copy.
+"""
+import atexit
+import importlib
+import json
+import logging
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, QuizAttempt, QuizQuestionMapping, QuizVariant
+
+logger = logging.getLogger(__name__)
+
+IDLE_EVICT_SECONDS = 6 * 3600  # drop clean, untouched attempts from memory after this long
+
+
+class AttemptStore(ABC):
+    """Key-value interface for live attempt state (values are JSON-serializable dicts).
+
+    Implementations backed by a shared store must make `update` atomic.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: Dict) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def update(self, key: str, fn: Callable[[Dict], Dict]) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    def items(self):
+        ...
+
+
+class InMemoryAttemptStore(AttemptStore):
+    """Per-process store; fine for a single worker or sticky sessions"""
+
+    def __init__(self):
+        self._data: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            return json.loads(json.dumps(value)) if value is not None else None
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def update(self, key, fn):
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                return None
+            self._data[key] = fn(value)
+            return self._data[key]
+
+    def items(self):
+        with self._lock:
+            return list(self._data.items())
+
+
+def _load_store(spec: str) -> AttemptStore:
+    if not spec or spec == 'memory':
+        return InMemoryAttemptStore()
+    module_name, _, class_name = spec.rpartition('.')
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+class AttemptError(Exception):
+    """Raised for attempt operations that are not allowed (maps to HTTP 4xx)"""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+class QuizAttemptManager:
+    """Start, autosave, resume and finish quiz attempts"""
+
+    def __init__(self):
+        self.app = None
+        self.store: AttemptStore = InMemoryAttemptStore()
+        self.flush_interval = 10
+        self.grace_seconds = 30
+        self._dirty = set()
+        self._dirty_lock = threading.Lock()
+        self._flusher = None
+        self._stop = threading.Event()
+
+    def init_app(self, app):
+        self.app = app
+        self.store = _load_store(app.config.get('QUIZ_ATTEMPT_STORE', 'memory'))
+        self.flush_interval = app.config.get('QUIZ_ATTEMPT_FLUSH_SECONDS', 10)
+        self.grace_seconds = app.config.get('QUIZ_TIME_GRACE_SECONDS', 30)
+        atexit.register(self.shutdown)
+
+    # ------------------------------------------------------------------ state
+
+    @staticmethod
+    def _question_ids(quiz, variant_id: Optional[int]) -> List[int]:
+        if variant_id:
+            from services.question_pool import variant_question_ids
+            return variant_question_ids(quiz, QuizVariant.query.get(variant_id))
+        rows = db.session.query(QuizQuestionMapping.question_id).filter_by(
+            quiz_id=quiz.quiz_id
+        ).order_by(QuizQuestionMapping.question_order).all()
+        return [row[0] for row in rows]
+
+    @staticmethod
+    def _to_state(row: QuizAttempt, question_ids: List[int]) -> Dict:
+        return {
+            'attempt_id': row.attempt_id,
+            'user_id': row.user_id,
+            'quiz_id': row.quiz_id,
+            'variant_id': row.variant_id,
+            'question_ids': question_ids,
+            'answers': json.loads(row.answers) if row.answers else {},
+            'started_at': row.started_at.timestamp() if row.started_at else time.time(),
+            'deadline': row.expires_at.timestamp() if row.expires_at else None,
+            'status': row.status,
+            'touched_at': time.time()
+        }
+
+    def remaining_seconds(self, state: Dict) -> Optional[int]:
+        if not state.get('deadline'):
+            return None
+        return max(0, int(state['deadline'] - time.time()))
+
+    def is_open(self, state: Dict) -> bool:
+        deadline = state.get('deadline')
+        return deadline is None or time.time() <= deadline + self.grace_seconds
+
+    # -------------------------------------------------------------- operations
+
+    def start(self, quiz, user_id: int) -> Dict:
+        """Resume the user's unsubmitted attempt for this quiz or start a new one.
+
+        An attempt whose deadline has passed is returned as well (never
+        replaced with a fresh clock); the caller submits it, see `is_open`.
+        """
+        now = datetime.utcnow()
+        open_row = QuizAttempt.query.filter_by(
+            user_id=user_id, quiz_id=quiz.quiz_id, status='in_progress'
+        ).order_by(QuizAttempt.started_at.desc()).first()
+        if open_row:
+            return self.get(open_row.attempt_id, user_id)
+
+        variant_id = None
+        question_ids = None
+        if quiz.pool_spec:
+            # Take over the variant the student already saw (GET /quizzes/<id>), if any
+            from services.question_pool import create_variant, open_variant, variant_question_ids
+            variant = open_variant(quiz, user_id)
+            if variant:
+                question_ids = variant_question_ids(quiz, variant)
+            else:
+                variant, question_ids = create_variant(quiz, user_id)
+            variant_id = variant.variant_id
+
+        row = QuizAttempt(
+            attempt_id=str(uuid.uuid4()),
+            user_id=user_id,
+            quiz_id=quiz.quiz_id,
+            variant_id=variant_id,
+            status='in_progress',
+            answers='{}',
+            started_at=now,
+            expires_at=now + timedelta(minutes=quiz.time_limit_minutes) if quiz.time_limit_minutes else None,
+            saved_at=now
+        )
+        db.session.add(row)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent start (double click, second tab) inserted the open attempt first
+            db.session.rollback()
+            winner = QuizAttempt.query.filter_by(
+                user_id=user_id, quiz_id=quiz.quiz_id, status='in_progress'
+            ).first()
+            if not winner:
+                raise
+            return self.get(winner.attempt_id, user_id)
+
+        if question_ids is None:
+            question_ids = self._question_ids(quiz, None)
+        state = self._to_state(row, question_ids)
+        self.store.set(row.attempt_id, state)
+        self._ensure_flusher()
+        return state
+
+    def get(self, attempt_id: str, user_id: int) -> Dict:
+        """Return live attempt state, reloading the last flushed copy on a store miss"""
+        state = self.store.get(attempt_id)
+        if state is None:
+            row = QuizAttempt.query.get(attempt_id)
+            if not row:
+                raise AttemptError('Attempt not found', 404)
+            from models import Quiz
+            state = self._to_state(row, self._question_ids(Quiz.query.get(row.quiz_id), row.variant_id))
+            if row.status == 'in_progress':
+                self.store.set(attempt_id, state)
+        if state['user_id'] != user_id:
+            raise AttemptError('Attempt not found', 404)
+        return state
+
+    def save_answers(self, attempt_id: str, user_id: int, deltas: List[Dict]) -> Dict:
+        """Merge a batch of answer changes into the live attempt (no database write).
+
+        A delta with "clear": true (or a null selected_answer) removes the saved answer.
+        """
+        state = self.get(attempt_id, user_id)
+        if state['status'] != 'in_progress':
+            raise AttemptError('Attempt already submitted', 409)
+        if not self.is_open(state):
+            raise AttemptError('Time limit exceeded', 409)
+
+        allowed = set(state['question_ids'])
+        changes = {}
+        for delta in deltas or []:
+            qid = delta.get('question_id')
+            if qid not in allowed:
+                continue
+            if delta.get('clear') or delta.get('selected_answer') is None:
+                changes[str(qid)] = None  # answer withdrawn: the question counts as unanswered again
+                continue
+            changes[str(qid)] = {
+                'selected_answer': delta.get('selected_answer'),
+                'time_spent_seconds': delta.get('time_spent_seconds', 0)
+            }
+
+        def merge(current):
+            for qid, value in changes.items():
+                if value is None:
+                    current['answers'].pop(qid, None)
+                else:
+                    current['answers'][qid] = value
+            current['touched_at'] = time.time()
+            return current
+
+        state = self.store.update(attempt_id, merge) or state
+        if changes:
+            with self._dirty_lock:
+                self._dirty.add(attempt_id)
+        self._ensure_flusher()
+        return {'saved': len(changes), 'answers': state['answers']}
+
+    def answers_for_grading(self, state: Dict) -> List[Dict]:
+        return [
+            {'question_id': int(qid), 'selected_answer': value.get('selected_answer'),
+             'time_spent_seconds': value.get('time_spent_seconds', 0)}
+            for qid, value in state['answers'].items()
+        ]
+
+    def claim(self, attempt_id: str) -> bool:
+        """Move the attempt from in_progress to submitted in the caller's transaction.
+
+        The conditional UPDATE lets exactly one of several concurrent submits
+        through; the winner grades, calls `finish` and commits (or rolls back to
+        release the claim), the others get False.
+        """
+        claimed = db.session.execute(
+            update(QuizAttempt)
+            .where(QuizAttempt.attempt_id == attempt_id, QuizAttempt.status == 'in_progress')
+            .values(status='submitted', saved_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if claimed != 1:
+            self._forget(attempt_id)  # submitted elsewhere: the live copy is stale
+        return claimed == 1
+
+    def finish(self, attempt_id: str, result_id: int) -> None:
+        """Record the result of a claimed attempt (written immediately) and drop it from the store"""
+        state = self.store.get(attempt_id)
+        row = QuizAttempt.query.get(attempt_id)
+        if row:
+            row.status = 'submitted'
+            row.result_id = result_id
+            if state:
+                row.answers = json.dumps(state['answers'])
+            row.saved_at = datetime.utcnow()
+        self._forget(attempt_id)
+
+    def _forget(self, attempt_id: str) -> None:
+        with self._dirty_lock:
+            self._dirty.discard(attempt_id)
+        self.store.delete(attempt_id)
+
+    # ------------------------------------------------------------------ flush
+
+    def flush(self) -> int:
+        """Write all dirty attempts in one batched UPDATE; returns rows written"""
+        with self._dirty_lock:
+            dirty, self._dirty = self._dirty, set()
+        if not dirty:
+            return 0
+
+        now = datetime.utcnow()
+        mappings = []
+        for attempt_id in dirty:
+            state = self.store.get(attempt_id)
+            if state and state['status'] == 'in_progress':
+                mappings.append({
+                    'attempt_id': attempt_id,
+                    'answers': json.dumps(state['answers']),
+                    'saved_at': now
+                })
+        if not mappings:
+            return 0
+        try:
+            db.session.bulk_update_mappings(QuizAttempt, mappings)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            with self._dirty_lock:
+                self._dirty.update(m['attempt_id'] for m in mappings)
+            raise
+        return len(mappings)
+
+    def _evict_idle(self) -> None:
+        cutoff = time.time() - IDLE_EVICT_SECONDS
+        with self._dirty_lock:
+            dirty = set(self._dirty)
+        for attempt_id, state in self.store.items():
+            if attempt_id not in dirty and state.get('touched_at', 0) < cutoff:
+                self.store.delete(attempt_id)
+
+    def _ensure_flusher(self) -> None:
+        if self._flusher is not None or self.app is None:
+            return
+        with self._dirty_lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._run_flusher, name='quiz-attempt-flusher', daemon=True)
+            self._flusher.start()
+
+    def _run_flusher(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            try:
+                with self.app.app_context():
+                    written = self.flush()
+                    self._evict_idle()
+                if written:
+                    logger.debug(f"[QuizAttempts] Flushed {written} attempts")
+            except Exception as e:
+                logger.error(f"[QuizAttempts] Flush failed: {e}")
+
+    def shutdown(self) -> None:
+        """Stop the flusher and write pending autosaves (registered with atexit)"""
+        self._stop.set()
+        if self.app is None:
+            return
+        try:
+            with self.app.app_context():
+                self.flush()
+        except Exception as e:
+            logger.error(f"[QuizAttempts] Final flush failed: {e}")
+
+
+attempt_manager = QuizAttemptManager()
@@ -0,0 +1,83 @@
+"""Request coalescing ("single flight") for expensive per-user computations.
+
+The dashboard fires several requests at once and they tend to need the same
+aggregates for the same user. Within one worker process, a call made while an
+identical call (same function and arguments) is still running waits for that
+call and shares its result (or exception) instead of hitting the database
+again. Nothing is cached: once the call returns, the next one computes afresh.
+
+Shared results are handed to every waiting caller, so treat them as read-only.
+"""
+import threading
+from functools import wraps
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.owner = threading.get_ident()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Per-key in-flight call registry"""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.metrics = {'calls': 0, 'shared': 0}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run fn() unless a call with the same key is in flight; returns (result, shared)"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None and call.owner == threading.get_ident():
+                # Re-entrant call from the computing thread: waiting would deadlock
+                self.metrics['calls'] += 1
+                call, leader = None, False
+            elif call is None:
+                call = self._calls[key] = _Call()
+                self.metrics['calls'] += 1
+                leader = True
+            else:
+                self.metrics['shared'] += 1
+                leader = False
+
+        if call is None:
+            return fn(), False
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self.metrics, in_flight=len(self._calls))
+
+
+flights = SingleFlight()
+
+
+def single_flight(fn):
+    """Coalesce concurrent calls of `fn` with identical (hashable) arguments"""
+    name = f"{fn.__module__}.{fn.__qualname__}"
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        key = (name, args, tuple(sorted(kwargs.items())))
+        return flights.do(key, lambda: fn(*args, **kwargs))[0]
+    return wrapper
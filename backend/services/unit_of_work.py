@@ -0,0 +1,126 @@
+"""Explicit transaction boundaries for requests and services.
+
+The pyodbc connection no longer runs in driver autocommit, so statements are
+grouped into one transaction per unit of work instead of one commit each:
+
+- `unit_of_work()`: context manager for service code; the outermost block
+  commits on success and rolls back on error, nested blocks join it. Pass
+  `autoflush=False` to let inserts accumulate and go out in one flush.
+- `@transactional`: the same around a view; commits when the response status
+  is below 400, otherwise rolls back.
+- `@read_only`: for GET views; any attempted flush raises
+  ReadOnlyTransactionError and the transaction is always rolled back
+  (PostgreSQL additionally gets SET TRANSACTION READ ONLY).
+"""
+import logging
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import jsonify
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from models import db
+
+logger = logging.getLogger(__name__)
+
+_DEPTH = 'uow_depth'
+_READ_ONLY = 'uow_read_only'
+
+
+class ReadOnlyTransactionError(RuntimeError):
+    pass
+
+
+@event.listens_for(Session, 'before_flush')
+def _reject_read_only_flush(session, flush_context, instances):
+    if session.info.get(_READ_ONLY) and (session.new or session.dirty or session.deleted):
+        raise ReadOnlyTransactionError('Write attempted inside a read-only transaction')
+
+
+@event.listens_for(Session, 'after_begin')
+def _begin_read_only(session, transaction, connection):
+    if session.info.get(_READ_ONLY) and connection.dialect.name == 'postgresql':
+        connection.execute(text('SET TRANSACTION READ ONLY'))
+
+
+def _enter(session) -> bool:
+    depth = session.info.get(_DEPTH, 0)
+    session.info[_DEPTH] = depth + 1
+    return depth == 0
+
+
+def _exit(session) -> None:
+    session.info[_DEPTH] -= 1
+
+
+@contextmanager
+def unit_of_work(autoflush: bool = True):
+    """Run a block in one transaction (joins an enclosing unit of work)"""
+    session = db.session()
+    outermost = _enter(session)
+    try:
+        if autoflush:
+            yield session
+        else:
+            with session.no_autoflush:
+                yield session
+        if outermost:
+            session.commit()
+    except Exception:
+        if outermost:
+            session.rollback()
+        raise
+    finally:
+        _exit(session)
+
+
+def _status_code(rv) -> int:
+    if isinstance(rv, tuple):
+        if len(rv) > 1 and isinstance(rv[1], int):
+            return rv[1]
+        rv = rv[0]
+    return getattr(rv, 'status_code', 200)
+
+
+def transactional(view):
+    """Commit the view's work once if it succeeds, roll it back otherwise"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        session = db.session()
+        outermost = _enter(session)
+        try:
+            rv = view(*args, **kwargs)
+        except Exception:
+            if outermost:
+                session.rollback()
+            _exit(session)
+            raise
+        try:
+            if outermost:
+                if _status_code(rv) < 400:
+                    session.commit()
+                else:
+                    session.rollback()
+            return rv
+        except Exception as e:
+            session.rollback()
+            logger.error(f"[UnitOfWork] Commit failed in {view.__name__}: {e}")
+            return jsonify({'error': str(e)}), 500
+        finally:
+            _exit(session)
+    return wrapper
+
+
+def read_only(view):
+    """Run a GET view in a transaction that may not write and always rolls back"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        session = db.session()
+        session.info[_READ_ONLY] = True
+        try:
+            return view(*args, **kwargs)
+        finally:
+            session.rollback()
+            session.info.pop(_READ_ONLY, None)
+    return wrapper
@@ -0,0 +1,153 @@
+"""Dialect-aware single-statement upserts.
+
+    upsert(LessonProgress, rows, keys=('user_id', 'lesson_id'),
+           update={'last_accessed': 'max', 'time_spent_minutes': 'add'})
+
+compiles to `MERGE ... WITH (HOLDLOCK)` on SQL Server and to
+`INSERT ... ON CONFLICT (...) DO UPDATE` on SQLite / PostgreSQL, so
+concurrent writers to a row guarded by a unique constraint neither race into
+IntegrityErrors nor need a SELECT first. With no `update` it is an
+insert-ignore.
+
+Update operations (existing value t, incoming value s):
+- 'replace': t = s
+- 'add':     t = COALESCE(t, 0) + s
+- 'max':     t = s when t IS NULL OR t < s
+"""
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import case, func, text
+
+from models import db
+
+MAX_PARAMS = 2000  # bound parameters per statement (SQL Server allows 2100)
+
+
+def _table(model_or_table):
+    return getattr(model_or_table, '__table__', model_or_table)
+
+
+def _with_defaults(table, rows: List[Dict]) -> List[Dict]:
+    """Fill Python-side column defaults (e.g. created_at=datetime.utcnow).
+
+    Core fires these for INSERT ... ON CONFLICT but not for the textual MERGE,
+    so they are applied up front for every dialect.
+    """
+    defaults = [
+        column for column in table.columns
+        if column.default is not None and (column.default.is_scalar or column.default.is_callable)
+        and any(column.name not in row for row in rows)
+    ]
+    if not defaults:
+        return rows
+    filled = []
+    for row in rows:
+        row = dict(row)
+        for column in defaults:
+            if column.name not in row:
+                default = column.default
+                row[column.name] = default.arg(None) if default.is_callable else default.arg
+        filled.append(row)
+    return filled
+
+
+def _on_conflict_insert(dialect_name: str):
+    if dialect_name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+def _on_conflict_value(op: str, current, incoming):
+    if op == 'replace':
+        return incoming
+    if op == 'add':
+        return func.coalesce(current, 0) + incoming
+    if op == 'max':
+        return case((current.is_(None), incoming), (current < incoming, incoming), else_=current)
+    raise ValueError(f'Unknown upsert operation: {op}')
+
+
+def _merge_value(op: str, column: str) -> str:
+    t, s = f't.[{column}]', f's.[{column}]'
+    if op == 'replace':
+        return s
+    if op == 'add':
+        return f'COALESCE({t}, 0) + {s}'
+    if op == 'max':
+        return f'CASE WHEN {t} IS NULL OR {t} < {s} THEN {s} ELSE {t} END'
+    raise ValueError(f'Unknown upsert operation: {op}')
+
+
+def _merge(table, rows: List[Dict], keys: Sequence[str], update: Dict[str, str]) -> int:
+    columns = list(rows[0].keys())
+    params = {}
+    values_sql = []
+    for i, row in enumerate(rows):
+        names = []
+        for j, column in enumerate(columns):
+            params[f'p{i}_{j}'] = row[column]
+            names.append(f':p{i}_{j}')
+        values_sql.append(f"({', '.join(names)})")
+
+    sql = (
+        f"MERGE INTO [{table.name}] WITH (HOLDLOCK) AS t "
+        f"USING (VALUES {', '.join(values_sql)}) AS s ({', '.join(f'[{c}]' for c in columns)}) "
+        f"ON {' AND '.join(f't.[{k}] = s.[{k}]' for k in keys)} "
+    )
+    if update:
+        sql += "WHEN MATCHED THEN UPDATE SET " + ', '.join(
+            f'[{column}] = {_merge_value(op, column)}' for column, op in update.items()
+        ) + ' '
+    sql += (
+        f"WHEN NOT MATCHED THEN INSERT ({', '.join(f'[{c}]' for c in columns)}) "
+        f"VALUES ({', '.join(f's.[{c}]' for c in columns)});"
+    )
+    return db.session.execute(text(sql), params).rowcount or 0
+
+
+def _on_conflict(table, rows: List[Dict], keys: Sequence[str], update: Dict[str, str], dialect_name: str) -> int:
+    insert = _on_conflict_insert(dialect_name)
+    stmt = insert(table).values(rows)
+    if update:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={column: _on_conflict_value(op, table.c[column], stmt.excluded[column]) for column, op in update.items()}
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=list(keys))
+    return db.session.execute(stmt).rowcount or 0
+
+
+def upsert(model_or_table, rows: Iterable[Dict], keys: Sequence[str],
+           update: Optional[Dict[str, str]] = None) -> int:
+    """Insert rows, resolving unique-key conflicts in the same statement.
+
+    All rows must have the same columns, and keys must be unique within one
+    call. Large batches are split into statements of at most MAX_PARAMS
+    parameters. Runs in the caller's transaction (no commit). Returns the
+    number of rows inserted or updated; an ignored conflict counts 0.
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+    table = _table(model_or_table)
+    rows = _with_defaults(table, rows)
+    update = update or {}
+    dialect_name = db.session.get_bind().dialect.name
+
+    chunk_size = max(1, MAX_PARAMS // len(rows[0]))
+    affected = 0
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        if dialect_name == 'mssql':
+            affected += _merge(table, chunk, keys, update)
+        else:
+            affected += _on_conflict(table, chunk, keys, update, dialect_name)
+    return affected
+
+
+def insert_ignore(model_or_table, row: Dict, keys: Sequence[str]) -> bool:
+    """Insert one row unless its unique key already exists. Returns True if inserted."""
+    return upsert(model_or_table, [row], keys) == 1
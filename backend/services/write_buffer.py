@@ -0,0 +1,115 @@
+"""In-process coalescing write buffer.
+
+Hot write paths record `key -> value` here instead of writing to the database
+per request. Repeated writes to the same key are merged in memory and a
+background thread hands the whole batch to a flush function every
+`interval` seconds, or sooner once `max_entries` keys are pending. Pending
+entries are flushed at interpreter exit; a hard crash loses at most one
+flush window.
+"""
+import atexit
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CoalescingBuffer:
+    """Thread-safe dict of pending writes with periodic / size-triggered flush"""
+
+    def __init__(self, name: str, flush_fn: Callable[[Dict[Hashable, Any]], None],
+                 merge: Optional[Callable[[Any, Any], Any]] = None,
+                 interval: float = 5.0, max_entries: int = 1000):
+        self.name = name
+        self.flush_fn = flush_fn  # called inside an app context with {key: merged value}
+        self.merge = merge or (lambda old, new: new)
+        self.interval = interval
+        self.max_entries = max_entries
+        self.app = None
+        self._pending: Dict[Hashable, Any] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def init_app(self, app, interval: Optional[float] = None, max_entries: Optional[int] = None) -> None:
+        self.app = app
+        if interval is not None:
+            self.interval = interval
+        if max_entries is not None:
+            self.max_entries = max_entries
+        atexit.register(self.shutdown)
+
+    def add(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            if key in self._pending:
+                self._pending[key] = self.merge(self._pending[key], value)
+            else:
+                self._pending[key] = value
+            full = len(self._pending) >= self.max_entries
+        self._ensure_thread()
+        if full:
+            self._wake.set()
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Pending (not yet flushed) value for a key"""
+        with self._lock:
+            return self._pending.get(key, default)
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def flush(self) -> int:
+        """Flush pending entries now (caller provides the app context). Returns entries written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+            try:
+                self.flush_fn(batch)
+            except Exception:
+                # Put the batch back, merged under anything recorded meanwhile
+                with self._lock:
+                    for key, value in batch.items():
+                        if key in self._pending:
+                            self._pending[key] = self.merge(value, self._pending[key])
+                        else:
+                            self._pending[key] = value
+                raise
+            return len(batch)
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None or self.app is None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name=f'{self.name}-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                with self.app.app_context():
+                    written = self.flush()
+                if written:
+                    logger.debug(f"[WriteBuffer] {self.name}: flushed {written} entries")
+            except Exception as e:
+                logger.error(f"[WriteBuffer] {self.name}: flush failed: {e}")
+
+    def shutdown(self) -> None:
+        """Stop the flusher thread and write whatever is pending (registered with atexit)"""
+        self._stop.set()
+        self._wake.set()
+        if self.app is None:
+            return
+        try:
+            with self.app.app_context():
+                self.flush()
+        except Exception as e:
+            logger.error(f"[WriteBuffer] {self.name}: final flush failed: {e}")
@@ -19,3 +19,21 @@ def parse_possible_int(val):
         return int(val)
     except Exception:
         return val
+
+
+def parse_fields(raw, allowed, default):
+    """Parse a `?fields=a,b` sparse-fieldset parameter.
+
+    Returns `default` when absent, otherwise the requested fields in request
+    order. Raises ValueError for fields not in `allowed` and for a parameter
+    that names no field at all (e.g. `?fields=,`).
+    """
+    if not raw:
+        return tuple(default)
+    fields = tuple(dict.fromkeys(f.strip() for f in raw.split(',') if f.strip()))
+    if not fields:
+        raise ValueError(f"fields must name at least one of: {', '.join(allowed)}")
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(allowed)}")
+    return fields
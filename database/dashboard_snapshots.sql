@@ -0,0 +1,13 @@
+-- Snapshot dashboard cho từng học viên (cập nhật dần theo sự kiện, đọc bằng một truy vấn)
+-- Snapshot bị xóa sẽ được dựng lại ở lần đọc kế tiếp; chạy scripts/rebuild_dashboard_snapshots.py để sửa sai lệch.
+
+IF OBJECT_ID('user_dashboard_snapshots', 'U') IS NULL
+CREATE TABLE user_dashboard_snapshots (
+    user_id INT PRIMARY KEY,
+    payload NVARCHAR(MAX) NOT NULL,  -- JSON: {"courses": [...], "recent_quizzes": [...]}
+    updated_at DATETIME DEFAULT GETDATE(),
+    CONSTRAINT FK_user_dashboard_snapshots_user FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+);
+GO
+
+PRINT 'Đã tạo bảng user_dashboard_snapshots!';
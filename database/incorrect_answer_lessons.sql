@@ -0,0 +1,38 @@
+-- Bài học gợi ý cho mỗi lỗi sai: bảng liên kết thay cho cột JSON incorrect_answer_analysis.recommended_lessons
+-- Ghi bởi IncorrectAnswerRecommendationEngine; đọc bằng JOIN hoặc một truy vấn IN thay vì giải mã JSON từng dòng.
+
+IF OBJECT_ID('incorrect_answer_lessons', 'U') IS NULL
+CREATE TABLE incorrect_answer_lessons (
+    analysis_id INT NOT NULL,
+    lesson_id INT NOT NULL,
+    position INT NOT NULL DEFAULT 0,  -- thứ tự gợi ý (0 = liên quan nhất)
+    score DECIMAL(5, 4) NULL,         -- độ tương đồng TF-IDF (ai_models/lesson_index.py)
+    CONSTRAINT PK_incorrect_answer_lessons PRIMARY KEY (analysis_id, lesson_id),
+    CONSTRAINT FK_incorrect_answer_lessons_analysis FOREIGN KEY (analysis_id) REFERENCES incorrect_answer_analysis(analysis_id) ON DELETE CASCADE,
+    CONSTRAINT FK_incorrect_answer_lessons_lesson FOREIGN KEY (lesson_id) REFERENCES lessons(lesson_id) ON DELETE CASCADE
+);
+GO
+
+-- Lỗi sai liên quan đến một bài học (/api/incorrect-answers/related-lesson/<id>)
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'idx_incorrect_answer_lessons_lesson' AND object_id = OBJECT_ID('incorrect_answer_lessons'))
+    CREATE INDEX idx_incorrect_answer_lessons_lesson ON incorrect_answer_lessons(lesson_id, analysis_id);
+GO
+
+-- Chuyển dữ liệu từ cột JSON cũ (bỏ qua id bài học không còn tồn tại), sau đó xóa cột
+IF COL_LENGTH('incorrect_answer_analysis', 'recommended_lessons') IS NOT NULL
+BEGIN
+    EXEC('
+        INSERT INTO incorrect_answer_lessons (analysis_id, lesson_id, position)
+        SELECT iaa.analysis_id, l.lesson_id, MIN(CAST(j.[key] AS INT))
+        FROM incorrect_answer_analysis iaa
+        CROSS APPLY OPENJSON(CAST(iaa.recommended_lessons AS NVARCHAR(MAX))) j
+        JOIN lessons l ON l.lesson_id = TRY_CAST(j.value AS INT)
+        WHERE ISJSON(CAST(iaa.recommended_lessons AS NVARCHAR(MAX))) = 1
+          AND NOT EXISTS (SELECT 1 FROM incorrect_answer_lessons x WHERE x.analysis_id = iaa.analysis_id)
+        GROUP BY iaa.analysis_id, l.lesson_id
+    ');
+    ALTER TABLE incorrect_answer_analysis DROP COLUMN recommended_lessons;
+END
+GO
+
+PRINT 'Đã tạo bảng incorrect_answer_lessons!';
@@ -0,0 +1,45 @@
+-- Liên kết trực tiếp bài học -> bài kiểm tra (thay cho tra cứu LIKE 'LessonQuiz:{id}:%')
+-- Chạy một lần trên database hiện có; script có thể chạy lại nhiều lần.
+
+IF COL_LENGTH('quizzes', 'lesson_id') IS NULL
+    ALTER TABLE quizzes ADD lesson_id INT NULL;
+GO
+
+IF NOT EXISTS (SELECT * FROM sys.foreign_keys WHERE name = 'FK_quizzes_lesson')
+    ALTER TABLE quizzes
+    ADD CONSTRAINT FK_quizzes_lesson FOREIGN KEY (lesson_id) REFERENCES lessons(lesson_id);
+GO
+
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'idx_quizzes_lesson' AND object_id = OBJECT_ID('quizzes'))
+    CREATE INDEX idx_quizzes_lesson ON quizzes(lesson_id);
+GO
+
+IF COL_LENGTH('lessons', 'current_quiz_id') IS NULL
+    ALTER TABLE lessons ADD current_quiz_id INT NULL;
+GO
+
+-- Backfill quizzes.lesson_id từ tên quiz do AI tạo: 'LessonQuiz:{lesson_id}:{title}'
+UPDATE q
+SET q.lesson_id = l.lesson_id
+FROM quizzes q
+JOIN lessons l
+  ON l.lesson_id = TRY_CAST(
+        SUBSTRING(q.quiz_name, 12, CHARINDEX(':', q.quiz_name + ':', 12) - 12) AS INT)
+WHERE q.quiz_name LIKE 'LessonQuiz:%'
+  AND q.lesson_id IS NULL;
+GO
+
+-- Quiz hiện tại của mỗi bài học = quiz mới nhất được tạo cho bài học đó
+UPDATE l
+SET l.current_quiz_id = latest.quiz_id
+FROM lessons l
+JOIN (
+    SELECT lesson_id, MAX(quiz_id) AS quiz_id
+    FROM quizzes
+    WHERE lesson_id IS NOT NULL
+    GROUP BY lesson_id
+) latest ON latest.lesson_id = l.lesson_id
+WHERE l.current_quiz_id IS NULL;
+GO
+
+PRINT 'Đã liên kết bài học với bài kiểm tra!';
@@ -0,0 +1,38 @@
+-- Bộ đếm tiến độ phi chuẩn hóa: courses.lesson_count và enrollments.completed_count
+-- Tiến độ được tính lại O(1) = completed_count / lesson_count. Kiểm tra bằng scripts/check_progress_counters.py.
+
+IF COL_LENGTH('courses', 'lesson_count') IS NULL
+    ALTER TABLE courses ADD lesson_count INT NOT NULL CONSTRAINT DF_courses_lesson_count DEFAULT 0;
+GO
+
+IF COL_LENGTH('enrollments', 'completed_count') IS NULL
+    ALTER TABLE enrollments ADD completed_count INT NOT NULL CONSTRAINT DF_enrollments_completed_count DEFAULT 0;
+GO
+
+-- Backfill từ dữ liệu hiện có
+UPDATE c SET lesson_count = ISNULL(l.cnt, 0)
+FROM courses c
+LEFT JOIN (SELECT course_id, COUNT(*) AS cnt FROM lessons GROUP BY course_id) l ON l.course_id = c.course_id;
+GO
+
+UPDATE e SET completed_count = ISNULL(p.cnt, 0)
+FROM enrollments e
+LEFT JOIN (
+    SELECT lp.user_id, l.course_id, COUNT(*) AS cnt
+    FROM lesson_progress lp
+    JOIN lessons l ON l.lesson_id = lp.lesson_id
+    WHERE lp.is_completed = 1
+    GROUP BY lp.user_id, l.course_id
+) p ON p.user_id = e.user_id AND p.course_id = e.course_id;
+GO
+
+UPDATE e SET progress_percentage = CASE
+    WHEN c.lesson_count <= 0 THEN 0
+    WHEN e.completed_count >= c.lesson_count THEN 100
+    ELSE e.completed_count * 100.0 / c.lesson_count
+END
+FROM enrollments e
+JOIN courses c ON c.course_id = e.course_id;
+GO
+
+PRINT 'Đã thêm và khởi tạo bộ đếm tiến độ!';
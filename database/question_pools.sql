@@ -0,0 +1,35 @@
+-- Ngân hàng câu hỏi theo pool và đề ngẫu nhiên cho từng sinh viên
+-- Mỗi đề lưu danh sách câu hỏi đã rút (question_ids); đề cũ chưa có cột này được dựng lại từ (seed, pool_version).
+
+IF COL_LENGTH('quizzes', 'pool_spec') IS NULL
+    ALTER TABLE quizzes ADD pool_spec NVARCHAR(MAX) NULL;  -- JSON: [{"topic_id":1,"difficulty_level":2,"count":3}]
+GO
+
+IF COL_LENGTH('ai_generated_questions', 'quiz_question_id') IS NULL
+    ALTER TABLE ai_generated_questions ADD quiz_question_id INT NULL
+        CONSTRAINT FK_ai_generated_questions_bank FOREIGN KEY REFERENCES quiz_questions(question_id);
+GO
+
+IF OBJECT_ID('quiz_variants', 'U') IS NULL
+CREATE TABLE quiz_variants (
+    variant_id INT PRIMARY KEY IDENTITY(1,1),
+    quiz_id INT NOT NULL,
+    user_id INT NOT NULL,
+    seed BIGINT NOT NULL,
+    pool_version INT NOT NULL,  -- question_id lớn nhất có trong pool khi tạo đề
+    created_at DATETIME DEFAULT GETDATE(),
+    CONSTRAINT FK_quiz_variants_quiz FOREIGN KEY (quiz_id) REFERENCES quizzes(quiz_id) ON DELETE CASCADE,
+    CONSTRAINT FK_quiz_variants_user FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+);
+GO
+
+IF COL_LENGTH('quiz_variants', 'question_ids') IS NULL
+    ALTER TABLE quiz_variants ADD question_ids NVARCHAR(MAX) NULL;  -- JSON: [12, 5, 40] theo thứ tự trong đề
+GO
+
+IF COL_LENGTH('quiz_results', 'variant_id') IS NULL
+    ALTER TABLE quiz_results ADD variant_id INT NULL
+        CONSTRAINT FK_quiz_results_variant FOREIGN KEY REFERENCES quiz_variants(variant_id);
+GO
+
+PRINT 'Đã tạo cấu trúc question pools! Chạy scripts/promote_approved_questions.py để đưa câu hỏi AI đã duyệt vào ngân hàng.';
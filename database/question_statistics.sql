@@ -0,0 +1,28 @@
+-- Bảng thống kê câu hỏi (item analysis) và trạng thái batch job
+-- Được cập nhật bởi scripts/refresh_question_stats.py (ItemAnalysisEngine)
+
+IF OBJECT_ID('question_statistics', 'U') IS NULL
+CREATE TABLE question_statistics (
+    question_id INT PRIMARY KEY,
+    response_count INT DEFAULT 0,
+    correct_count INT DEFAULT 0,
+    p_value FLOAT,               -- Độ khó: tỉ lệ trả lời đúng (0-1)
+    point_biserial FLOAT,        -- Độ phân biệt
+    distractor_counts NVARCHAR(MAX),  -- JSON: {"0": 12, "1": 3, "none": 1}
+    median_time_seconds FLOAT,
+    updated_at DATETIME DEFAULT GETDATE(),
+    CONSTRAINT FK_question_statistics_question FOREIGN KEY (question_id) REFERENCES quiz_questions(question_id) ON DELETE CASCADE
+);
+
+IF OBJECT_ID('batch_job_state', 'U') IS NULL
+CREATE TABLE batch_job_state (
+    job_name VARCHAR(100) PRIMARY KEY,
+    high_water_mark INT DEFAULT 0,  -- ví dụ: answer_id lớn nhất đã xử lý
+    updated_at DATETIME DEFAULT GETDATE()
+);
+
+-- Truy vấn tăng dần theo answer_id cần index theo (answer_id) kèm question_id
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'idx_quiz_answers_question' AND object_id = OBJECT_ID('quiz_answers'))
+    CREATE INDEX idx_quiz_answers_question ON quiz_answers(question_id) INCLUDE (result_id, selected_answer, is_correct, time_spent_seconds);
+
+PRINT 'Đã tạo bảng question_statistics!';
@@ -0,0 +1,9 @@
+-- Hỗ trợ chấm điểm cho mọi loại câu hỏi (multiple_choice, multiple_select, true_false, short_answer)
+-- multiple_select: correct_answer / selected_answer là bitmask các lựa chọn (bit i = lựa chọn i)
+-- short_answer: options chứa danh sách đáp án được chấp nhận; câu trả lời tự do lưu ở answer_text
+
+IF COL_LENGTH('quiz_answers', 'answer_text') IS NULL
+    ALTER TABLE quiz_answers ADD answer_text NVARCHAR(MAX) NULL;
+GO
+
+PRINT 'Đã thêm cột quiz_answers.answer_text!';
@@ -0,0 +1,32 @@
+-- Phiên làm bài kiểm tra phía server (tự lưu đáp án theo lô, tiếp tục sau khi tải lại trang)
+-- Trạng thái đang làm nằm trong attempt store; bảng này là bản lưu định kỳ để khôi phục.
+
+IF OBJECT_ID('quiz_attempts', 'U') IS NULL
+CREATE TABLE quiz_attempts (
+    attempt_id VARCHAR(36) PRIMARY KEY,  -- uuid4
+    user_id INT NOT NULL,
+    quiz_id INT NOT NULL,
+    variant_id INT NULL,
+    status NVARCHAR(20) DEFAULT 'in_progress',  -- in_progress, submitted
+    answers NVARCHAR(MAX) NULL,  -- JSON: {"question_id": {"selected_answer": 1, "time_spent_seconds": 12}}
+    started_at DATETIME DEFAULT GETDATE(),
+    expires_at DATETIME NULL,  -- started_at + time_limit_minutes (NULL = không giới hạn)
+    saved_at DATETIME NULL,
+    result_id INT NULL,
+    CONSTRAINT FK_quiz_attempts_user FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
+    CONSTRAINT FK_quiz_attempts_quiz FOREIGN KEY (quiz_id) REFERENCES quizzes(quiz_id) ON DELETE CASCADE,
+    CONSTRAINT FK_quiz_attempts_variant FOREIGN KEY (variant_id) REFERENCES quiz_variants(variant_id),
+    CONSTRAINT FK_quiz_attempts_result FOREIGN KEY (result_id) REFERENCES quiz_results(result_id)
+);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'idx_quiz_attempts_user_quiz')
+    CREATE INDEX idx_quiz_attempts_user_quiz ON quiz_attempts(user_id, quiz_id, status);
+GO
+
+-- Mỗi sinh viên chỉ có một lượt làm đang mở cho mỗi bài kiểm tra (hai yêu cầu bắt đầu đồng thời: một lượt thắng)
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'uq_quiz_attempts_open')
+    CREATE UNIQUE INDEX uq_quiz_attempts_open ON quiz_attempts(user_id, quiz_id) WHERE status = 'in_progress';
+GO
+
+PRINT 'Đã tạo bảng quiz_attempts!';
@@ -0,0 +1,18 @@
+-- Gợi ý bài học tính trước hàng đêm (scripts/precompute_recommendations.py)
+-- ai_recommendations lưu top-k bài học cho mỗi học viên; API đọc trực tiếp từ bảng này.
+
+IF COL_LENGTH('ai_recommendations', 'topic_id') IS NULL
+    ALTER TABLE ai_recommendations ADD topic_id INT NULL;  -- chủ đề yếu (weak_area_review)
+GO
+
+IF COL_LENGTH('ai_recommendations', 'score') IS NULL
+    ALTER TABLE ai_recommendations ADD score DECIMAL(5, 2) NULL;  -- điểm trung bình của chủ đề yếu
+GO
+
+-- Đọc theo user, giữ thứ tự ghi (recommendation_id)
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'idx_ai_recommendations_user_content' AND object_id = OBJECT_ID('ai_recommendations'))
+    CREATE INDEX idx_ai_recommendations_user_content ON ai_recommendations(user_id, recommendation_id)
+    INCLUDE (recommendation_type, content_type, content_id, priority, topic_id, score);
+GO
+
+PRINT 'Đã cập nhật bảng ai_recommendations cho gợi ý tính trước!';
@@ -66,6 +66,7 @@ CREATE TABLE lessons (
     lesson_order INT NOT NULL,
     video_url NVARCHAR(500),
     duration_minutes INT,
+    current_quiz_id INT, -- quiz hiện tại của bài học (xem quizzes.lesson_id)
     created_at DATETIME DEFAULT GETDATE(),
     updated_at DATETIME DEFAULT GETDATE(),
     FOREIGN KEY (course_id) REFERENCES courses(course_id) ON DELETE CASCADE
@@ -139,11 +140,13 @@ CREATE TABLE quizzes (
     quiz_name NVARCHAR(200) NOT NULL,
     course_id INT,
     topic_id INT,
+    lesson_id INT,
     time_limit_minutes INT,
     passing_score INT DEFAULT 60,
     created_at DATETIME DEFAULT GETDATE(),
     FOREIGN KEY (course_id) REFERENCES courses(course_id) ON DELETE CASCADE,
-    FOREIGN KEY (topic_id) REFERENCES topics(topic_id)
+    FOREIGN KEY (topic_id) REFERENCES topics(topic_id),
+    CONSTRAINT FK_quizzes_lesson FOREIGN KEY (lesson_id) REFERENCES lessons(lesson_id)
 );
 
 -- Bảng Câu Hỏi trong Bài Kiểm Tra
@@ -259,6 +262,7 @@ CREATE INDEX idx_enrollments_course ON enrollments(course_id);
 CREATE INDEX idx_lesson_progress_user ON lesson_progress(user_id);
 CREATE INDEX idx_quiz_results_user ON quiz_results(user_id);
 CREATE INDEX idx_quiz_results_quiz ON quiz_results(quiz_id);
+CREATE INDEX idx_quizzes_lesson ON quizzes(lesson_id);
 CREATE INDEX idx_learning_analytics_user ON learning_analytics(user_id);
 CREATE INDEX idx_ai_recommendations_user ON ai_recommendations(user_id);
 
@@ -128,10 +128,27 @@ const lessonsAPI = {
         return apiRequest(`/lessons/${lessonId}`);
     },
     
+    async getByCourse(courseId) {
+        return apiRequest(`/lessons/course/${courseId}`);
+    },
+    
     async markComplete(lessonId) {
         return apiRequest(`/lessons/${lessonId}/complete`, {
             method: 'POST'
         });
+    },
+    
+    async getQuiz(lessonId) {
+        return apiRequest(`/lessons/${lessonId}/quiz`);
+    },
+    
+    // Learning-time heartbeats; keepalive lets the last batch survive page unload
+    async heartbeat(events) {
+        return apiRequest('/lessons/heartbeat', {
+            method: 'POST',
+            keepalive: true,
+            body: JSON.stringify({ sent_ts: Date.now() / 1000, events: events })
+        });
     }
 };
 
@@ -146,22 +163,59 @@ const quizzesAPI = {
         return apiRequest(`/quizzes/${quizId}`);
     },
     
-    async submitQuiz(quizId, answers, timeTaken) {
+    async submitQuiz(quizId, answers, timeTaken, variantId = null) {
         return apiRequest(`/quizzes/${quizId}/submit`, {
             method: 'POST',
             body: JSON.stringify({
                 answers: answers,
-                time_taken_minutes: timeTaken
+                time_taken_minutes: timeTaken,
+                variant_id: variantId
             })
         });
     },
     
+    // Server-side attempts: start (or resume), autosave deltas, submit
+    async startAttempt(quizId) {
+        return apiRequest(`/quizzes/${quizId}/attempts`, {
+            method: 'POST'
+        });
+    },
+    
+    async getAttempt(attemptId) {
+        return apiRequest(`/quizzes/attempts/${attemptId}`);
+    },
+    
+    async saveAttemptAnswers(attemptId, answers) {
+        return apiRequest(`/quizzes/attempts/${attemptId}/answers`, {
+            method: 'POST',
+            body: JSON.stringify({ answers: answers })
+        });
+    },
+    
+    async submitAttempt(attemptId, answers = []) {
+        return apiRequest(`/quizzes/attempts/${attemptId}/submit`, {
+            method: 'POST',
+            body: JSON.stringify({ answers: answers })
+        });
+    },
+    
     async getResults(quizId = null) {
         const query = quizId ? `?quiz_id=${quizId}` : '';
         return apiRequest(`/quizzes/results${query}`);
     }
 };
 
+// Incorrect answers API
+const incorrectAnswersAPI = {
+    // Analyze every wrong answer of a submission and get lessons to review
+    async analyzeResult(resultId) {
+        return apiRequest('/incorrect-answers/analyze-result', {
+            method: 'POST',
+            body: JSON.stringify({ result_id: resultId })
+        });
+    }
+};
+
 // Progress API
 const progressAPI = {
     async getDashboard() {
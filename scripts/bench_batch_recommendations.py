@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Benchmark nightly recommendation precompute vs per-user live generation.
+
+Runs against a throwaway in-memory SQLite database (no server needed) with a
+catalog of courses, topics and quiz results, and a population of students
+with random progress. Prints the time to generate recommendations for every
+user live (LessonRecommendationEngine, one call per user) and with
+BatchRecommendationEngine.precompute (scoring + bulk write), the per-request
+query count of serving from the stored rows, and checks that the stored
+top 10 matches the live output for every user. A collaborative model is
+trained on the same data first, so its slots are part of the comparison.
+
+Usage: python scripts/bench_batch_recommendations.py [user_count ...]
+"""
+import logging
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from flask import Flask
+from sqlalchemy import event
+
+# Import backend modules directly (same layout as running backend/app.py as a script)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+from models import db, User, Course, Lesson, LessonProgress, Topic, Quiz, QuizResult  # noqa: E402
+from ai_models.lesson_recommendation import LessonRecommendationEngine  # noqa: E402
+from ai_models.batch_recommendations import BatchRecommendationEngine  # noqa: E402
+from ai_models.collaborative_filtering import train, cf_model  # noqa: E402
+
+USER_COUNTS = [int(n) for n in sys.argv[1:]] or [50, 200, 400]
+COURSES = 8
+LESSONS_PER_COURSE = 25
+TOPICS_PER_COURSE = 3
+
+
+def key(recs):
+    return [(r['lesson_id'], r['type']) for r in recs]
+
+
+logging.getLogger('ai_models.lesson_recommendation').setLevel(logging.WARNING)
+logging.getLogger('ai_models.batch_recommendations').setLevel(logging.WARNING)
+logging.getLogger('ai_models.collaborative_filtering').setLevel(logging.WARNING)
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+db.init_app(app)
+rng = random.Random(42)
+
+with app.app_context():
+    db.create_all()
+    quizzes, lessons = [], []
+    for c in range(COURSES):
+        course = Course(course_name=f'Course {c}', lesson_count=LESSONS_PER_COURSE)
+        db.session.add(course)
+        db.session.flush()
+        lessons += [Lesson(course_id=course.course_id, lesson_title=f'Lesson {c}.{i}', lesson_order=i)
+                    for i in range(LESSONS_PER_COURSE)]
+        for t in range(TOPICS_PER_COURSE):
+            topic = Topic(course_id=course.course_id, topic_name=f'Topic {c}.{t}')
+            db.session.add(topic)
+            db.session.flush()
+            quiz = Quiz(course_id=course.course_id, topic_id=topic.topic_id, quiz_name=f'Quiz {c}.{t}')
+            db.session.add(quiz)
+            quizzes.append(quiz)
+    db.session.add_all(lessons)
+    db.session.commit()
+
+    print(f"{'users':>6} | {'live s':>8} | {'batch s':>8} | {'serve queries':>13} | same")
+    created = 0
+    for count in USER_COUNTS:
+        now = datetime.utcnow()
+        for _ in range(count - created):
+            user = User(username=f'bench{created}', email=f'bench{created}@example.com', full_name='Bench')
+            user.set_password('bench')
+            db.session.add(user)
+            db.session.flush()
+            created += 1
+            for lesson in rng.sample(lessons, rng.randint(0, len(lessons) // 2)):
+                db.session.add(LessonProgress(
+                    user_id=user.user_id, lesson_id=lesson.lesson_id, is_completed=rng.random() < 0.6,
+                    last_accessed=now - timedelta(hours=rng.randint(1, 400))
+                ))
+            for quiz in rng.sample(quizzes, rng.randint(0, 4)):
+                db.session.add(QuizResult(user_id=user.user_id, quiz_id=quiz.quiz_id,
+                                          score=rng.randint(20, 100), total_questions=10, correct_answers=5))
+        db.session.commit()
+        user_ids = [row[0] for row in db.session.query(User.user_id).order_by(User.user_id).all()]
+        with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as tmp:
+            train(Path(tmp) / 'model')
+            cf_model.load(Path(tmp) / 'model')
+
+        start = time.perf_counter()
+        live = {user_id: LessonRecommendationEngine.generate_recommendations(user_id) for user_id in user_ids}
+        live_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        BatchRecommendationEngine.precompute()
+        batch_time = time.perf_counter() - start
+
+        queries = []
+        listener = lambda *a, **k: queries.append(1)  # noqa: E731
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        served = {user_id: BatchRecommendationEngine.get_precomputed(user_id) or [] for user_id in user_ids}
+        event.remove(db.engine, 'before_cursor_execute', listener)
+
+        same = all(key(live[user_id]) == key(served[user_id]) for user_id in user_ids)
+        print(f"{count:>6} | {live_time:>8.2f} | {batch_time:>8.2f} | {len(queries) / len(user_ids):>13.1f} | {same}")
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Benchmark the ALS recommender: training, artifact size, top-k latency, hit rate.
+
+Runs against a throwaway in-memory SQLite database (no server needed). Users
+follow one of a few learning tracks (groups of related courses); 20% of each
+user's lesson progress is held out before training. Prints training time,
+artifact size, memory-mapped load time, per-user top-k latency, and the
+hit rate@10 on held-out lessons for the model vs a popularity baseline.
+
+Usage: python scripts/bench_collaborative.py [user_count]
+"""
+import logging
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from flask import Flask
+from sqlalchemy import insert
+
+# Import backend modules directly (same layout as running backend/app.py as a script)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+from models import db, User, Course, Lesson, Enrollment, LessonProgress  # noqa: E402
+from ai_models.collaborative_filtering import train, CollaborativeModel  # noqa: E402
+
+USERS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+COURSES = 12
+LESSONS_PER_COURSE = 20
+TRACKS = [list(range(i, i + 3)) for i in range(0, COURSES, 3)]
+TOP_K = 10
+
+logging.getLogger('ai_models.collaborative_filtering').setLevel(logging.WARNING)
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+db.init_app(app)
+rng = random.Random(7)
+
+with app.app_context():
+    db.create_all()
+    db.session.execute(insert(Course), [{'course_name': f'Course {c}'} for c in range(COURSES)])
+    course_ids = [row[0] for row in db.session.query(Course.course_id).order_by(Course.course_id)]
+    db.session.execute(insert(Lesson), [
+        {'course_id': course_id, 'lesson_title': f'Lesson {c}.{i}', 'lesson_order': i}
+        for c, course_id in enumerate(course_ids) for i in range(LESSONS_PER_COURSE)
+    ])
+    lessons_by_course = {}
+    for lesson_id, course_id in db.session.query(Lesson.lesson_id, Lesson.course_id).order_by(Lesson.lesson_id):
+        lessons_by_course.setdefault(course_id, []).append(lesson_id)
+    db.session.execute(insert(User), [
+        {'username': f'bench{u}', 'email': f'bench{u}@example.com', 'full_name': 'Bench', 'password_hash': 'unused'}
+        for u in range(USERS)
+    ])
+    user_ids = [row[0] for row in db.session.query(User.user_id).order_by(User.user_id)]
+
+    enrollments, progress, held_out = [], [], {}
+    for user_id in user_ids:
+        track = rng.choice(TRACKS)
+        for c in rng.sample(track, 2):
+            course_id = course_ids[c]
+            enrollments.append({'user_id': user_id, 'course_id': course_id})
+            done = rng.randint(2, LESSONS_PER_COURSE - 2)
+            for i, lesson_id in enumerate(lessons_by_course[course_id][:done + 2]):
+                if rng.random() < 0.2:
+                    held_out.setdefault(user_id, set()).add(lesson_id)
+                else:
+                    progress.append({'user_id': user_id, 'lesson_id': lesson_id, 'is_completed': i < done})
+    db.session.execute(insert(Enrollment), enrollments)
+    db.session.execute(insert(LessonProgress), progress)
+    db.session.commit()
+
+    with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as tmp:
+        path = Path(tmp) / 'recommendation_model'
+        summary = train(path)
+        start = time.perf_counter()
+        model = CollaborativeModel()
+        model.load(path)
+        load_ms = (time.perf_counter() - start) * 1000
+
+        observed = {}
+        for row in progress:
+            observed.setdefault(row['user_id'], set()).add(row['lesson_id'])
+        popularity = np.bincount([row['lesson_id'] for row in progress])
+        popular = [int(i) for i in np.argsort(-popularity, kind='stable')]
+        all_lessons = [lesson_id for ids in lessons_by_course.values() for lesson_id in ids]
+
+        model_hits = popular_hits = 0
+        timings = []
+        for user_id, hidden in held_out.items():
+            allowed = [lesson_id for lesson_id in all_lessons if lesson_id not in observed.get(user_id, ())]
+            start = time.perf_counter()
+            top = model.top_k(user_id, TOP_K, allowed)
+            timings.append(time.perf_counter() - start)
+            model_hits += bool(hidden & {lesson_id for lesson_id, _ in top})
+            popular_top = [lesson_id for lesson_id in popular if lesson_id in set(allowed)][:TOP_K]
+            popular_hits += bool(hidden & set(popular_top))
+
+    print(f"users={summary['users']} lessons={summary['lessons']} interactions={summary['interactions']}")
+    print(f"training {summary['seconds']:.2f}s, artifact {summary['bytes'] / 1024:.1f} KB, mmap load {load_ms:.2f} ms")
+    print(f"top-{TOP_K} per user: median {np.median(timings) * 1e6:.0f} us, p99 {np.percentile(timings, 99) * 1e6:.0f} us")
+    print(f"hit rate@{TOP_K}: ALS {model_hits / len(held_out):.3f} vs popularity {popular_hits / len(held_out):.3f}")
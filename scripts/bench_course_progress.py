@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Benchmark course progress reads: per-lesson queries vs one LEFT JOIN.
+
+Runs against a throwaway in-memory SQLite database (no server needed) and
+prints query count and latency per page view for growing lesson counts.
+
+Usage: python scripts/bench_course_progress.py [lesson_count ...]
+"""
+import sys
+import time
+from pathlib import Path
+
+from flask import Flask
+from sqlalchemy import event
+
+# Import backend modules directly (same layout as running backend/app.py as a script)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+from models import db, User, Course, Lesson, LessonProgress  # noqa: E402
+from services.course_progress import get_lesson_progress_rows  # noqa: E402
+
+LESSON_COUNTS = [int(n) for n in sys.argv[1:]] or [10, 60, 240, 1000]
+REPEAT = 20
+CONTENT = 'x' * 20000  # typical markdown lesson body
+
+
+def legacy_course_progress(course_id, user_id):
+    lessons = Lesson.query.filter_by(course_id=course_id).order_by(Lesson.lesson_order).all()
+    details = []
+    for lesson in lessons:
+        progress = LessonProgress.query.filter_by(user_id=user_id, lesson_id=lesson.lesson_id).first()
+        details.append((lesson.lesson_id, progress.is_completed if progress else False,
+                        progress.time_spent_minutes if progress else 0))
+    return details
+
+
+def joined_course_progress(course_id, user_id):
+    return [(row.lesson_id, bool(row.is_completed), row.time_spent_minutes or 0)
+            for row in get_lesson_progress_rows(course_id, user_id)]
+
+
+def measure(fn, *args):
+    queries = []
+    listener = lambda *a, **k: queries.append(1)  # noqa: E731
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        fn(*args)
+        per_call = len(queries)
+        start = time.perf_counter()
+        for _ in range(REPEAT):
+            db.session.expunge_all()
+            fn(*args)
+        elapsed = (time.perf_counter() - start) / REPEAT
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    return per_call, elapsed
+
+
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+db.init_app(app)
+
+with app.app_context():
+    db.create_all()
+    user = User(username='bench', email='bench@example.com', full_name='Bench')
+    user.set_password('bench')
+    db.session.add(user)
+    db.session.commit()
+
+    print(f"{'lessons':>8} | {'legacy queries':>14} {'legacy ms':>10} | {'join queries':>12} {'join ms':>8}")
+    for count in LESSON_COUNTS:
+        course = Course(course_name=f'Bench {count}')
+        db.session.add(course)
+        db.session.flush()
+        lessons = [Lesson(course_id=course.course_id, lesson_title=f'Lesson {i}', lesson_order=i,
+                          lesson_content=CONTENT) for i in range(count)]
+        db.session.add_all(lessons)
+        db.session.flush()
+        # The student has finished about half of the course
+        db.session.add_all(LessonProgress(user_id=user.user_id, lesson_id=lesson.lesson_id, is_completed=True,
+                                          time_spent_minutes=5) for lesson in lessons[::2])
+        db.session.commit()
+
+        assert legacy_course_progress(course.course_id, user.user_id) == joined_course_progress(course.course_id, user.user_id)
+        legacy_q, legacy_t = measure(legacy_course_progress, course.course_id, user.user_id)
+        join_q, join_t = measure(joined_course_progress, course.course_id, user.user_id)
+        print(f"{count:>8} | {legacy_q:>14} {legacy_t * 1e3:>10.2f} | {join_q:>12} {join_t * 1e3:>8.2f}")
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Microbenchmark for the quiz grader registry (no database needed).
+
+Compares registry grading of multiple-choice answers against the old inline
+`selected_answer == correct_answer` loop, and reports per-type throughput so a
+new grader can be checked for regressions on the multiple-choice hot path.
+
+Usage: python scripts/bench_graders.py [answers_per_type]
+"""
+import json
+import random
+import sys
+import timeit
+from pathlib import Path
+from types import SimpleNamespace
+
+# Import backend modules directly (same layout as running backend/app.py as a script)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+from services.grading import grade_answers, registered_types  # noqa: E402
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+REPEAT = 5
+rng = random.Random(42)
+
+
+def make_question(question_id, question_type):
+    if question_type == 'multiple_select':
+        return SimpleNamespace(question_id=question_id, question_type=question_type,
+                               correct_answer=rng.randrange(1, 16), options='["a","b","c","d"]'), rng.sample(range(4), 2)
+    if question_type == 'true_false':
+        return SimpleNamespace(question_id=question_id, question_type=question_type,
+                               correct_answer=rng.randrange(2), options='["Đúng","Sai"]'), rng.choice([0, 1, True, 'sai'])
+    if question_type == 'short_answer':
+        return SimpleNamespace(question_id=question_id, question_type=question_type, correct_answer=0,
+                               options=json.dumps(['Thẻ <a>', 'the a'], ensure_ascii=False)), rng.choice(['thẻ <A>', 'THE A ', 'div'])
+    return SimpleNamespace(question_id=question_id, question_type=question_type,
+                           correct_answer=rng.randrange(4), options='["a","b","c","d"]'), rng.randrange(4)
+
+
+def build(question_type, count):
+    questions, answers = {}, []
+    for i in range(count):
+        question, response = make_question(i, question_type)
+        questions[i] = question
+        answers.append({'question_id': i, 'selected_answer': response})
+    return questions, answers
+
+
+def inline_baseline(questions, answers):
+    return [(a, a.get('selected_answer') == questions[a['question_id']].correct_answer)
+            for a in answers if a.get('question_id') in questions]
+
+
+def best(fn):
+    return min(timeit.repeat(fn, number=1, repeat=REPEAT))
+
+
+questions, answers = build('multiple_choice', N)
+baseline = best(lambda: inline_baseline(questions, answers))
+registry = best(lambda: grade_answers(questions, answers))
+assert [c for _, c in inline_baseline(questions, answers)] == [c for _, c in grade_answers(questions, answers)]
+print(f"multiple_choice x{N}: inline {baseline * 1e3:.2f} ms, registry {registry * 1e3:.2f} ms "
+      f"({registry / baseline:.2f}x)")
+
+for question_type in registered_types():
+    if question_type == 'multiple_choice':
+        continue
+    questions, answers = build(question_type, N)
+    elapsed = best(lambda: grade_answers(questions, answers))
+    print(f"{question_type} x{N}: {elapsed * 1e3:.2f} ms ({N / elapsed / 1e6:.2f} M answers/s)")
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Benchmark incorrect-answer insights: per-lesson lookups vs batched hydration.
+
+Runs against a throwaway in-memory SQLite database (no server needed). A
+student has `limit` incorrect-answer analyses with 3 recommended lessons
+each; prints query count and latency of the legacy loop (recommended lesson
+ids per analysis, then Lesson.query.get per id) and of
+IncorrectAnswerRecommendationEngine.get_incorrect_answer_insights (one
+association query, one IN query for lessons not in the summary cache),
+cold and warm, and checks they agree.
+
+Usage: python scripts/bench_incorrect_answer_insights.py [limit ...]
+"""
+import logging
+import sys
+import time
+from pathlib import Path
+
+from flask import Flask
+from sqlalchemy import event
+
+# Import backend modules directly (same layout as running backend/app.py as a script)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+from models import (  # noqa: E402
+    db, User, Course, Lesson, Topic, QuizQuestion, IncorrectAnswerAnalysis, IncorrectAnswerLesson
+)
+from ai_models.lesson_recommendation import IncorrectAnswerRecommendationEngine  # noqa: E402
+from services import lesson_summaries  # noqa: E402
+
+LIMITS = [int(n) for n in sys.argv[1:]] or [10, 50]
+LESSONS = 40
+REPEAT = 10
+
+
+def legacy_insights(user_id, limit):
+    """The previous implementation: one lesson lookup per recommended id per analysis
+    (the JSON column it decoded is stood in for by one association query)"""
+    answers = IncorrectAnswerAnalysis.query.filter_by(user_id=user_id).order_by(
+        IncorrectAnswerAnalysis.created_at.desc()).limit(limit).all()
+    lesson_ids = IncorrectAnswerLesson.lesson_ids_for([answer.analysis_id for answer in answers])
+    insights = []
+    for answer in answers:
+        details = []
+        for lid in lesson_ids.get(answer.analysis_id, []):
+            lesson = db.session.get(Lesson, lid)
+            if lesson:
+                details.append({'lesson_id': lesson.lesson_id, 'lesson_title': lesson.lesson_title,
+                                'duration_minutes': lesson.duration_minutes})
+        insights.append({'analysis_id': answer.analysis_id, 'recommended_lessons': details})
+    return insights
+
+
+def measure(fn, *args, warm=True):
+    queries = []
+    listener = lambda *a, **k: queries.append(1)  # noqa: E731
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        db.session.expunge_all()
+        lesson_summaries.invalidate()
+        result = fn(*args)
+        cold_queries = len(queries)
+        if warm:
+            queries.clear()
+            fn(*args)
+        warm_queries = len(queries)
+        start = time.perf_counter()
+        for _ in range(REPEAT):
+            db.session.expunge_all()
+            fn(*args)
+        elapsed = (time.perf_counter() - start) / REPEAT
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    return result, cold_queries, warm_queries, elapsed
+
+
+logging.getLogger('ai_models.lesson_recommendation').setLevel(logging.WARNING)
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+db.init_app(app)
+
+with app.app_context():
+    db.create_all()
+    user = User(username='bench', email='bench@example.com', full_name='Bench', password_hash='unused')
+    course = Course(course_name='Bench', lesson_count=LESSONS)
+    db.session.add_all([user, course])
+    db.session.flush()
+    topic = Topic(course_id=course.course_id, topic_name='Topic')
+    lessons = [Lesson(course_id=course.course_id, lesson_title=f'Bài {i}', lesson_order=i,
+                      lesson_content='x' * 5000, duration_minutes=10 + i) for i in range(LESSONS)]
+    db.session.add_all([topic] + lessons)
+    db.session.flush()
+    question = QuizQuestion(course_id=course.course_id, topic_id=topic.topic_id, question_text='Q', correct_answer=0)
+    db.session.add(question)
+    db.session.flush()
+    for i in range(max(LIMITS)):
+        analysis = IncorrectAnswerAnalysis(user_id=user.user_id, question_id=question.question_id,
+                                           topic_id=topic.topic_id, course_id=course.course_id,
+                                           question_text='Q', correct_answer=0, times_similar_wrong=0)
+        db.session.add(analysis)
+        db.session.flush()
+        db.session.add_all([IncorrectAnswerLesson(analysis_id=analysis.analysis_id, position=p,
+                                                  lesson_id=lessons[(i * 3 + p) % LESSONS].lesson_id)
+                            for p in range(3)])
+    db.session.commit()
+
+    print(f"{'limit':>6} | {'legacy queries':>14} {'legacy ms':>9} | {'cold queries':>12} {'warm queries':>12} "
+          f"{'batched ms':>10} | same")
+    for limit in LIMITS:
+        old, old_queries, _, old_time = measure(legacy_insights, user.user_id, limit, warm=False)
+        new, new_cold, new_warm, new_time = measure(IncorrectAnswerRecommendationEngine.get_incorrect_answer_insights,
+                                                    user.user_id, None, limit)
+        same = [(i['analysis_id'], i['recommended_lessons']) for i in old] == \
+               [(i['analysis_id'], i['recommended_lessons']) for i in new]
+        print(f"{limit:>6} | {old_queries:>14} {old_time * 1000:>9.2f} | {new_cold:>12} {new_warm:>12} "
+              f"{new_time * 1000:>10.2f} | {same}")
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Benchmark incorrect-answer analysis: one call per wrong answer vs one per submission.
+
+Runs against a throwaway in-memory SQLite database (no server needed). For
+each number of wrong answers a student submits a quiz and the submission is
+analyzed by calling IncorrectAnswerRecommendationEngine.analyze_incorrect_answer
+once per wrong answer (what the frontend did through /analyze) and by
+analyze_quiz_result; prints queries and latency of both (the AI call is
+excluded: it is synchronous per answer in the first path and queued in the
+background in the second) and checks both store the same analyses.
+
+Usage: python scripts/bench_incorrect_answers.py [wrong_count ...]
+"""
+import logging
+import sys
+import time
+from pathlib import Path
+
+from flask import Flask
+from sqlalchemy import event
+
+# Import backend modules directly (same layout as running backend/app.py as a script)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+from models import (  # noqa: E402
+    db, User, Course, Lesson, Topic, Quiz, QuizQuestion, QuizResult, QuizAnswer, IncorrectAnswerAnalysis,
+    IncorrectAnswerLesson
+)
+from ai_models.lesson_recommendation import IncorrectAnswerRecommendationEngine  # noqa: E402
+
+WRONG_COUNTS = [int(n) for n in sys.argv[1:]] or [5, 20, 50]
+LESSONS = 30
+
+
+def per_answer(result):
+    for answer in QuizAnswer.query.filter_by(result_id=result.result_id, is_correct=False).all():
+        question = db.session.get(QuizQuestion, answer.question_id)
+        IncorrectAnswerRecommendationEngine.analyze_incorrect_answer(
+            result.user_id, answer.question_id, answer.selected_answer, question.correct_answer, result.quiz_id
+        )
+
+
+def measure(fn, result):
+    queries = []
+    listener = lambda *a, **k: queries.append(1)  # noqa: E731
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        start = time.perf_counter()
+        fn(result)
+        elapsed = time.perf_counter() - start
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    stored = IncorrectAnswerAnalysis.query.filter_by(quiz_id=result.quiz_id).order_by(
+        IncorrectAnswerAnalysis.question_id).all()
+    lesson_ids = IncorrectAnswerLesson.lesson_ids_for([a.analysis_id for a in stored])
+    return [(a.question_id, a.lesson_id, lesson_ids.get(a.analysis_id)) for a in stored], len(queries), elapsed
+
+
+logging.getLogger('ai_models.lesson_recommendation').setLevel(logging.WARNING)
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+db.init_app(app)
+
+with app.app_context():
+    db.create_all()
+    course = Course(course_name='Bench', lesson_count=LESSONS)
+    db.session.add(course)
+    db.session.flush()
+    topic = Topic(course_id=course.course_id, topic_name='Topic')
+    db.session.add(topic)
+    db.session.add_all([Lesson(course_id=course.course_id, lesson_title=f'Bài {i}', lesson_order=i,
+                               lesson_content=f'Nội dung về chủ đề term{i} và ví dụ term{i}x.')
+                        for i in range(LESSONS)])
+    db.session.commit()
+
+    print(f"{'wrong':>6} | {'per-answer queries':>18} {'ms':>8} | {'bulk queries':>12} {'ms':>7} | same")
+    for count in WRONG_COUNTS:
+        results = []
+        for run in range(2):
+            user = User(username=f'bench{count}-{run}', email=f'bench{count}-{run}@example.com',
+                        full_name='Bench', password_hash='unused')
+            quiz = Quiz(course_id=course.course_id, topic_id=topic.topic_id, quiz_name=f'Quiz {count}-{run}')
+            db.session.add_all([user, quiz])
+            db.session.flush()
+            questions = [QuizQuestion(course_id=course.course_id, topic_id=topic.topic_id,
+                                      question_text=f'Câu hỏi về term{i % LESSONS}?',
+                                      options='["A", "B", "C", "D"]', correct_answer=0)
+                         for i in range(count)]
+            db.session.add_all(questions)
+            db.session.flush()
+            result = QuizResult(user_id=user.user_id, quiz_id=quiz.quiz_id, score=0,
+                                total_questions=count, correct_answers=0)
+            db.session.add(result)
+            db.session.flush()
+            db.session.add_all([QuizAnswer(result_id=result.result_id, question_id=q.question_id,
+                                           selected_answer=1, is_correct=False) for q in questions])
+            db.session.commit()
+            results.append(result)
+
+        old, old_queries, old_time = measure(per_answer, results[0])
+        new, new_queries, new_time = measure(IncorrectAnswerRecommendationEngine.analyze_quiz_result, results[1])
+        same = [row[1:] for row in old] == [row[1:] for row in new]
+        print(f"{count:>6} | {old_queries:>18} {old_time * 1000:>8.2f} | {new_queries:>12} {new_time * 1000:>7.2f} | {same}")
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""Benchmark question -> lesson mapping: first lessons by order vs the TF-IDF index.
+
+Runs against a throwaway in-memory SQLite database (no server needed). Each
+course has lessons on distinct subjects (plus shared filler text) and one
+question per lesson worded from that lesson's subject. Prints, per course
+size, how often the lesson that teaches the question is among the 3
+recommended, the queries and latency per lookup, the time to index the
+course from scratch and the time to re-index after one lesson is edited.
+
+Usage: python scripts/bench_lesson_index.py [lesson_count ...]
+"""
+import logging
+import random
+import sys
+import time
+from pathlib import Path
+
+from flask import Flask
+from sqlalchemy import event
+
+# Import backend modules directly (same layout as running backend/app.py as a script)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+from models import db, Course, Lesson  # noqa: E402
+from ai_models.lesson_index import lesson_index  # noqa: E402
+
+LESSON_COUNTS = [int(n) for n in sys.argv[1:]] or [20, 80, 320]
+SUBJECT_WORDS = 6
+FILLER = ('trong bài học này chúng ta sẽ tìm hiểu các khái niệm cơ bản và ví dụ minh họa '
+          'sinh viên cần đọc kỹ nội dung và làm bài tập cuối bài').split()
+VOCABULARY = [f'term{i}' for i in range(5000)]
+
+
+def legacy_lessons(course_id):
+    """The previous implementation: the first 3 lessons of the course by order"""
+    Lesson.query.filter_by(course_id=course_id).all()
+    return [lesson.lesson_id for lesson in
+            Lesson.query.filter_by(course_id=course_id).order_by(Lesson.lesson_order).limit(3).all()]
+
+
+def index_lessons(course_id, text):
+    return [lesson_id for lesson_id, _ in lesson_index.related_lessons(course_id, text, k=3)]
+
+
+def lesson_text(rng, subject):
+    paragraphs = []
+    for _ in range(6):
+        words = rng.sample(FILLER, 12) + rng.sample(subject, 3) + rng.sample(VOCABULARY, 10)
+        rng.shuffle(words)
+        paragraphs.append(' '.join(words))
+    return '\n\n'.join(paragraphs)
+
+
+def measure(fn, cases):
+    queries = []
+    listener = lambda *a, **k: queries.append(1)  # noqa: E731
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        start = time.perf_counter()
+        hits = sum(expected in fn(*args) for args, expected in cases)
+        elapsed = (time.perf_counter() - start) / len(cases)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    return hits / len(cases), len(queries) / len(cases), elapsed
+
+
+logging.getLogger('ai_models.lesson_index').setLevel(logging.WARNING)
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+db.init_app(app)
+
+with app.app_context():
+    db.create_all()
+    rng = random.Random(0)
+    print(f"{'lessons':>8} | {'legacy hit@3':>12} {'queries':>7} {'ms':>6} | "
+          f"{'index hit@3':>11} {'queries':>7} {'ms':>6} | {'build ms':>8} {'edit ms':>7}")
+    for count in LESSON_COUNTS:
+        course = Course(course_name=f'Bench {count}', lesson_count=count)
+        db.session.add(course)
+        db.session.flush()
+        subjects = [rng.sample(VOCABULARY, SUBJECT_WORDS) for _ in range(count)]
+        lessons = [Lesson(course_id=course.course_id, lesson_title=f'Bài {i}: {" ".join(subjects[i][:2])}',
+                          lesson_order=i, lesson_content=lesson_text(rng, subjects[i]))
+                   for i in range(count)]
+        db.session.add_all(lessons)
+        db.session.commit()
+        cases = [((course.course_id, 'Câu hỏi về ' + ' '.join(rng.sample(subjects[i], 3)) + ' là gì?'),
+                  lesson.lesson_id) for i, lesson in enumerate(lessons)]
+
+        start = time.perf_counter()
+        lesson_index.related_lessons(course.course_id, 'warm up')
+        build_time = time.perf_counter() - start
+
+        old_hits, old_queries, old_time = measure(lambda course_id, text: legacy_lessons(course_id), cases)
+        new_hits, new_queries, new_time = measure(index_lessons, cases)
+
+        edited = lessons[count // 2]
+        edited.lesson_content = lesson_text(rng, subjects[count // 2])
+        db.session.commit()
+        start = time.perf_counter()
+        lesson_index.lesson_changed(edited)
+        lesson_index.related_lessons(course.course_id, 'warm up')
+        edit_time = time.perf_counter() - start
+
+        print(f"{count:>8} | {old_hits:>12.0%} {old_queries:>7.1f} {old_time * 1000:>6.2f} | "
+              f"{new_hits:>11.0%} {new_queries:>7.1f} {new_time * 1000:>6.2f} | "
+              f"{build_time * 1000:>8.1f} {edit_time * 1000:>7.1f}")
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Benchmark lesson listings: full to_dict() vs summary projection.
+
+Runs against a throwaway in-memory SQLite database (no server needed) with
+content-heavy lessons and prints response size and latency (query + JSON
+encoding) for the legacy listing, the default summary and a sparse
+`?fields=lesson_id,lesson_title` listing.
+
+Usage: python scripts/bench_lesson_payloads.py [lesson_count ...]
+"""
+import json
+import sys
+import time
+from pathlib import Path
+
+from flask import Flask
+
+# Import backend modules directly (same layout as running backend/app.py as a script)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+from models import db, Course, Lesson  # noqa: E402
+
+LESSON_COUNTS = [int(n) for n in sys.argv[1:]] or [10, 60, 240]
+REPEAT = 20
+CONTENT = '## Nội dung bài học\n\n' + 'Đoạn văn mẫu cho bài học. ' * 800  # ~20 KB markdown body
+
+
+def legacy_listing(course_id):
+    lessons = Lesson.query.filter_by(course_id=course_id).order_by(Lesson.lesson_order).all()
+    return json.dumps([lesson.to_dict() for lesson in lessons], ensure_ascii=False)
+
+
+def summary_listing(course_id, fields=Lesson.SUMMARY_FIELDS):
+    lessons = Lesson.query.options(Lesson.load_fields(fields)).filter_by(
+        course_id=course_id
+    ).order_by(Lesson.lesson_order).all()
+    return json.dumps([lesson.to_summary_dict(fields) for lesson in lessons], ensure_ascii=False)
+
+
+def sparse_listing(course_id):
+    return summary_listing(course_id, ('lesson_id', 'lesson_title'))
+
+
+def measure(fn, course_id):
+    size = len(fn(course_id).encode('utf-8'))
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        db.session.expunge_all()
+        fn(course_id)
+    return size, (time.perf_counter() - start) / REPEAT
+
+
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+db.init_app(app)
+
+with app.app_context():
+    db.create_all()
+    print(f"{'lessons':>8} | {'full KB':>8} {'full ms':>8} | {'summary KB':>10} {'summary ms':>10} | "
+          f"{'sparse KB':>9} {'sparse ms':>9}")
+    for count in LESSON_COUNTS:
+        course = Course(course_name=f'Bench {count}')
+        db.session.add(course)
+        db.session.flush()
+        db.session.add_all(Lesson(course_id=course.course_id, lesson_title=f'Bài {i}', lesson_order=i,
+                                  video_url='https://youtu.be/dQw4w9WgXcQ', duration_minutes=15,
+                                  lesson_content=CONTENT) for i in range(count))
+        db.session.commit()
+
+        results = [measure(fn, course.course_id) for fn in (legacy_listing, summary_listing, sparse_listing)]
+        print(f"{count:>8} | " + ' | '.join(
+            f"{size / 1024:>{w}.1f} {elapsed * 1000:>{w2}.2f}"
+            for (size, elapsed), w, w2 in zip(results, (8, 10, 9), (8, 10, 9))
+        ))
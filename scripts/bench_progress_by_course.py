@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Benchmark progress by course: per-enrollment lookups vs one query over the counters.
+
+Runs against a throwaway in-memory SQLite database (no server needed). For each
+enrollment count a student enrolled in that many 20-lesson courses (with about
+half of each course completed) asks for progress by course; prints query count
+and latency of the previous per-enrollment loop and of
+LessonRecommendationEngine.get_progress_by_course, and checks both agree.
+
+Usage: python scripts/bench_progress_by_course.py [enrollment_count ...]
+"""
+import random
+import sys
+import time
+from pathlib import Path
+
+from flask import Flask
+from sqlalchemy import event, insert
+
+# Import backend modules directly (same layout as running backend/app.py as a script)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+from models import db, User, Course, Lesson, Enrollment, LessonProgress  # noqa: E402
+from ai_models.lesson_recommendation import LessonRecommendationEngine  # noqa: E402
+
+ENROLLMENT_COUNTS = [int(n) for n in sys.argv[1:]] or [2, 10, 40]
+LESSONS_PER_COURSE = 20
+REPEAT = 20
+
+
+def legacy_progress_by_course(user_id):
+    """The previous implementation: three queries per enrollment"""
+    progress_list = []
+    for enrollment in Enrollment.query.filter_by(user_id=user_id).all():
+        course = db.session.get(Course, enrollment.course_id)
+        total_lessons = Lesson.query.filter_by(course_id=enrollment.course_id).count()
+        completed_lessons = db.session.query(LessonProgress).filter(
+            LessonProgress.user_id == user_id,
+            LessonProgress.lesson_id.in_(
+                db.session.query(Lesson.lesson_id).filter(Lesson.course_id == enrollment.course_id)
+            ),
+            LessonProgress.is_completed == True
+        ).count()
+        progress_list.append({
+            'course_id': course.course_id,
+            'total_lessons': total_lessons,
+            'completed_lessons': completed_lessons,
+            'progress_percentage': (completed_lessons / total_lessons * 100) if total_lessons > 0 else 0
+        })
+    return progress_list
+
+
+def measure(fn, user_id):
+    queries = []
+    listener = lambda *a, **k: queries.append(1)  # noqa: E731
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        result = fn(user_id)
+        per_call = len(queries)
+        start = time.perf_counter()
+        for _ in range(REPEAT):
+            db.session.expunge_all()
+            fn(user_id)
+        elapsed = (time.perf_counter() - start) / REPEAT
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    return result, per_call, elapsed
+
+
+def key(rows):
+    return [(r['course_id'], r['total_lessons'], r['completed_lessons'], round(r['progress_percentage'], 2))
+            for r in rows]
+
+
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+db.init_app(app)
+rng = random.Random(3)
+
+with app.app_context():
+    db.create_all()
+    print(f"{'courses':>8} | {'legacy queries':>14} {'legacy ms':>10} | {'new queries':>11} {'new ms':>7} | same")
+    for count in ENROLLMENT_COUNTS:
+        user = User(username=f'bench{count}', email=f'bench{count}@example.com', full_name='Bench',
+                    password_hash='unused')
+        db.session.add(user)
+        db.session.flush()
+        for c in range(count):
+            course = Course(course_name=f'Bench {count}.{c}', lesson_count=LESSONS_PER_COURSE)
+            db.session.add(course)
+            db.session.flush()
+            db.session.execute(insert(Lesson), [
+                {'course_id': course.course_id, 'lesson_title': f'Lesson {i}', 'lesson_order': i}
+                for i in range(LESSONS_PER_COURSE)
+            ])
+            lesson_ids = [row[0] for row in db.session.query(Lesson.lesson_id).filter_by(course_id=course.course_id)]
+            completed = rng.sample(lesson_ids, rng.randint(0, LESSONS_PER_COURSE))
+            if completed:
+                db.session.execute(insert(LessonProgress), [
+                    {'user_id': user.user_id, 'lesson_id': lesson_id, 'is_completed': True} for lesson_id in completed
+                ])
+            db.session.add(Enrollment(user_id=user.user_id, course_id=course.course_id, completed_count=len(completed),
+                                      progress_percentage=len(completed) * 100 / LESSONS_PER_COURSE))
+        db.session.commit()
+
+        old, old_queries, old_time = measure(legacy_progress_by_course, user.user_id)
+        new, new_queries, new_time = measure(LessonRecommendationEngine.get_progress_by_course, user.user_id)
+        same = key(old) == key(new)
+        print(f"{count:>8} | {old_queries:>14} {old_time * 1000:>10.2f} | {new_queries:>11} {new_time * 1000:>7.2f} | {same}")
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Benchmark lesson recommendations: per-lesson lookups vs three set-based queries.
+
+Runs against a throwaway in-memory SQLite database (no server needed). For each
+course size a student with 5 weak topics who has finished a third of the course
+(and recently opened a few other lessons) asks for recommendations for that
+course; prints query count and latency of the legacy loop and of
+LessonRecommendationEngine.generate_recommendations, and checks both agree.
+
+Usage: python scripts/bench_recommendations.py [lesson_count ...]
+"""
+import logging
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from flask import Flask
+from sqlalchemy import event
+
+# Import backend modules directly (same layout as running backend/app.py as a script)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+from models import db, User, Course, Lesson, LessonProgress, Topic, Quiz, QuizResult  # noqa: E402
+from ai_models.lesson_recommendation import LessonRecommendationEngine  # noqa: E402
+
+LESSON_COUNTS = [int(n) for n in sys.argv[1:]] or [10, 60, 240]
+WEAK_TOPICS = 5
+REPEAT = 10
+
+
+def legacy_recommendations(user_id, course_id):
+    """The previous implementation: one progress lookup per lesson per weak topic"""
+    recommendations = []
+    for area in LessonRecommendationEngine.get_user_weak_areas(user_id, course_id):
+        for lesson in Lesson.query.filter_by(course_id=area['course_id']).all():
+            progress = LessonProgress.query.filter_by(user_id=user_id, lesson_id=lesson.lesson_id).first()
+            if not progress or not progress.is_completed:
+                recommendations.append({'priority': 1, 'lesson_id': lesson.lesson_id, 'type': 'weak_area_review'})
+    for lesson in LessonRecommendationEngine.get_incomplete_lessons(user_id, course_id):
+        if not LessonProgress.query.filter_by(user_id=user_id, lesson_id=lesson['lesson_id']).first():
+            recommendations.append({'priority': 2, 'lesson_id': lesson['lesson_id'], 'type': 'incomplete_lesson'})
+    recent = LessonProgress.query.filter(
+        LessonProgress.user_id == user_id,
+        LessonProgress.is_completed == False,
+        LessonProgress.last_accessed >= datetime.utcnow() - timedelta(days=7)
+    ).order_by(LessonProgress.last_accessed.desc()).limit(3).all()
+    for progress in recent:
+        lesson = db.session.get(Lesson, progress.lesson_id)
+        recommendations.append({'priority': 2, 'lesson_id': lesson.lesson_id, 'type': 'in_progress'})
+    seen, unique = set(), []
+    for rec in sorted(recommendations, key=lambda x: x['priority']):
+        if rec['lesson_id'] not in seen:
+            seen.add(rec['lesson_id'])
+            unique.append(rec)
+    return unique[:10]
+
+
+def measure(fn, *args):
+    queries = []
+    listener = lambda *a, **k: queries.append(1)  # noqa: E731
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        result = fn(*args)
+        per_call = len(queries)
+        start = time.perf_counter()
+        for _ in range(REPEAT):
+            db.session.expunge_all()
+            fn(*args)
+        elapsed = (time.perf_counter() - start) / REPEAT
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    return result, per_call, elapsed
+
+
+logging.getLogger('ai_models.lesson_recommendation').setLevel(logging.WARNING)
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+db.init_app(app)
+
+with app.app_context():
+    db.create_all()
+    print(f"{'lessons':>8} | {'legacy queries':>14} {'legacy ms':>10} | {'set queries':>11} {'set ms':>7} | same")
+    for count in LESSON_COUNTS:
+        user = User(username=f'bench{count}', email=f'bench{count}@example.com', full_name='Bench')
+        user.set_password('bench')
+        course = Course(course_name=f'Bench {count}', lesson_count=count)
+        db.session.add_all([user, course])
+        db.session.flush()
+        lessons = [Lesson(course_id=course.course_id, lesson_title=f'Lesson {i}', lesson_order=i)
+                   for i in range(count)]
+        db.session.add_all(lessons)
+        db.session.flush()
+        now = datetime.utcnow()
+        for i, lesson in enumerate(lessons):
+            if i % 3 == 0:
+                db.session.add(LessonProgress(user_id=user.user_id, lesson_id=lesson.lesson_id, is_completed=True))
+            elif i % 7 == 1:
+                db.session.add(LessonProgress(user_id=user.user_id, lesson_id=lesson.lesson_id, is_completed=False,
+                                              last_accessed=now - timedelta(hours=i)))
+        for t in range(WEAK_TOPICS):
+            topic = Topic(course_id=course.course_id, topic_name=f'Topic {t}')
+            db.session.add(topic)
+            db.session.flush()
+            quiz = Quiz(course_id=course.course_id, topic_id=topic.topic_id, quiz_name=f'Quiz {t}')
+            db.session.add(quiz)
+            db.session.flush()
+            db.session.add(QuizResult(user_id=user.user_id, quiz_id=quiz.quiz_id, score=40 + t * 5,
+                                      total_questions=10, correct_answers=4))
+        db.session.commit()
+
+        old, old_queries, old_time = measure(legacy_recommendations, user.user_id, course.course_id)
+        new, new_queries, new_time = measure(LessonRecommendationEngine.generate_recommendations,
+                                             user.user_id, course.course_id)
+        same = [(r['lesson_id'], r['type']) for r in old] == [(r['lesson_id'], r['type']) for r in new]
+        print(f"{count:>8} | {old_queries:>14} {old_time * 1000:>10.2f} | {new_queries:>11} {new_time * 1000:>7.2f} | {same}")
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""Verify courses.lesson_count / enrollments.completed_count against recounts.
+
+Usage: python scripts/check_progress_counters.py [--course COURSE_ID] [--fix]
+
+Exits with status 1 when drift is found and --fix was not given.
+"""
+import argparse
+import sys
+
+from backend.models import db
+from backend import app
+from services.progress_counters import find_drift, repair
+from services.dashboard_snapshot import invalidate_course
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--course', type=int, help='only this course')
+parser.add_argument('--fix', action='store_true', help='write recounted values back')
+args = parser.parse_args()
+
+with app.app_context():
+    drift = find_drift(args.course)
+    for row in drift['courses']:
+        print(f"Course {row['course_id']}: lesson_count {row['stored']} != {row['actual']}")
+    for row in drift['enrollments']:
+        print(f"Enrollment {row['enrollment_id']} (user {row['user_id']}, course {row['course_id']}): "
+              f"completed_count {row['stored']} != {row['actual']}")
+
+    total = len(drift['courses']) + len(drift['enrollments'])
+    if total and args.fix:
+        repair(drift)
+        for course_id in {row['course_id'] for row in drift['courses'] + drift['enrollments']}:
+            invalidate_course(course_id)
+        db.session.commit()
+        print(f"Repaired {total} counters")
+    elif total:
+        print(f"{total} counters drifted (run with --fix to repair)")
+        sys.exit(1)
+    else:
+        print("All progress counters are consistent")
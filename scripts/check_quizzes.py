@@ -1,16 +1,27 @@
 #!/usr/bin/env python3
 """Check what quizzes exist in the database"""
-from backend.models import db, Quiz
+from backend.models import db, Quiz, Lesson
 from backend import app
 
 with app.app_context():
     quizzes = Quiz.query.all()
     print(f"Found {len(quizzes)} quizzes:")
     for quiz in quizzes:
-        print(f"ID: {quiz.quiz_id}, Name: {quiz.quiz_name}, Course: {quiz.course_id}")
+        print(f"ID: {quiz.quiz_id}, Name: {quiz.quiz_name}, Course: {quiz.course_id}, Lesson: {quiz.lesson_id}")
 
-    # Check for lesson quizzes
-    lesson_quizzes = Quiz.query.filter(Quiz.quiz_name.like('LessonQuiz:%')).all()
+    # Check for lesson quizzes (linked through quizzes.lesson_id)
+    lesson_quizzes = Quiz.query.filter(Quiz.lesson_id.isnot(None)).order_by(Quiz.lesson_id, Quiz.quiz_id).all()
+    current_ids = {
+        lesson_id: quiz_id
+        for lesson_id, quiz_id in db.session.query(Lesson.lesson_id, Lesson.current_quiz_id)
+        .filter(Lesson.current_quiz_id.isnot(None)).all()
+    }
     print(f"\nFound {len(lesson_quizzes)} lesson quizzes:")
     for quiz in lesson_quizzes:
-        print(f"ID: {quiz.quiz_id}, Name: {quiz.quiz_name}")
\ No newline at end of file
+        marker = " (current)" if current_ids.get(quiz.lesson_id) == quiz.quiz_id else ""
+        print(f"ID: {quiz.quiz_id}, Lesson: {quiz.lesson_id}, Name: {quiz.quiz_name}{marker}")
+
+    # Lesson quizzes that were never linked (migration not run or manual naming)
+    unlinked = Quiz.query.filter(Quiz.quiz_name.like('LessonQuiz:%'), Quiz.lesson_id.is_(None)).count()
+    if unlinked:
+        print(f"\nWARNING: {unlinked} 'LessonQuiz:' quizzes have no lesson_id. Run database/lesson_quiz_link.sql")
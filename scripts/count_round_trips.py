@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Count database round trips and commits for the multi-statement endpoints.
+
+Runs complete_lesson, submit_quiz and generate_quiz_for_lesson against a
+throwaway in-memory SQLite database (no server needed; the AI service is
+replaced by a canned response) and prints, per call:
+
+- statements: SQL statements sent to the database
+- commits:    explicit COMMITs issued by the session
+- autocommit: transactions the same work costs with the old
+              `autocommit=True` pyodbc URL, where every write statement
+              committed on its own (writes + explicit commits)
+
+Usage: python scripts/count_round_trips.py [question_count]
+"""
+import json
+import os
+import sys
+from pathlib import Path
+
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from sqlalchemy import event
+
+# Import backend modules directly (same layout as running backend/app.py as a script)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+os.environ.setdefault('GEMINI_API_KEY', 'unused')
+from models import db, User, Course, Lesson, Enrollment, Quiz, QuizQuestionMapping  # noqa: E402
+from routes import admin, lessons, quizzes  # noqa: E402
+
+QUESTIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+WRITES = ('INSERT', 'UPDATE', 'DELETE', 'MERGE')
+
+
+class CannedAI:
+    def generate_response(self, prompt):
+        return json.dumps([
+            {'key_point': f'Point {i}', 'question_text': f'Question {i}?',
+             'options': ['A', 'B', 'C'], 'correct_answer': 0}
+            for i in range(QUESTIONS)
+        ])
+
+    def generate_explanation(self, *args, **kwargs):
+        return 'Canned explanation'
+
+
+admin.get_ai_service = quizzes.get_ai_service = lambda: CannedAI()
+
+
+def measure(fn):
+    counts = {'statements': 0, 'writes': 0, 'commits': 0}
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        counts['statements'] += 1
+        if statement.lstrip().upper().startswith(WRITES):
+            counts['writes'] += 1
+
+    def on_commit(conn):
+        counts['commits'] += 1
+
+    event.listen(db.engine, 'before_cursor_execute', on_execute)
+    event.listen(db.engine, 'commit', on_commit)
+    try:
+        fn()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', on_execute)
+        event.remove(db.engine, 'commit', on_commit)
+    counts['autocommit'] = counts['writes'] + counts['commits']
+    return counts
+
+
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+app.config['JWT_SECRET_KEY'] = 'round-trip-benchmark-secret-key-0000'
+db.init_app(app)
+JWTManager(app)
+app.register_blueprint(lessons.bp, url_prefix='/api/lessons')
+app.register_blueprint(quizzes.bp, url_prefix='/api/quizzes')
+
+with app.app_context():
+    db.create_all()
+    user = User(username='bench', email='bench@example.com', full_name='Bench')
+    user.set_password('bench')
+    course = Course(course_name='Bench', lesson_count=2)
+    db.session.add_all([user, course])
+    db.session.flush()
+    lesson_list = [Lesson(course_id=course.course_id, lesson_title=f'Lesson {i}', lesson_order=i,
+                          lesson_content='Nội dung bài học') for i in range(2)]
+    db.session.add_all(lesson_list)
+    db.session.add(Enrollment(user_id=user.user_id, course_id=course.course_id))
+    db.session.commit()
+    user_id, lesson_id = user.user_id, lesson_list[0].lesson_id
+    headers = {'Authorization': 'Bearer ' + create_access_token(identity=str(user_id))}
+
+    generated = measure(lambda: admin.generate_quiz_for_lesson(
+        lesson_id, num_questions=QUESTIONS, requested_by=user_id))
+    quiz = Quiz.query.filter_by(lesson_id=lesson_id).first()
+    question_ids = [m.question_id for m in QuizQuestionMapping.query.filter_by(quiz_id=quiz.quiz_id)]
+    # Half right, half wrong (wrong answers fetch an AI explanation, no extra writes)
+    answers = [{'question_id': qid, 'selected_answer': i % 2, 'time_spent_seconds': 10}
+               for i, qid in enumerate(question_ids)]
+    db.session.remove()
+
+client = app.test_client()
+with app.app_context():
+    completed = measure(lambda: client.post(f'/api/lessons/{lesson_id}/complete', headers=headers))
+    submitted = measure(lambda: client.post(f'/api/quizzes/{quiz.quiz_id}/submit', headers=headers,
+                                            json={'answers': answers, 'time_taken_minutes': 3}))
+
+print(f"{'call':<32} {'statements':>10} {'commits':>8} {'autocommit':>11}")
+for name, counts in [('complete_lesson', completed),
+                     (f'submit_quiz ({len(answers)} answers)', submitted),
+                     (f'generate_quiz_for_lesson ({QUESTIONS} q)', generated)]:
+    print(f"{name:<32} {counts['statements']:>10} {counts['commits']:>8} {counts['autocommit']:>11}")
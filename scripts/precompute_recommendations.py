@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+"""Precompute lesson recommendations for all active users (run nightly from cron).
+
+Usage: python scripts/precompute_recommendations.py [--user USER_ID ...]
+"""
+import argparse
+from backend import app
+from ai_models.batch_recommendations import BatchRecommendationEngine
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--user', type=int, action='append', help='only these users (repeatable)')
+args = parser.parse_args()
+
+with app.app_context():
+    summary = BatchRecommendationEngine.precompute(args.user)
+    print(f"Stored {summary['recommendations']} recommendations for {summary['users']} users")
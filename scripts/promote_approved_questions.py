@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+"""Copy already-approved AI-generated questions into the question bank (quiz_questions)
+so randomized quizzes can draw them. Safe to run more than once."""
+from backend.models import db, AIGeneratedQuestion
+from backend import app
+from services.question_pool import promote_to_question_bank
+
+with app.app_context():
+    pending = AIGeneratedQuestion.query.filter(
+        AIGeneratedQuestion.is_approved == True,
+        AIGeneratedQuestion.quiz_question_id.is_(None)
+    ).all()
+    for gen_question in pending:
+        promote_to_question_bank(gen_question)
+    db.session.commit()
+    print(f"Promoted {len(pending)} approved questions to the question bank")
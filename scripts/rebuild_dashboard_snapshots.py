@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""Rebuild per-user dashboard snapshots (drift repair).
+
+Usage: python scripts/rebuild_dashboard_snapshots.py [--user USER_ID] [--check]
+
+--check only reports snapshots that differ from a fresh rebuild.
+"""
+import argparse
+import json
+
+from backend.models import db, User, UserDashboardSnapshot
+from backend import app
+from services.dashboard_snapshot import build_snapshot, rebuild
+
+BATCH_SIZE = 200
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--user', type=int, help='only this user')
+parser.add_argument('--check', action='store_true', help='report drift without writing')
+args = parser.parse_args()
+
+with app.app_context():
+    if args.user:
+        user_ids = [args.user]
+    else:
+        user_ids = [row[0] for row in db.session.query(User.user_id).order_by(User.user_id).all()]
+
+    drifted = 0
+    for start in range(0, len(user_ids), BATCH_SIZE):
+        batch = user_ids[start:start + BATCH_SIZE]
+        stored = {
+            row.user_id: json.loads(row.payload)
+            for row in UserDashboardSnapshot.query.filter(UserDashboardSnapshot.user_id.in_(batch)).all()
+        }
+        for user_id in batch:
+            if user_id in stored and stored[user_id] != build_snapshot(user_id):
+                drifted += 1
+                print(f"User {user_id}: snapshot drifted")
+            if not args.check:
+                rebuild(user_id)
+        if not args.check:
+            db.session.commit()
+
+    action = 'Checked' if args.check else 'Rebuilt'
+    print(f"{action} {len(user_ids)} users, {drifted} drifted snapshots")
@@ -0,0 +1,12 @@
+#!/usr/bin/env python3
+"""Refresh per-question item statistics (run from cron, e.g. every 10 minutes).
+
+Usage: python scripts/refresh_question_stats.py [--full]
+"""
+import sys
+from backend import app
+from ai_models.item_analysis import ItemAnalysisEngine
+
+with app.app_context():
+    summary = ItemAnalysisEngine.refresh(full='--full' in sys.argv)
+    print(f"Updated {summary['updated_questions']} questions (high-water mark: answer_id {summary['high_water_mark']})")
@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""Train the collaborative-filtering recommender (run nightly, before precompute_recommendations.py).
+
+Writes the artifact to Config.AI_MODEL_PATH; running servers pick it up on restart.
+
+Usage: python scripts/train_recommender.py [--factors 32] [--iterations 10] [--reg 0.1]
+"""
+import argparse
+from pathlib import Path
+from backend import app
+from ai_models.collaborative_filtering import train
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--factors', type=int, default=32)
+parser.add_argument('--iterations', type=int, default=10)
+parser.add_argument('--reg', type=float, default=0.1)
+args = parser.parse_args()
+
+with app.app_context():
+    path = Path(app.root_path) / app.config['AI_MODEL_PATH']
+    summary = train(path, factors=args.factors, reg=args.reg, iterations=args.iterations)
+    print(f"Trained on {summary['interactions']} interactions ({summary['users']} users, {summary['lessons']} lessons) "
+          f"in {summary['seconds']}s; artifact {summary['bytes'] / 1024:.1f} KB")
@@ -0,0 +1,4 @@
+import os
+# Expose backend/services directory as part of this package so imports like
+# `from services.question_pool import ...` resolve when project root is on PYTHONPATH.
+__path__.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend', 'services')))